@@ -9,9 +9,20 @@ contract Notarizacion {
         uint256 timestamp
     );
 
+    // Evento que se dispara al anclar la raíz Merkle de un lote de fotos
+    event LoteNotarizado(
+        address indexed autor,
+        bytes32 indexed raiz,
+        uint256 numHojas,
+        uint256 timestamp
+    );
+
     // Mapeo para guardar primer timestamp de cada hash
     mapping(bytes32 => uint256) public registros;
 
+    // Mapeo para guardar primer timestamp de cada raíz Merkle
+    mapping(bytes32 => uint256) public raices;
+
     /**
      * @dev Registra el hash de una foto/vídeo en la blockchain.
      *      Si el hash ya existe, no vuelve a emitir el evento.
@@ -26,4 +37,64 @@ contract Notarizacion {
             emit NotarizacionRealizada(msg.sender, hashFoto, block.timestamp);
         }
     }
+
+    /**
+     * @dev Registra varios hashes en una sola transacción.  Cada hash nuevo
+     *      recibe su entrada en registros y su evento, igual que con
+     *      notarizar; los hashes cero o ya registrados (también los repetidos
+     *      dentro del mismo lote) se saltan sin revertir.
+     * @param hashes Hashes de las fotos/vídeos (SHA-256)
+     * @return nuevos Número de hashes registrados por primera vez
+     */
+    function notarizarLote(bytes32[] calldata hashes) external returns (uint256 nuevos) {
+        uint256 ts = block.timestamp;
+        uint256 n = hashes.length;
+        for (uint256 i = 0; i < n; ) {
+            bytes32 hashFoto = hashes[i];
+            if (hashFoto != bytes32(0) && registros[hashFoto] == 0) {
+                registros[hashFoto] = ts;
+                emit NotarizacionRealizada(msg.sender, hashFoto, ts);
+                unchecked { ++nuevos; }
+            }
+            unchecked { ++i; }
+        }
+    }
+
+    /**
+     * @dev Ancla la raíz Merkle de un lote de hashes en una sola transacción.
+     *      Cada foto se demuestra después con su prueba de inclusión.
+     * @param raiz Raíz del árbol Merkle (SHA-256)
+     * @param numHojas Número de hashes incluidos en el lote
+     */
+    function notarizarRaiz(bytes32 raiz, uint256 numHojas) external {
+        require(raiz != bytes32(0), "Raiz no puede ser cero");
+        require(numHojas > 0, "Lote vacio");
+
+        if (raices[raiz] == 0) {
+            raices[raiz] = block.timestamp;
+            emit LoteNotarizado(msg.sender, raiz, numHojas, block.timestamp);
+        }
+    }
+
+    /**
+     * @dev Comprueba que hashFoto pertenece a una raíz anclada.
+     *      Hoja = sha256(0x00 || hash); nodo = sha256(0x01 || min || max).
+     */
+    function verificarInclusion(
+        bytes32 hashFoto,
+        bytes32[] calldata prueba,
+        bytes32 raiz
+    ) external view returns (bool) {
+        if (raices[raiz] == 0) {
+            return false;
+        }
+        bytes32 nodo = sha256(abi.encodePacked(bytes1(0x00), hashFoto));
+        for (uint256 i = 0; i < prueba.length; i++) {
+            bytes32 hermano = prueba[i];
+            nodo = nodo <= hermano
+                ? sha256(abi.encodePacked(bytes1(0x01), nodo, hermano))
+                : sha256(abi.encodePacked(bytes1(0x01), hermano, nodo));
+        }
+        return nodo == raiz;
+    }
 }
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+
+"""
+Gas y rendimiento del contrato Notarizacion en la red local.
+
+    brownie run benchmark_gas                  # informe nuevo y comparación
+    brownie run benchmark_gas save_baseline    # además lo fija como línea base
+
+Mide el gas de ``notarizar`` (primera escritura, repetida y con hash cero),
+el gas por hash de ``notarizarLote`` con distintos tamaños de lote (hashes
+nuevos y ya registrados) y el de ``notarizarRaiz``.  Con el límite de gas del
+bloque se calcula cuántas transacciones (y hashes) caben en un bloque, y se
+mide cuántas transacciones por segundo acepta la red local.
+
+Cada ejecución escribe ``reports/gas/gas_<fecha>_<bytecode>.json`` y lo compara
+con ``reports/gas/baseline.json``: el gas es determinista, así que cualquier
+subida por encima de ``GAS_REGRESSION_THRESHOLD`` (fracción, 0 por defecto)
+se considera una regresión y el script termina con error.
+
+Solo las mediciones importan ``brownie`` (que exige el proyecto cargado): la
+comparación y los informes se pueden usar y probar sin él.
+"""
+
+REPORT_VERSION = 1
+REPORT_DIR = Path(__file__).resolve().parent.parent / 'reports' / 'gas'
+BASELINE_FILE = REPORT_DIR / 'baseline.json'
+BATCH_SIZES = (1, 8, 32, 128)
+THROUGHPUT_TXS = int(os.getenv("GAS_BENCH_TXS", "200"))
+
+_counter = 0
+
+
+def _fresh(n: int) -> list:
+    """``n`` hashes que no se han usado antes en esta ejecución."""
+    global _counter
+    out = []
+    for _ in range(n):
+        _counter += 1
+        out.append(hashlib.sha256(b'bench' + _counter.to_bytes(8, 'big')).digest())
+    return out
+
+
+def _gas(fn, *args) -> int:
+    """Gas de una transacción, también si revierte (queda en ``history``)."""
+    from brownie import accounts, exceptions, history
+    try:
+        return fn(*args, {'from': accounts[0]}).gas_used
+    except exceptions.VirtualMachineError:
+        return history[-1].gas_used
+
+
+def _per_block(gas: int, block_gas_limit: int) -> int:
+    return block_gas_limit // gas if gas else 0
+
+
+def measure(contrato) -> dict:
+    from brownie import accounts, chain
+    limit = chain[-1].gasLimit
+    results = {}
+
+    h = _fresh(1)[0]
+    first = _gas(contrato.notarizar, h)
+    results['notarizar.first'] = {'gas': first, 'tx_per_block': _per_block(first, limit)}
+    duplicate = _gas(contrato.notarizar, h)
+    results['notarizar.duplicate'] = {'gas': duplicate, 'tx_per_block': _per_block(duplicate, limit)}
+    results['notarizar.zero'] = {'gas': _gas(contrato.notarizar, b'\x00' * 32)}
+
+    for size in BATCH_SIZES:
+        hashes = _fresh(size)
+        gas = _gas(contrato.notarizarLote, hashes)
+        results[f'notarizarLote.{size}'] = {
+            'gas': gas,
+            'gas_per_hash': gas // size,
+            'hashes_per_block': _per_block(gas, limit) * size,
+        }
+        # Los mismos hashes otra vez: solo lecturas, sin escritura ni evento
+        again = _gas(contrato.notarizarLote, hashes)
+        results[f'notarizarLote.{size}.duplicate'] = {'gas': again, 'gas_per_hash': again // size}
+
+    root = _fresh(1)[0]
+    gas = _gas(contrato.notarizarRaiz, root, 1024)
+    results['notarizarRaiz'] = {'gas': gas, 'tx_per_block': _per_block(gas, limit)}
+
+    # Transacciones por segundo que acepta la red local (una por bloque en
+    # ganache con minado automático): orientativo, no se compara
+    hashes = _fresh(THROUGHPUT_TXS)
+    start = time.perf_counter()
+    for h in hashes:
+        contrato.notarizar(h, {'from': accounts[0], 'required_confs': 0})
+    chain.mine()
+    elapsed = time.perf_counter() - start
+    results['throughput'] = {'tx_per_s': round(THROUGHPUT_TXS / elapsed, 1)}
+    return {'block_gas_limit': limit, 'results': results}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Subidas de gas de ``results`` frente a ``baseline`` de más de ``threshold``."""
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name, {}).get('gas')
+        new = metrics.get('gas')
+        if old is None or new is None:
+            continue
+        if new > old * (1 + threshold):
+            regressions.append(f"{name}: {old} -> {new} ({(new - old) / old:+.1%})")
+        elif new != old:
+            print(f"{name}: {old} -> {new} ({(new - old) / old:+.1%})")
+    return regressions
+
+
+def _report() -> dict:
+    from brownie import Notarizacion, chain, accounts
+    contrato = Notarizacion.deploy({'from': accounts[0]})
+    measured = measure(contrato)
+    bytecode = Notarizacion.bytecode
+    if bytecode.startswith('0x'):
+        bytecode = bytecode[2:]
+    return {
+        'report_version': REPORT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        # Identifica la versión del contrato medida
+        'bytecode_sha256': hashlib.sha256(bytes.fromhex(bytecode)).hexdigest(),
+        'environment': {
+            'python': platform.python_version(),
+            'chain_id': chain.id,
+        },
+        **measured,
+    }
+
+
+def _write(report: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def _print(report: dict):
+    print(f"Límite de gas del bloque: {report['block_gas_limit']}")
+    for name, metrics in report['results'].items():
+        values = ', '.join(f"{k}={v}" for k, v in metrics.items())
+        print(f"  {name:<30}{values}")
+
+
+def main(save: bool = False):
+    report = _report()
+    _print(report)
+    stamp = report['created_at'].replace(':', '').replace('-', '').replace('+0000', 'Z')
+    path = REPORT_DIR / f"gas_{stamp}_{report['bytecode_sha256'][:8]}.json"
+    _write(report, path)
+    print(f"Informe guardado en {path}")
+
+    if save:
+        _write(report, BASELINE_FILE)
+        print(f"Línea base guardada en {BASELINE_FILE}")
+        return report
+    if not BASELINE_FILE.exists():
+        print("Sin línea base: ejecuta 'brownie run benchmark_gas save_baseline' para fijarla")
+        return report
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    threshold = float(os.getenv("GAS_REGRESSION_THRESHOLD", "0"))
+    regressions = compare(report['results'], baseline['results'], threshold)
+    for line in regressions:
+        print(f"REGRESIÓN {line}")
+    if regressions:
+        sys.exit(1)
+    return report
+
+
+def save_baseline():
+    return main(save=True)
@@ -0,0 +1,51 @@
+import os
+import sys
+import pytest
+from brownie import Notarizacion, accounts, chain, web3
+
+# El índice vive en app/, dos niveles por encima de Contract/tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from app.indexer import EventIndex  # noqa: E402
+
+
+@pytest.fixture
+def contrato():
+    return Notarizacion.deploy({'from': accounts[0]})
+
+
+@pytest.fixture
+def indice(contrato):
+    idx = EventIndex(web3, contrato.address, db_path=':memory:',
+                     start_block=web3.eth.block_number, chunk_size=2, reorg_depth=5)
+    yield idx
+    idx.close()
+
+
+def test_indexa_eventos_incrementalmente(contrato, indice):
+    h1, h2 = b"\x11" * 32, b"\x22" * 32
+    contrato.notarizar(h1, {'from': accounts[0]})
+    assert indice.sync() == 1
+    contrato.notarizar(h2, {'from': accounts[1]})
+    contrato.notarizar(h1, {'from': accounts[1]})  # duplicado: sin evento
+    assert indice.sync() == 1
+
+    assert indice.lookup(h1)['autor'] == accounts[0]
+    assert indice.lookup(h1)['timestamp'] == contrato.registros(h1)
+    assert indice.is_notarized(h2)
+    assert [r['hash'] for r in indice.by_author(accounts[1])] == [h2.hex()]
+    assert indice.last_block() == web3.eth.block_number
+
+
+def test_deshace_reorganizacion(contrato, indice):
+    h1, h2 = b"\x33" * 32, b"\x44" * 32
+    chain.snapshot()
+    contrato.notarizar(h1, {'from': accounts[0]})
+    indice.sync()
+    assert indice.is_notarized(h1)
+
+    # Volver atrás y minar otra rama de la misma altura
+    chain.revert()
+    contrato.notarizar(h2, {'from': accounts[0]})
+    indice.sync()
+    assert not indice.is_notarized(h1)
+    assert indice.is_notarized(h2)
@@ -1,4 +1,5 @@
 import pytest
+import hashlib
 from brownie import Notarizacion, accounts
 
 @ pytest.fixture
@@ -25,3 +26,58 @@ def test_notarizar_unico(contrato):
     tx2 = contrato.notarizar(prueba_hash, {'from': accounts[1]})
     assert len(tx2.events) == 0
     assert contrato.registros(prueba_hash) == timestamp_inicial
+
+
+def _hoja(h):
+    return hashlib.sha256(b"\x00" + h).digest()
+
+
+def _nodo(a, b):
+    a, b = min(a, b), max(a, b)
+    return hashlib.sha256(b"\x01" + a + b).digest()
+
+
+def test_notarizar_raiz_y_verificar_inclusion(contrato):
+    hashes = [bytes([i]) * 32 for i in range(1, 4)]
+    # Árbol de 3 hojas: la tercera sube sin pareja
+    n01 = _nodo(_hoja(hashes[0]), _hoja(hashes[1]))
+    raiz = _nodo(n01, _hoja(hashes[2]))
+
+    tx = contrato.notarizarRaiz(raiz, 3, {'from': accounts[0]})
+    event = tx.events['LoteNotarizado']
+    assert event['raiz'] == "0x" + raiz.hex()
+    assert event['numHojas'] == 3
+    assert contrato.raices(raiz) > 0
+
+    assert contrato.verificarInclusion(hashes[0], [_hoja(hashes[1]), _hoja(hashes[2])], raiz)
+    assert contrato.verificarInclusion(hashes[2], [n01], raiz)
+    assert not contrato.verificarInclusion(b"\x99" * 32, [n01], raiz)
+
+
+def test_verificar_inclusion_raiz_no_anclada(contrato):
+    h = b"\x56" * 32
+    assert not contrato.verificarInclusion(h, [], _hoja(h))
+
+
+def test_notarizar_lote(contrato):
+    h1, h2, h3 = b"\x61" * 32, b"\x62" * 32, b"\x63" * 32
+    contrato.notarizar(h3, {'from': accounts[0]})
+    ts_previo = contrato.registros(h3)
+
+    # Cero, repetidos dentro del lote y ya registrados se saltan sin revertir
+    tx = contrato.notarizarLote([h1, b"\x00" * 32, h2, h1, h3], {'from': accounts[1]})
+    eventos = tx.events['NotarizacionRealizada']
+    assert [e['hashFoto'] for e in eventos] == ["0x" + h1.hex(), "0x" + h2.hex()]
+    assert all(e['autor'] == accounts[1] for e in eventos)
+    assert tx.return_value == 2
+
+    assert contrato.registros(h1) > 0
+    assert contrato.registros(h2) == contrato.registros(h1)
+    assert contrato.registros(h3) == ts_previo
+
+
+def test_notarizar_lote_gasta_menos_por_hash(contrato):
+    hashes = [bytes([0x70 + i]) * 32 for i in range(10)]
+    tx_lote = contrato.notarizarLote(hashes, {'from': accounts[0]})
+    tx_uno = contrato.notarizar(b"\x7f" * 32, {'from': accounts[0]})
+    assert tx_lote.gas_used < 10 * tx_uno.gas_used
@@ -0,0 +1,189 @@
+# app/batcher.py
+import json
+import time
+import threading
+from pathlib import Path
+import config
+from app.merkle import build_levels, merkle_proof, verify_proof
+
+"""
+Agrupa los hashes pendientes en lotes y ancla solo la raíz Merkle de cada lote
+con ``Notarizacion.notarizarRaiz``: una transacción por lote en vez de una por
+foto.  Cada registro JSON (formato de la bandeja de salida) recibe su
+prueba de inclusión bajo la clave ``merkle``, con ``anchor_status`` a
+``pending`` hasta que quien espera el recibo lo pasa a ``confirmed`` o
+``failed`` con ``set_anchor_status``.
+
+Un lote se cierra al llegar a ``max_size`` hashes o cuando el más antiguo lleva
+``max_age`` segundos esperando; bajar ``max_age`` reduce la latencia y subir
+``max_size`` reduce el gas por foto.
+"""
+
+
+def anchor_root(root: bytes, leaf_count: int) -> str:
+    """Envía la raíz del lote a la blockchain y devuelve el hash de la transacción."""
+    from app.blockchain import build_root_transaction, send_transaction
+    signed_tx = build_root_transaction(root, leaf_count)
+    return send_transaction(signed_tx)
+
+
+def save_record(record: dict, directory) -> Path:
+    """Guarda el registro de una foto como ``<hash>.json`` dentro de ``directory``."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{record['photo_hash']}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    return path
+
+
+def _update_record(record_path, update):
+    with open(record_path, 'r', encoding='utf-8') as f:
+        record = json.load(f)
+    update(record)
+    with open(record_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+
+
+def _attach_proof(record_path, proof_data: dict):
+    """Añade la prueba de inclusión al registro JSON de la foto."""
+    _update_record(record_path, lambda record: record.__setitem__('merkle', proof_data))
+
+
+def set_anchor_status(record_paths, status: str):
+    """
+    Apunta en la prueba de cada registro si la transacción de su lote se ha
+    confirmado (``confirmed``) o no (``failed``): hasta entonces la raíz puede
+    no estar en la cadena.
+    """
+    def update(record):
+        if record.get('merkle'):
+            record['merkle']['anchor_status'] = status
+    for record_path in record_paths:
+        _update_record(record_path, update)
+
+
+class MerkleBatcher:
+    """Acumula hashes y cierra lotes por tamaño o por antigüedad."""
+
+    def __init__(self, max_size: int = None, max_age: float = None, submit=anchor_root):
+        self.max_size = max_size or config.BATCH_MAX_SIZE
+        self.max_age = config.BATCH_MAX_AGE_S if max_age is None else max_age
+        self.submit = submit
+        self._pending = []  # [(photo_hash, record_path)]
+        self._opened_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, photo_hash: bytes, record_path=None):
+        """Añade un hash al lote abierto. Devuelve el lote si se ha cerrado."""
+        with self._lock:
+            if not self._pending:
+                self._opened_at = time.monotonic()
+            self._pending.append((photo_hash, record_path))
+            full = len(self._pending) >= self.max_size
+        return self.close() if full else None
+
+    def should_close(self) -> bool:
+        """Indica si el lote abierto ha superado el tamaño o la antigüedad."""
+        with self._lock:
+            if not self._pending:
+                return False
+            return (len(self._pending) >= self.max_size
+                    or time.monotonic() - self._opened_at >= self.max_age)
+
+    def poll(self):
+        """Cierra el lote si toca; pensado para llamarse periódicamente."""
+        return self.close() if self.should_close() else None
+
+    def close(self):
+        """
+        Construye el árbol del lote abierto, ancla la raíz y escribe la prueba
+        de cada foto en su registro, pendiente de confirmación.  Devuelve un
+        resumen del lote (con las rutas de sus registros en ``records``) o
+        ``None``.  Si el envío falla, los hashes vuelven al lote abierto y la excepción
+        se propaga.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            opened_at, self._opened_at = self._opened_at, None
+        if not pending:
+            return None
+
+        # Un mismo hash solo ocupa una hoja aunque llegue varias veces
+        leaves = list(dict.fromkeys(h for h, _ in pending))
+        index_of = {h: i for i, h in enumerate(leaves)}
+        levels = build_levels(leaves)
+        root = levels[-1][0]
+        try:
+            tx_hash = self.submit(root, len(leaves))
+        except Exception:
+            with self._lock:
+                # Delante de lo que haya llegado mientras tanto, con su antigüedad
+                self._pending = pending + self._pending
+                self._opened_at = opened_at
+            raise
+
+        records = []
+        for photo_hash, record_path in pending:
+            if record_path is None:
+                continue
+            records.append(record_path)
+            index = index_of[photo_hash]
+            _attach_proof(record_path, {
+                'root': root.hex(),
+                'index': index,
+                'leaf_count': len(leaves),
+                'proof': [p.hex() for p in merkle_proof(levels, index)],
+                'tx_hash': tx_hash,
+                'anchor_status': 'pending',
+            })
+        return {'root': root.hex(), 'leaf_count': len(leaves), 'tx_hash': tx_hash, 'records': records}
+
+    def start(self, interval: float = 1.0):
+        """Arranca un hilo que cierra los lotes por antigüedad."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True):
+        """Detiene el hilo y, opcionalmente, cierra el lote pendiente."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.close()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # El lote sigue abierto: se reintenta en la siguiente vuelta
+                print(f"Error anclando el lote: {e}")
+
+
+def verify_record(record: dict, check_chain: bool = True) -> bool:
+    """
+    Comprueba la prueba de inclusión de un registro contra su raíz y, si
+    ``check_chain`` es cierto, que esa raíz esté anclada en el contrato.
+    """
+    merkle = record.get('merkle')
+    if not merkle:
+        return False
+    photo_hash = bytes.fromhex(record['photo_hash'])
+    root = bytes.fromhex(merkle['root'])
+    proof = [bytes.fromhex(p) for p in merkle['proof']]
+    if not verify_proof(photo_hash, proof, root):
+        return False
+    if check_chain:
+        from app.blockchain import get_root_timestamp
+        return get_root_timestamp(root) > 0
+    return True
@@ -1,56 +1,368 @@
 # app/blockchain.py
+import os
 import json
-from web3 import Web3
+import math
+import threading
 import config
-from app.keystore import load_private_key
+from app.keystore import session
+from app.nonce import NonceManager
+from app.receipts import ConfirmationTracker, receipt_succeeded
+from app.fees import FeeOracle
+from app import tracing
+from app.rpc import EndpointPool, batch_call, raise_errors, to_int
 from pathlib import Path
 
-# Ruta y carga de ABI del contrato
+# Ruta del artefacto de brownie y de la caché con solo la ABI
 BASE = Path(__file__).parent.parent  # 'FotosBlockchain'
 ABI_FILE = BASE / "Contract" / "build" / "contracts" / "Notarizacion.json"
-w3 = Web3(Web3.HTTPProvider(config.ETH_NODE_URL))
-with open(ABI_FILE, 'r') as f:
-    data = json.load(f)
-    CONTRACT_ABI = data['abi']  # extrae únicamente la lista ABI
+ABI_CACHE_FILE = BASE / "contract_abi.json"
 
-contract = w3.eth.contract(address=config.CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+# Cliente, contrato y seguimiento de confirmaciones se crean en el primer uso,
+# para que importar este módulo no abra conexiones ni lea el artefacto
+_w3 = None
+_contract = None
+_tracker = None
+_fee_oracle = None
+_pool = None
+_init_lock = threading.Lock()
 
+# Gestor de nonce de la cuenta que firma (se crea con la primera transacción)
+nonce_manager = None
+
+
+def _artifact_stamp():
+    """Tamaño y fecha de modificación del artefacto (None si no existe)."""
+    try:
+        st = os.stat(ABI_FILE)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_abi() -> list:
+    """
+    Devuelve la ABI del contrato.  Se lee de ``contract_abi.json`` y solo se
+    regenera a partir del artefacto completo de brownie cuando éste cambia.
+    """
+    stamp = _artifact_stamp()
+    try:
+        with open(ABI_CACHE_FILE, 'r') as f:
+            cached = json.load(f)
+        if stamp is None or cached.get('artifact') == stamp:
+            return cached['abi']
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    if stamp is None:
+        raise RuntimeError(f"No se encontró la ABI del contrato en {ABI_FILE} ni en {ABI_CACHE_FILE}")
+
+    with open(ABI_FILE, 'r') as f:
+        abi = json.load(f)['abi']  # extrae únicamente la lista ABI
+    try:
+        with open(ABI_CACHE_FILE, 'w') as f:
+            json.dump({'artifact': stamp, 'abi': abi}, f)
+    except OSError:
+        pass  # sin permisos de escritura: se usa la ABI sin cachear
+    return abi
+
+
+def get_pool() -> EndpointPool:
+    """Pool de nodos RPC (``ETH_NODE_URLS``) con sondeo de salud en segundo plano."""
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = EndpointPool()
+                _pool.start()
+    return _pool
+
+
+def get_w3():
+    """Cliente Web3 sobre el pool de nodos, creado en la primera llamada."""
+    global _w3
+    if _w3 is None:
+        pool = get_pool()
+        with _init_lock:
+            if _w3 is None:
+                from web3 import Web3
+                from app.provider import PooledHTTPProvider
+                w3 = Web3(PooledHTTPProvider(pool))
+                _instrument(w3)
+                _w3 = w3
+    return _w3
+
+
+def _instrument(w3):
+    """Cuenta las llamadas RPC de ``w3`` si las trazas están activas."""
+    if tracing.enabled():
+        w3.middleware_onion.add(tracing.rpc_middleware, 'tracing')
+
+
+def configure(w3, address: str = None, abi: list = None):
+    """
+    Usa ``w3`` y el contrato desplegado en ``address`` en lugar del nodo de
+    ``config`` (p. ej. una cadena local en proceso para los benchmarks).
+    """
+    global _w3, _contract, _tracker, _fee_oracle, nonce_manager
+    with _init_lock:
+        for service in (_tracker, _fee_oracle, nonce_manager):
+            if service is not None:
+                service.stop()
+        _instrument(w3)
+        _w3 = w3
+        _contract = w3.eth.contract(address=address or config.CONTRACT_ADDRESS, abi=abi or load_abi())
+        _tracker = _fee_oracle = nonce_manager = None
+
+
+def get_contract():
+    """Instancia del contrato, creada en la primera llamada."""
+    global _contract
+    if _contract is None:
+        w3 = get_w3()
+        with _init_lock:
+            if _contract is None:
+                _contract = w3.eth.contract(address=config.CONTRACT_ADDRESS, abi=load_abi())
+    return _contract
+
+
+def get_tracker() -> ConfirmationTracker:
+    """Seguimiento compartido de confirmaciones de todas las transacciones."""
+    global _tracker
+    if _tracker is None:
+        w3 = get_w3()
+        with _init_lock:
+            if _tracker is None:
+                _tracker = ConfirmationTracker(w3)
+    return _tracker
+
+
+def get_fee_oracle() -> FeeOracle:
+    """Oráculo de comisiones compartido, renovado en segundo plano."""
+    global _fee_oracle
+    if _fee_oracle is None:
+        w3 = get_w3()
+        with _init_lock:
+            if _fee_oracle is None:
+                _fee_oracle = FeeOracle(w3)
+                _fee_oracle.start()
+    return _fee_oracle
+
+
+def fee_params(urgency: str = None) -> dict:
+    """Comisiones de mercado para una transacción (estáticas si el nodo falla)."""
+    try:
+        return get_fee_oracle().fee_params(urgency)
+    except Exception:
+        return {'gasPrice': get_w3().toWei(config.GAS_PRICE_GWEI, 'gwei')}
+
+
+def _replaced(old_hash: str, signed_tx):
+    """Una transacción atascada se ha reemplazado: vigilar también la nueva."""
+    tracing.count('tx_replaced')
+    get_tracker().replace(old_hash, signed_tx.hash.hex(), signed_tx.rawTransaction.hex())
+
+
+def get_nonce_manager(account) -> NonceManager:
+    """
+    Devuelve el gestor de nonce de ``account``, creándolo si hace falta, con
+    el hilo que reemplaza las transacciones atascadas en marcha.
+    """
+    global nonce_manager
+    if nonce_manager is None or nonce_manager.address != account.address:
+        if nonce_manager is not None:
+            nonce_manager.stop()
+        # Firmar siempre con la sesión, para no retener la clave tras bloquearla
+        nonce_manager = NonceManager(
+            get_w3(), account.address, sign=lambda tx: session.account.sign_transaction(tx),
+            on_replaced=_replaced,
+        )
+        nonce_manager.start()
+    return nonce_manager
+
+
+def prime(account=None):
+    """
+    Lee en un único lote JSON-RPC lo que necesita la primera transacción: el
+    chainId (que debe ser ``config.CHAIN_ID``), el nonce y, si la caché no está
+    al día, las comisiones.
+    """
+    account = account or session.account
+    manager = get_nonce_manager(account)
+    oracle = get_fee_oracle()
+    calls = [('eth_chainId', [])] + manager.sync_calls()
+    fee_calls = [] if oracle.fresh else oracle.calls()
+    results = batch_call(get_w3(), calls + fee_calls)
+    chain_id, pending, mined = raise_errors(results[:len(calls)])
+    if to_int(chain_id) != config.CHAIN_ID:
+        raise RuntimeError(f"El nodo está en la red {to_int(chain_id)}, no en CHAIN_ID={config.CHAIN_ID}")
+    manager.apply_sync(pending, mined)
+    if fee_calls:
+        try:
+            oracle.apply(results[len(calls):])
+        except Exception:
+            # Como en fee_params(): sin comisiones del nodo se usa GAS_PRICE_GWEI
+            pass
 
 
 def get_gas_price() -> int:
-    """Obtiene el precio de gas actual en Gwei."""
-    return w3.eth.gas_price // 10**9
+    """Obtiene el precio de gas actual en Gwei (desde la caché del oráculo)."""
+    return get_fee_oracle().gas_price() // 10**9
 
 
-def build_transaction(hash_bytes: bytes, signature: bytes, public_key) -> dict:
-    """Prepara la transacción que invoca notarizar(bytes32 hash)."""
-    # Cargar clave privada y obtener bytes
-    private_key = load_private_key()
-    priv_int = private_key.private_numbers().private_value
-    private_key_bytes = priv_int.to_bytes(32, byteorder='big')
-
-    # Crear cuenta desde la clave privada
-    account = w3.eth.account.from_key(private_key_bytes)
-
-    # Construir la transacción
-    tx = contract.functions.notarizar(hash_bytes).buildTransaction({
-        'chainId': config.CHAIN_ID,
-        'gas': config.GAS_LIMIT,
-        'gasPrice': w3.toWei(config.GAS_PRICE_GWEI, 'gwei'),
-        'nonce': w3.eth.get_transaction_count(account.address)
-    })
+def _sign_call(call, gas: int = None) -> object:
+    """
+    Construye y firma la transacción de una llamada al contrato, con ``gas``
+    de límite (por defecto ``config.GAS_LIMIT``).
+    """
+    # Cuenta ya desbloqueada en la sesión de firma
+    account = session.account
+
+    # Construir la transacción con el siguiente nonce local
+    manager = get_nonce_manager(account)
+    if not manager.synced:
+        prime(account)
+    nonce = manager.reserve()
+    try:
+        tx = call.buildTransaction({
+            'chainId': config.CHAIN_ID,
+            'gas': gas or config.GAS_LIMIT,
+            'nonce': nonce,
+            **fee_params()
+        })
+    except Exception:
+        # El nonce reservado no se usará: lo recibe la siguiente transacción
+        manager.release(nonce)
+        raise
     # Firmar la transacción
     signed_tx = account.sign_transaction(tx)
+    manager.track(nonce, signed_tx, tx)
     return signed_tx
 
 
+def build_transaction(hash_bytes: bytes, signature: bytes, public_key) -> dict:
+    """Prepara la transacción que invoca notarizar(bytes32 hash)."""
+    with tracing.span('build_transaction'):
+        return _sign_call(get_contract().functions.notarizar(hash_bytes))
+
+
+def build_root_transaction(root: bytes, leaf_count: int) -> dict:
+    """Prepara la transacción que ancla la raíz Merkle de un lote."""
+    with tracing.span('build_transaction', leaves=leaf_count):
+        return _sign_call(get_contract().functions.notarizarRaiz(root, leaf_count))
+
+
+def estimate_bulk_gas(hashes: list) -> int:
+    """Gas que el nodo estima para ``notarizarLote(hashes)``."""
+    call = get_contract().functions.notarizarLote(hashes)
+    return call.estimateGas({'from': session.account.address})
+
+
+def plan_bulk(hashes: list, max_gas: int = None) -> list:
+    """
+    Reparte ``hashes`` en tramos cuyo gas estimado, con el margen
+    ``GAS_ESTIMATE_MARGIN``, no pasa de ``max_gas``.  Devuelve
+    ``[(tramo, gas)]``.
+
+    El tamaño inicial sale de un modelo lineal (base + n * gas por hash)
+    ajustado con dos estimaciones; después cada tramo se estima tal cual y se
+    parte por la mitad si no cabe (los hashes ya registrados cuestan menos, así
+    que el gas real depende del contenido).
+    """
+    if not hashes:
+        return []
+    max_gas = max_gas or config.BULK_MAX_GAS
+    margin = config.GAS_ESTIMATE_MARGIN
+    base = estimate_bulk_gas(hashes[:1])
+    sample = hashes[:config.BULK_SAMPLE_SIZE]
+    per_hash = base
+    if len(sample) > 1:
+        per_hash = max(1, (estimate_bulk_gas(sample) - base) // (len(sample) - 1))
+    size = max(1, int((max_gas / margin - base) // per_hash) + 1)
+
+    pending = [hashes[i:i + size] for i in range(0, len(hashes), size)]
+    plan = []
+    while pending:
+        chunk = pending.pop(0)
+        gas = math.ceil(estimate_bulk_gas(chunk) * margin)
+        if gas > max_gas and len(chunk) > 1:
+            half = len(chunk) // 2
+            pending[:0] = [chunk[:half], chunk[half:]]
+            continue
+        plan.append((chunk, gas))
+    return plan
+
+
+def build_bulk_transaction(hashes: list, gas: int) -> dict:
+    """Prepara la transacción que invoca notarizarLote(bytes32[] hashes)."""
+    with tracing.span('build_transaction', hashes=len(hashes)):
+        return _sign_call(get_contract().functions.notarizarLote(hashes), gas=gas)
+
+
+def notarize_many(hashes: list, max_gas: int = None) -> list:
+    """
+    Notariza ``hashes`` con ``notarizarLote`` en tantas transacciones como
+    pida el gas estimado.  Los hashes cero y los repetidos se quitan antes.
+    Devuelve ``[{'tx_hash', 'hashes'}]`` con los hashes de cada transacción
+    en hexadecimal; cada hash queda en ``registros`` como con ``notarizar``.
+    """
+    unique = list(dict.fromkeys(h for h in hashes if any(h)))
+    sent = []
+    for chunk, gas in plan_bulk(unique, max_gas):
+        tx_hash = send_transaction(build_bulk_transaction(chunk, gas))
+        sent.append({'tx_hash': tx_hash, 'hashes': [h.hex() for h in chunk]})
+    return sent
+
+
+def get_root_timestamp(root: bytes) -> int:
+    """Timestamp en que se ancló la raíz (0 si no está anclada)."""
+    return get_contract().functions.raices(root).call()
+
+
 def send_transaction(signed_tx) -> str:
     """Envía la transacción y devuelve el hash."""
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-    return tx_hash.hex()
+    try:
+        with tracing.span('send_transaction'):
+            tx_hash = get_w3().eth.send_raw_transaction(signed_tx.rawTransaction).hex()
+    except Exception as e:
+        if not isinstance(e, ValueError) or 'already known' not in str(e):
+            # Nonce rechazado, transacción inválida o ningún nodo responde: el
+            # nonce no puede quedarse en vuelo sin enviar, porque nada lo
+            # reenviaría y las transacciones siguientes esperarían tras él
+            if nonce_manager is not None:
+                nonce_manager.discard(signed_tx)
+                try:
+                    nonce_manager.resync()
+                except Exception:
+                    # La siguiente reserva vuelve a sincronizar (ver NonceManager.resync)
+                    pass
+            raise
+        # Reintentada en otro nodo tras un fallo de red: la primera ya llegó
+        tx_hash = signed_tx.hash.hex()
+    if nonce_manager is not None:
+        nonce_manager.mark_sent(signed_tx)
+    return tx_hash
+
+
+def send_raw_transaction(raw_tx: bytes) -> str:
+    """Reenvía una transacción ya firmada (p. ej. recuperada de la bandeja de salida)."""
+    return get_w3().eth.send_raw_transaction(raw_tx).hex()
+
+
+def track_confirmation(tx_hash: str, callback=None, timeout=120, on_replaced=None):
+    """
+    Vigila la transacción sin bloquear; devuelve un Future con el recibo.
+    ``on_replaced(hash_anterior, hash_nuevo, raw_tx)`` se llama si la
+    transacción atascada se reemplaza por otra con más gas.
+    """
+    return get_tracker().track(tx_hash, callback=callback, timeout=timeout, on_replaced=on_replaced)
 
 
 def wait_for_confirmation(tx_hash: str, timeout=120) -> bool:
     """Espera la confirmación de la transacción."""
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
-    return receipt.status == 1
\ No newline at end of file
+    with tracing.span('wait_for_confirmation', tx_hash=tx_hash) as span:
+        try:
+            receipt = track_confirmation(tx_hash, timeout=timeout).result()
+        except TimeoutError:
+            span.set(timeout=True)
+            return False
+        span.set(gas_used=receipt.get('gasUsed'))
+    return receipt_succeeded(receipt)
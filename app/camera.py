@@ -1,20 +1,29 @@
-import json
 import time
 import subprocess
-import shutil
 import os
 from pathlib import Path
-import winreg
+from concurrent.futures import TimeoutError as FutureTimeoutError
+try:
+    import winreg  # solo existe en Windows
+except ImportError:
+    winreg = None
 
 from plyer import camera as plyer_camera  # para Android/iOS
 from kivy.utils import platform as kivy_platform
 
-from app.metadata import extract_exif, extract_sensors, extract_device_id, combine_metadata
-from app.hasher import compute_hash
+from app.metadata import extract_sensors, extract_device_id, combine_metadata
+from app.exif import extract_exif_fast
+from app.hasher import hash_with_manifest
+from app.phash import dhash, get_index
+from app.outbox import get_outbox, submit_job, track_job, HASHED, SIGNED
+from app.receipts import receipt_succeeded
+from app.watcher import get_watcher
+from app.importer import import_file, mapped, make_preview, preview_path_for
+from app import tracing
+import config
 
 # Rutas de carpeta temporal
 tmp_dir = Path.home() / "tmp_photos"
-TEMP_FILE = tmp_dir / 'last_capture.json'
 
 # Rutas por defecto de la galería de Windows
 DEFAULT_GALLERY_DIR = Path.home() / 'Pictures' / 'Camera Roll'
@@ -31,23 +40,24 @@ def get_gallery_dir():
     """
     Lee del registro la carpeta 'Camera Roll'. Si no existe, usa 'My Pictures'.
     """
-    try:
-        key = winreg.OpenKey(
-            winreg.HKEY_CURRENT_USER,
-            r"Software\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders"
-        )
-        # Intentar Camera Roll
-        val, _ = winreg.QueryValueEx(key, "Camera Roll")
-        path = Path(os.path.expandvars(val))
-        if path.exists():
-            return path
-        # Intentar My Pictures
-        val2, _ = winreg.QueryValueEx(key, "My Pictures")
-        path2 = Path(os.path.expandvars(val2))
-        if path2.exists():
-            return path2
-    except Exception:
-        pass
+    if winreg is not None:
+        try:
+            key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER,
+                r"Software\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders"
+            )
+            # Intentar Camera Roll
+            val, _ = winreg.QueryValueEx(key, "Camera Roll")
+            path = Path(os.path.expandvars(val))
+            if path.exists():
+                return path
+            # Intentar My Pictures
+            val2, _ = winreg.QueryValueEx(key, "My Pictures")
+            path2 = Path(os.path.expandvars(val2))
+            if path2.exists():
+                return path2
+        except Exception:
+            pass
     # Fallback a rutas conocidas
     if DEFAULT_GALLERY_DIR.exists():
         return DEFAULT_GALLERY_DIR
@@ -78,79 +88,156 @@ def launch_native_camera():
         subprocess.run(PHOTOS_APP_ID, shell=True, check=False)
 
 
-def capture_photo_with_native(on_complete):
+def capture_photo_with_native(on_complete, check_cancelled=None):
     """
     1. Abre la app nativa de cámara (o Fotos si no hay cámara).
-    2. Espera a que el usuario tome la foto y se guarde.
-    3. Copia la foto más reciente a tmp_photos y cierra la app.
+    2. Espera a que el usuario tome la foto y se guarde (ver app.watcher).
+    3. Copia la foto nueva a tmp_photos y cierra la app.
     """
-    # Limpiar tmp_dir
+    # Limpiar tmp_dir, salvo las fotos de trabajos aún pendientes de envío
     tmp_dir.mkdir(parents=True, exist_ok=True)
+    keep = get_outbox().pending_paths()
     for f in tmp_dir.iterdir():
-        if f.is_file():
+        if f.is_file() and os.path.realpath(f) not in keep:
             f.unlink()
+    # Y las vistas previas de esas fotos
+    keep_previews = {os.path.realpath(preview_path_for(p)) for p in keep}
+    if os.path.isdir(config.PREVIEW_DIR):
+        for f in Path(config.PREVIEW_DIR).iterdir():
+            if f.is_file() and os.path.realpath(f) not in keep_previews:
+                f.unlink()
 
     plat = kivy_platform
     if plat in ('android', 'ios'):
-        plyer_camera.take_picture(str(tmp_dir / 'capture.jpg'), on_complete)
+        plyer_camera.take_picture(str(tmp_dir / f'capture_{time.time_ns()}.jpg'), on_complete)
         return
     elif plat == 'win':
+        # Vigilar la galería desde antes de abrir la cámara: lo que ya había no cuenta
+        gallery_dir = get_gallery_dir()
+        watcher = get_watcher(gallery_dir)
+        watcher.drain()
         # Lanzar cámara o Fotos
         launch_native_camera()
-        # Dar tiempo a la app
-        time.sleep(1)
-        # Obtener directorio de galería
-        gallery_dir = get_gallery_dir()
-        # Buscar imágenes recursivamente
-        fotos = list(gallery_dir.rglob('*.jpg')) + list(gallery_dir.rglob('*.png'))
-        if not fotos:
-            raise RuntimeError("No se detectaron fotos en la carpeta de imágenes")
-        latest = max(fotos, key=lambda p: p.stat().st_ctime)
-        # Copiar a tmp_dir
-        dest = tmp_dir / latest.name
-        shutil.copy2(latest, dest)
+        latest = watcher.wait(config.CAPTURE_TIMEOUT_S, check_cancelled)
+        if latest is None:
+            raise RuntimeError(f"No se detectó ninguna foto nueva en {gallery_dir} "
+                               f"tras {config.CAPTURE_TIMEOUT_S:.0f}s")
+        # Enlazar (o copiar una vez) en tmp_dir
+        dest = import_file(latest, tmp_dir)
         # Cerrar cámaras
         subprocess.run('taskkill /IM WindowsCamera.exe /F', shell=True, check=False)
         subprocess.run('taskkill /IM Microsoft.Photos.exe /F', shell=True, check=False)
-        on_complete(str(dest))
+        on_complete(dest)
         return
-    # Fallback polling para otros
-    timeout_s, interval = 120, 1
-    elapsed = 0
-    while elapsed < timeout_s:
-        time.sleep(interval)
-        elapsed += interval
-        fotos = list(tmp_dir.iterdir())
-        if fotos:
-            foto = fotos[0]
-            subprocess.run('taskkill /IM WindowsCamera.exe /F', shell=True, check=False)
-            subprocess.run('taskkill /IM Microsoft.Photos.exe /F', shell=True, check=False)
-            on_complete(str(foto))
-            return
-    raise RuntimeError(f"No se detectó foto en tmp_photos tras {timeout_s}s")
-
-
-def process_photo(image_path: str):
+    # Otros sistemas: esperar a que aparezca la foto en tmp_photos
+    watcher = get_watcher(tmp_dir)
+    watcher.drain()
+    foto = watcher.wait(config.CAPTURE_TIMEOUT_S, check_cancelled)
+    if foto is None:
+        raise RuntimeError(f"No se detectó foto en tmp_photos tras {config.CAPTURE_TIMEOUT_S:.0f}s")
+    subprocess.run('taskkill /IM WindowsCamera.exe /F', shell=True, check=False)
+    subprocess.run('taskkill /IM Microsoft.Photos.exe /F', shell=True, check=False)
+    on_complete(foto)
+
+
+def process_photo(image_path: str, job=None, capture_id: str = None):
     """
-    Extrae metadatos y guarda hash en TEMP_FILE.
+    Extrae metadatos, calcula el hash y añade la foto a la bandeja de salida
+    (estado ``hashed``).  El fichero se proyecta en memoria una vez y de ahí
+    salen EXIF, hash, dHash y la vista previa para la pantalla de
+    confirmación.  Devuelve los datos con su ``job_id`` y ``preview``.  ``job``
+    (opcional) recibe el progreso y permite cancelar (ver app.worker);
+    ``capture_id`` agrupa las trazas de la foto (ver app.tracing).
     """
-    exif = extract_exif(image_path)
-    sensors = extract_sensors()
-    device_id = extract_device_id()
-    metadata = combine_metadata(exif, sensors, device_id)
-    photo_hash = compute_hash(image_path, metadata)
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-    data = {
-        'image_path': image_path,
-        'metadata': metadata,
-        'photo_hash': photo_hash.hex() if hasattr(photo_hash, 'hex') else photo_hash
-    }
-    with open(TEMP_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f)
-
-    # PRUEBA GITHUB CAMBIOS
-
-
-
-
-
+    capture_id = capture_id or tracing.new_capture_id()
+    with tracing.capture(capture_id):
+        if job is not None:
+            job.report('hashing')
+        with mapped(image_path) as mm:
+            with tracing.span('extract_exif'):
+                exif = extract_exif_fast(image_path, mm)
+            with tracing.span('extract_sensors'):
+                sensors = extract_sensors()
+            device_id = extract_device_id()
+            metadata = combine_metadata(exif, sensors, device_id)
+            # Hash v2 en streaming, o v3 en árbol con el manifiesto de bloques
+            with tracing.span('compute_hash'), memoryview(mm) as view:
+                photo_hash, manifest = hash_with_manifest(view, metadata)
+            # Marcar si es casi igual que una foto ya notarizada (ráfagas, reexportaciones)
+            with tracing.span('dhash'):
+                mm.seek(0)
+                try:
+                    fingerprint = dhash(mm)
+                except Exception:
+                    # Sin huella no se detectan casi-duplicados, pero la foto se notariza
+                    fingerprint = None
+            with tracing.span('preview'):
+                mm.seek(0)
+                preview = make_preview(mm, preview_path_for(image_path))
+        data = {
+            'image_path': image_path,
+            'metadata': metadata,
+            'photo_hash': photo_hash.hex(),
+            'hash_version': config.HASH_VERSION,
+            'capture_id': capture_id,
+        }
+        if manifest is not None:
+            data['chunks'] = manifest
+        data['phash'] = f"{fingerprint:016x}" if fingerprint is not None else None
+        data['near_duplicate_of'] = get_index().find(fingerprint) if fingerprint is not None else None
+        # Cada captura es un trabajo propio: una segunda foto no pisa a la primera
+        with tracing.span('outbox_add'):
+            data['job_id'] = get_outbox().add(data)
+        # Solo para la interfaz: no forma parte del registro guardado
+        data['preview'] = preview
+    return data
+
+
+def confirm_and_send_transaction(job=None, job_id: int = None, timeout=120) -> bool:
+    """
+    Firma el hash del trabajo ``job_id`` de la bandeja de salida (por defecto,
+    el último pendiente), envía la transacción y espera su confirmación.
+    Informa de los estados 'signing', 'submitted' y 'confirmed' a ``job``.
+    """
+    outbox = get_outbox()
+    worker_id = f"ui-{os.getpid()}"
+    if job_id is None:
+        pending = outbox.by_state(HASHED)
+        if not pending:
+            raise RuntimeError("No hay ninguna captura pendiente de confirmar")
+        job_id = pending[-1]['id']
+    claimed = outbox.claim(worker_id, states=(HASHED, SIGNED), job_id=job_id)
+    if not claimed:
+        raise RuntimeError(f"El trabajo {job_id} no está pendiente o ya se está enviando")
+    with tracing.capture(claimed[0]['record'].get('capture_id')):
+        try:
+            tx_hash = submit_job(
+                outbox, claimed[0],
+                report=job.report if job is not None else None,
+                check_cancelled=job.check_cancelled if job is not None else None,
+            )
+        except BaseException as e:
+            # Sin enviar: el trabajo queda en la bandeja para reintentarlo
+            outbox.update(job_id, outbox.get(job_id)['state'], release=True, error=str(e) or None)
+            raise
+
+        # Esperar por tramos cortos para atender la cancelación; el estado final
+        # lo guarda track_job aunque se deje de esperar
+        future = track_job(outbox, job_id, tx_hash, timeout=timeout)
+        with tracing.span('wait_for_confirmation', tx_hash=tx_hash) as span:
+            while True:
+                try:
+                    receipt = future.result(timeout=0.5)
+                    break
+                except (TimeoutError, FutureTimeoutError):
+                    if future.done():
+                        span.set(timeout=True)
+                        return False
+                    if job is not None:
+                        job.check_cancelled()
+            span.set(gas_used=receipt.get('gasUsed'))
+    tracing.write_metrics()
+    success = receipt_succeeded(receipt)
+    if job is not None and success:
+        job.report('confirmed', tx_hash)
+    return success
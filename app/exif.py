@@ -0,0 +1,269 @@
+# app/exif.py
+import os
+import json
+import struct
+import sqlite3
+import threading
+import piexif
+import config
+from app.metadata import extract_exif, dms_to_degrees
+
+"""
+Extracción rápida de EXIF con el mismo resultado que ``metadata.extract_exif``.
+
+* Del JPEG solo se lee la cabecera hasta el segmento APP1/Exif, y del bloque
+  TIFF solo se convierten las etiquetas que usamos (DateTime y latitud/longitud
+  GPS).  Del resto de IFD que ``piexif.load`` también recorre se comprueba
+  únicamente que sus entradas sean legibles, porque cuando no lo son
+  ``extract_exif`` devuelve ``{}`` y el resultado debe ser idéntico.
+* ``piexif`` 1.1.3 no lee PNG, así que ``extract_exif`` devuelve ``{}`` para
+  ellos: aquí basta con leer los 8 bytes de la firma.
+* Ante cualquier caso raro se delega en ``extract_exif``.
+
+``extract_exif_cached`` guarda además el resultado en SQLite con la clave
+(ruta, tamaño, mtime), de modo que reprocesar los mismos ficheros no vuelve a
+abrirlos.
+"""
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Tamaño en bytes de cada tipo TIFF que piexif decodifica con struct.unpack.
+# ASCII (2) y UNDEFINED (7) se leen por rebanado y nunca fallan.
+_TYPE_SIZES = {1: 1, 3: 2, 4: 4, 5: 8, 6: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+_SLICE_TYPES = (2, 7)
+# Tipos que piexif lee siempre a través de un puntero, aunque quepan en 4 bytes
+_ALWAYS_POINTER = (5, 10, 12)
+
+
+class _Fallback(Exception):
+    """El fichero no es un caso sencillo: usar ``extract_exif``."""
+
+
+def _read_app1(f) -> bytes:
+    """Segmento APP1/Exif de un JPEG, recorriendo los segmentos como piexif."""
+    data = f.read(6)
+    head = data[2:6]
+    while len(head) == 4:
+        length = struct.unpack('>H', head[2:4])[0]
+        if head[:2] == b'\xff\xe1':
+            segment = f.read(length - 2)
+            if segment[:4] != b'Exif':
+                head = f.read(4)
+                continue
+            return head + segment
+        elif head[0:1] == b'\xff':
+            f.read(length - 2)
+            head = f.read(4)
+        else:
+            break
+    return None
+
+
+class _Tiff:
+    """Lector mínimo del bloque TIFF del EXIF."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.e = '<' if data[0:2] == b'II' else '>'
+
+    def u16(self, offset):
+        return struct.unpack(self.e + 'H', self.data[offset:offset + 2])[0]
+
+    def u32(self, offset):
+        return struct.unpack(self.e + 'L', self.data[offset:offset + 4])[0]
+
+    def entries(self, pointer: int):
+        """(etiqueta, tipo, número, valor de 4 bytes) de cada entrada del IFD."""
+        count = self.u16(pointer)
+        base = pointer + 2
+        for i in range(count):
+            p = base + 12 * i
+            if p + 12 > len(self.data):
+                raise _Fallback()
+            tag, vtype, num = struct.unpack(self.e + 'HHL', self.data[p:p + 8])
+            yield tag, vtype, num, self.data[p + 8:p + 12]
+        self.next_ifd = self.data[base + 12 * count:base + 12 * count + 4]
+
+    def check(self, vtype, num, value):
+        """Comprueba que piexif podría decodificar la entrada sin error."""
+        if vtype in _SLICE_TYPES:
+            return
+        size = _TYPE_SIZES.get(vtype)
+        if size is None:
+            raise _Fallback()
+        total = size * max(num, 1) if vtype in _ALWAYS_POINTER else size * num
+        if vtype in _ALWAYS_POINTER or total > 4:
+            pointer = struct.unpack(self.e + 'L', value)[0]
+            if pointer + total > len(self.data):
+                raise _Fallback()
+
+    def scalar(self, vtype, num, value):
+        """Valor de un puntero a IFD (LONG de un elemento), como piexif."""
+        if vtype != 4 or num != 1:
+            raise _Fallback()
+        return struct.unpack(self.e + 'L', value)[0]
+
+    def ascii(self, num, value) -> bytes:
+        if num > 4:
+            pointer = struct.unpack(self.e + 'L', value)[0]
+            return self.data[pointer:pointer + num - 1]
+        return value[0:num - 1]
+
+    def rationals(self, num, value):
+        pointer = struct.unpack(self.e + 'L', value)[0]
+        pairs = tuple(
+            struct.unpack(self.e + 'LL', self.data[pointer + 8 * i:pointer + 8 * i + 8])
+            for i in range(max(num, 1))
+        )
+        return pairs if num > 1 else pairs[0]
+
+    def scan(self, pointer: int, tags: dict, wanted=()):
+        """Valida un IFD y devuelve las etiquetas de ``wanted`` presentes."""
+        found = {}
+        for tag, vtype, num, value in self.entries(pointer):
+            if tag not in tags:
+                continue
+            self.check(vtype, num, value)
+            if tag in wanted:
+                found[tag] = (vtype, num, value)
+        return found
+
+
+def _parse_tiff(data: bytes) -> dict:
+    tiff = _Tiff(data)
+    image_tags = piexif.TAGS['Image']
+    zeroth = tiff.scan(tiff.u32(4), image_tags,
+                       (piexif.ImageIFD.DateTime, piexif.ImageIFD.ExifTag, piexif.ImageIFD.GPSTag))
+    first_ifd = tiff.next_ifd
+
+    # IFD que piexif.load también recorre: solo se validan
+    if piexif.ImageIFD.ExifTag in zeroth:
+        exif_ifd = tiff.scan(tiff.scalar(*zeroth[piexif.ImageIFD.ExifTag]), piexif.TAGS['Exif'],
+                             (piexif.ExifIFD.InteroperabilityTag,))
+        if piexif.ExifIFD.InteroperabilityTag in exif_ifd:
+            tiff.scan(tiff.scalar(*exif_ifd[piexif.ExifIFD.InteroperabilityTag]), piexif.TAGS['Interop'])
+    if first_ifd != b'\x00\x00\x00\x00':
+        if len(first_ifd) != 4:
+            raise _Fallback()
+        first = tiff.scan(struct.unpack(tiff.e + 'L', first_ifd)[0], image_tags,
+                          (piexif.ImageIFD.JPEGInterchangeFormat, piexif.ImageIFD.JPEGInterchangeFormatLength))
+        for vtype, num, value in first.values():
+            tiff.scalar(vtype, num, value)
+
+    lat = lon = None
+    if piexif.ImageIFD.GPSTag in zeroth:
+        gps = tiff.scan(tiff.scalar(*zeroth[piexif.ImageIFD.GPSTag]), piexif.TAGS['GPS'],
+                        (piexif.GPSIFD.GPSLatitude, piexif.GPSIFD.GPSLongitude))
+        for tag, vtype, num, value in ((t, *gps[t]) for t in gps):
+            if vtype != 5:
+                raise _Fallback()
+            raw = tiff.rationals(num, value)
+            degrees = dms_to_degrees(raw) if raw else None
+            if tag == piexif.GPSIFD.GPSLatitude:
+                lat = degrees
+            else:
+                lon = degrees
+
+    datetime = None
+    if piexif.ImageIFD.DateTime in zeroth:
+        vtype, num, value = zeroth[piexif.ImageIFD.DateTime]
+        if vtype != 2:
+            raise _Fallback()
+        datetime = tiff.ascii(num, value)
+    return {
+        'datetime': datetime.decode() if datetime else None,
+        'gps_latitude': lat,
+        'gps_longitude': lon,
+    }
+
+
+def _header_app1(f):
+    """APP1 de ``f``; ``b''`` si es un PNG (sin EXIF para piexif)."""
+    magic = f.read(8)
+    if magic == PNG_SIGNATURE:
+        return b''
+    if magic[:2] != b'\xff\xd8':
+        raise _Fallback()  # TIFF, WebP u otros: piexif decide
+    f.seek(0)
+    return _read_app1(f)
+
+
+def extract_exif_fast(image_path: str, fileobj=None) -> dict:
+    """
+    Igual que ``extract_exif`` leyendo solo la cabecera del fichero.  Con
+    ``fileobj`` (p. ej. la proyección de app.importer) se lee de ahí en lugar
+    de abrir ``image_path``, que solo se usa si hay que delegar en piexif.
+    """
+    try:
+        if fileobj is not None:
+            fileobj.seek(0)
+            app1 = _header_app1(fileobj)
+        else:
+            with open(image_path, 'rb') as f:
+                app1 = _header_app1(f)
+        if app1 == b'':
+            return {}
+        if not app1:
+            return {'datetime': None, 'gps_latitude': None, 'gps_longitude': None}
+        return _parse_tiff(app1[10:])
+    except Exception:
+        return extract_exif(image_path)
+
+
+class ExifCache:
+    """Caché persistente de EXIF con clave (ruta, tamaño, mtime)."""
+
+    def __init__(self, db_path: str = None):
+        db_path = db_path or config.EXIF_CACHE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS exif ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, datos TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, path: str, size: int, mtime_ns: int):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT datos FROM exif WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, path: str, size: int, mtime_ns: int, exif: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO exif VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(exif))
+            )
+            self._db.commit()
+
+
+# Una conexión por proceso (los workers de ingest.py abren la suya)
+_cache = None
+_cache_pid = None
+
+
+def get_cache() -> ExifCache:
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = ExifCache()
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def extract_exif_cached(image_path: str) -> dict:
+    """``extract_exif_fast`` memorizado por (ruta, tamaño, mtime)."""
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        return extract_exif(image_path)
+    path = os.path.abspath(image_path)
+    cache = get_cache()
+    exif = cache.get(path, st.st_size, st.st_mtime_ns)
+    if exif is None:
+        exif = extract_exif_fast(image_path)
+        cache.put(path, st.st_size, st.st_mtime_ns, exif)
+    return exif
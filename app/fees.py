@@ -0,0 +1,155 @@
+# app/fees.py
+import time
+import threading
+import statistics
+import config
+from app.rpc import batch_call, raise_errors, to_int
+
+"""
+Oráculo de comisiones con caché.
+
+Una sola petición JSON-RPC en lote trae el número de bloque, ``eth_gasPrice`` y
+``eth_feeHistory`` (percentiles de propina de los últimos bloques).  El
+resultado se guarda y se sirve a todos los que lo piden hasta que aparece un
+bloque nuevo o pasa ``FEE_TTL_S``.  Con ``start()`` un hilo consulta solo el
+número de bloque cada ``FEE_BLOCK_POLL_S`` y renueva la caché con cada bloque
+nuevo, así que consultar la comisión no cuesta ninguna llamada al nodo.
+
+Con los datos de ``eth_feeHistory`` se calculan parámetros EIP-1559 (tipo 2):
+la propina es la mediana del percentil de la urgencia elegida y el máximo es
+el doble de la base del siguiente bloque más la propina.  Si el nodo no
+soporta EIP-1559 se usa ``gasPrice`` clásico.
+"""
+
+# Percentil de propina de cada nivel de urgencia
+URGENCY_PERCENTILES = {'lenta': 10, 'normal': 50, 'rapida': 90}
+
+
+class FeeOracle:
+    """Caché de precio de gas y del historial de comisiones."""
+
+    def __init__(self, w3, ttl: float = None, history_blocks: int = None, poll_interval: float = None):
+        self.w3 = w3
+        self.ttl = config.FEE_TTL_S if ttl is None else ttl
+        self.history_blocks = history_blocks or config.FEE_HISTORY_BLOCKS
+        self.poll_interval = config.FEE_BLOCK_POLL_S if poll_interval is None else poll_interval
+        self._percentiles = sorted(URGENCY_PERCENTILES.values())
+        self._snapshot = None
+        self._fetched_at = 0.0
+        self._latest_block = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def calls(self) -> list:
+        """Llamadas JSON-RPC de ``refresh``, para agruparlas con otras."""
+        return [
+            ('eth_blockNumber', []),
+            ('eth_gasPrice', []),
+            ('eth_feeHistory', [hex(self.history_blocks), 'latest', self._percentiles]),
+        ]
+
+    @property
+    def fresh(self) -> bool:
+        """La caché existe, no ha caducado y no se conoce un bloque posterior."""
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._fetched_at >= self.ttl:
+                return False
+            block = self._snapshot['block']
+            return block is None or self._latest_block is None or self._latest_block <= block
+
+    def observe_block(self, block):
+        """Anota un número de bloque visto; uno posterior al de la caché la invalida."""
+        block = to_int(block)
+        with self._lock:
+            if self._latest_block is None or block > self._latest_block:
+                self._latest_block = block
+
+    def refresh(self) -> dict:
+        """Pide al nodo bloque, precio de gas e historial en un único lote."""
+        return self.apply(batch_call(self.w3, self.calls()))
+
+    def apply(self, results: list) -> dict:
+        """Actualiza la caché con los resultados de ``calls``."""
+        block, gas_price, history = results
+        if isinstance(gas_price, Exception):
+            raise gas_price
+        # JSON-RPC devuelve hexadecimal; eth-tester, enteros
+        snapshot = {
+            'block': None if block is None or isinstance(block, Exception) else to_int(block),
+            'gas_price': to_int(gas_price),
+            'base_fee': None,
+            'tips': {},
+        }
+        if isinstance(history, dict) and history.get('baseFeePerGas'):
+            # El último elemento es la base estimada del siguiente bloque
+            snapshot['base_fee'] = to_int(history['baseFeePerGas'][-1])
+            rewards = history.get('reward') or []
+            for i, pct in enumerate(self._percentiles):
+                values = [to_int(r[i]) for r in rewards if len(r) > i]
+                snapshot['tips'][pct] = int(statistics.median(values)) if values else 0
+        with self._lock:
+            self._snapshot = snapshot
+            self._fetched_at = time.monotonic()
+            if snapshot['block'] is not None and (self._latest_block is None
+                                                  or snapshot['block'] > self._latest_block):
+                self._latest_block = snapshot['block']
+        return snapshot
+
+    def snapshot(self) -> dict:
+        """Último dato en caché; solo va al nodo si ha caducado."""
+        fresh = self.fresh
+        with self._lock:
+            snapshot = self._snapshot
+        # Con el hilo en marcha se sirve el dato aunque haya caducado por poco
+        if fresh or (snapshot is not None and self._thread is not None):
+            return snapshot
+        return self.refresh()
+
+    def gas_price(self) -> int:
+        """Precio de gas clásico en wei."""
+        return self.snapshot()['gas_price']
+
+    def fee_params(self, urgency: str = None) -> dict:
+        """
+        Campos de comisión para una transacción: ``maxFeePerGas`` y
+        ``maxPriorityFeePerGas`` (EIP-1559) o ``gasPrice`` si no hay base fee.
+        """
+        urgency = urgency or config.FEE_URGENCY
+        if urgency not in URGENCY_PERCENTILES:
+            raise ValueError(f"Urgencia desconocida: {urgency}")
+        snapshot = self.snapshot()
+        if snapshot['base_fee'] is None:
+            return {'gasPrice': snapshot['gas_price']}
+        tip = snapshot['tips'].get(URGENCY_PERCENTILES[urgency], 0)
+        return {
+            'maxFeePerGas': 2 * snapshot['base_fee'] + tip,
+            'maxPriorityFeePerGas': tip,
+        }
+
+    def start(self):
+        """Arranca el hilo que renueva la caché con cada bloque nuevo."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                if self.fresh:
+                    # Solo el número de bloque; las comisiones, si ha cambiado
+                    self.observe_block(raise_errors(batch_call(self.w3, [('eth_blockNumber', [])]))[0])
+                if not self.fresh:
+                    self.refresh()
+            except Exception as e:
+                print(f"Error actualizando comisiones: {e}")
+            if self._stop.wait(self.poll_interval):
+                break
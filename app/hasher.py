@@ -1,17 +1,265 @@
 # app/hasher.py
+import os
 import json
+import struct
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import config
+from app import tracing
 
-def compute_hash(image_bytes: bytes, metadata: dict) -> bytes:
-    """
-    Genera un hash SHA-256 de la imagen más los metadatos.
-    """
-    # Combinar los datos: imagen en hexadecimal + metadatos ordenados
+# Versiones del formato de hash
+#  * v1: JSON con la imagen en hexadecimal + metadatos (formato original).
+#  * v2: streaming; cabecera con los metadatos canónicos seguida de los bytes
+#        del fichero leídos por bloques. Memoria constante.
+#  * v3: árbol; el fichero se parte en bloques de tamaño fijo que se resumen
+#        en paralelo, y la raíz del árbol de esos resúmenes entra en el hash.
+#        Con el manifiesto (los resúmenes de los bloques) se puede verificar
+#        un tramo del fichero sin leer el resto.
+HASH_V1 = 1
+HASH_V2 = 2
+HASH_V3 = 3
+
+# Prefijos que separan el dominio de cada formato del resto de usos de SHA-256
+V2_MAGIC = b'NOTARIZACION-HASH-v2\x00'
+V3_MAGIC = b'NOTARIZACION-HASH-v3\x00'
+# Prefijos de hoja y de nodo interno del árbol v3
+_LEAF = b'\x00'
+_NODE = b'\x01'
+
+
+def canonical_metadata(metadata: dict) -> bytes:
+    """Serializa los metadatos de forma canónica (claves ordenadas, sin espacios)."""
+    return json.dumps(metadata, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _compute_hash_v1(image_bytes: bytes, metadata: dict) -> bytes:
+    """Hash original: imagen en hexadecimal + metadatos ordenados en JSON."""
     payload = {
         'image_hex': image_bytes.hex(),
         'metadata': metadata
     }
-    # Serializar a JSON con claves ordenadas para consistencia
     data = json.dumps(payload, sort_keys=True).encode('utf-8')
-    # Calcular hash
-    return hashlib.sha256(data).digest()
\ No newline at end of file
+    return hashlib.sha256(data).digest()
+
+
+def _v2_header(metadata: dict, size: int) -> bytes:
+    """Cabecera v2: magic + longitud y metadatos canónicos + tamaño de los datos."""
+    meta = canonical_metadata(metadata)
+    return V2_MAGIC + struct.pack('>Q', len(meta)) + meta + struct.pack('>Q', size)
+
+
+def _compute_hash_v2(image, metadata: dict, chunk_size: int) -> bytes:
+    """
+    Hash en streaming. Si ``image`` es una ruta se lee por bloques de
+    ``chunk_size`` reutilizando el mismo búfer, de modo que la memoria no
+    depende del tamaño del fichero.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        view = memoryview(image)
+        h = hashlib.sha256(_v2_header(metadata, view.nbytes))
+        for start in range(0, view.nbytes, chunk_size):
+            h.update(view[start:start + chunk_size])
+        tracing.count('bytes_hashed', view.nbytes)
+        return h.digest()
+
+    with open(image, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        h = hashlib.sha256(_v2_header(metadata, size))
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        read = 0
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+            read += n
+    if read != size:
+        raise RuntimeError(f"El fichero cambió durante el hash ({read} != {size} bytes)")
+    tracing.count('bytes_hashed', read)
+    return h.digest()
+
+
+def _chunk_digest(data) -> bytes:
+    h = hashlib.sha256(_LEAF)
+    h.update(data)
+    return h.digest()
+
+
+def tree_root(digests: list) -> bytes:
+    """
+    Raíz del árbol binario sobre los resúmenes de los bloques, en orden (a
+    diferencia de ``app.merkle``, aquí importa la posición de cada bloque).  Un
+    nodo sin pareja sube sin cambios al nivel siguiente.
+    """
+    level = list(digests)
+    while len(level) > 1:
+        parents = [hashlib.sha256(_NODE + level[i] + level[i + 1]).digest()
+                   for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+
+def _v3_hash(metadata: dict, size: int, chunk_size: int, root: bytes) -> bytes:
+    meta = canonical_metadata(metadata)
+    return hashlib.sha256(
+        V3_MAGIC + struct.pack('>Q', len(meta)) + meta + struct.pack('>QQ', size, chunk_size) + root
+    ).digest()
+
+
+if hasattr(os, 'pread'):
+    def _read_at(f, offset: int, n: int) -> bytes:
+        # pread no mueve la posición del fichero: los hilos comparten descriptor
+        parts = []
+        while n:
+            data = os.pread(f.fileno(), n, offset)
+            if not data:
+                break
+            parts.append(data)
+            offset += len(data)
+            n -= len(data)
+        return b''.join(parts)
+else:
+    def _read_at(f, offset: int, n: int) -> bytes:
+        with open(f.name, 'rb') as g:
+            g.seek(offset)
+            return g.read(n)
+
+
+def _chunk_digests(image, chunk_size: int, workers: int):
+    """Tamaño y resúmenes de los bloques de ``image``, calculados en paralelo."""
+    # hashlib suelta el GIL con bloques grandes: los hilos usan todos los núcleos
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        view = memoryview(image)
+        size = view.nbytes
+        offsets = range(0, size, chunk_size) or [0]
+        task = lambda offset: _chunk_digest(view[offset:offset + chunk_size])
+        if len(offsets) == 1:
+            return size, [task(0)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return size, list(pool.map(task, offsets))
+
+    with open(image, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        offsets = range(0, size, chunk_size) or [0]
+
+        def task(offset):
+            n = min(chunk_size, size - offset)
+            data = _read_at(f, offset, n)
+            if len(data) != n:
+                raise RuntimeError(f"El fichero cambió durante el hash (bloque en {offset})")
+            return _chunk_digest(data)
+
+        if len(offsets) == 1:
+            return size, [task(0)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return size, list(pool.map(task, offsets))
+
+
+def compute_tree(image, metadata: dict, chunk_size: int = None, workers: int = None):
+    """
+    Hash v3 de ``image`` (ruta o bytes) y su manifiesto: ``{'chunk_size',
+    'size', 'digests'}`` con el resumen hexadecimal de cada bloque.
+    """
+    chunk_size = chunk_size or config.HASH_TREE_CHUNK_SIZE
+    workers = workers or config.HASH_TREE_WORKERS or os.cpu_count() or 1
+    size, digests = _chunk_digests(image, chunk_size, workers)
+    tracing.count('bytes_hashed', size)
+    manifest = {
+        'chunk_size': chunk_size,
+        'size': size,
+        'digests': [d.hex() for d in digests],
+    }
+    return _v3_hash(metadata, size, chunk_size, tree_root(digests)), manifest
+
+
+def hash_with_manifest(image, metadata: dict, version: int = None):
+    """``(hash, manifiesto)``; el manifiesto solo existe en la v3 (si no, ``None``)."""
+    version = version or config.HASH_VERSION
+    if version == HASH_V3:
+        return compute_tree(image, metadata)
+    return compute_hash(image, metadata, version), None
+
+
+def compute_hash(image, metadata: dict, version: int = None) -> bytes:
+    """
+    Genera un hash SHA-256 de la imagen más los metadatos.
+
+    ``image`` puede ser una ruta o los bytes de la imagen. ``version`` elige el
+    formato (por defecto ``config.HASH_VERSION``); la v1 se mantiene para poder
+    verificar los hashes antiguos.
+    """
+    version = version or config.HASH_VERSION
+    if version == HASH_V1:
+        if not isinstance(image, (bytes, bytearray, memoryview)):
+            with open(image, 'rb') as f:
+                image = f.read()
+        tracing.count('bytes_hashed', len(image))
+        return _compute_hash_v1(bytes(image), metadata)
+    if version == HASH_V2:
+        return _compute_hash_v2(image, metadata, config.HASH_CHUNK_SIZE)
+    if version == HASH_V3:
+        return compute_tree(image, metadata)[0]
+    raise ValueError(f"Versión de hash desconocida: {version}")
+
+
+def verify_hash(image, metadata: dict, expected, version: int = HASH_V1) -> bool:
+    """
+    Recalcula el hash con la versión indicada y lo compara con ``expected``
+    (bytes o hexadecimal). Los registros sin versión son v1.
+    """
+    return compute_hash(image, metadata, version) == _as_bytes(expected)
+
+
+def _as_bytes(expected) -> bytes:
+    if isinstance(expected, str):
+        return bytes.fromhex(expected[2:] if expected.startswith('0x') else expected)
+    return expected
+
+
+def verify_manifest(manifest: dict, metadata: dict, expected) -> bool:
+    """Comprueba que los resúmenes del manifiesto producen el hash ``expected``."""
+    digests = [bytes.fromhex(d) for d in manifest['digests']]
+    root = tree_root(digests)
+    return _v3_hash(metadata, manifest['size'], manifest['chunk_size'], root) == _as_bytes(expected)
+
+
+def verify_segment(segment: bytes, first_chunk: int, manifest: dict, metadata: dict, expected) -> bool:
+    """
+    Verifica un tramo que empieza en el bloque ``first_chunk`` y contiene
+    bloques completos (el último puede ser el final del fichero).  Solo se
+    resume el tramo; el resto del fichero no hace falta.
+    """
+    if not segment or not verify_manifest(manifest, metadata, expected):
+        return False
+    chunk_size, size, digests = manifest['chunk_size'], manifest['size'], manifest['digests']
+    view = memoryview(segment)
+    index, pos = first_chunk, 0
+    while pos < len(view):
+        if index < 0 or index >= len(digests):
+            return False
+        n = min(chunk_size, size - index * chunk_size)
+        piece = view[pos:pos + n]
+        if len(piece) != n or _chunk_digest(piece).hex() != digests[index]:
+            return False
+        pos += n
+        index += 1
+    return True
+
+
+def verify_range(path: str, start: int, end: int, manifest: dict, metadata: dict, expected) -> bool:
+    """
+    Verifica los bytes ``[start, end)`` de ``path`` leyendo solo los bloques que
+    los contienen.
+    """
+    chunk_size = manifest['chunk_size']
+    if not 0 <= start < end <= manifest['size']:
+        return False
+    first = start // chunk_size
+    last = (end - 1) // chunk_size
+    with open(path, 'rb') as f:
+        f.seek(first * chunk_size)
+        segment = f.read((last - first + 1) * chunk_size)
+    return verify_segment(segment, first, manifest, metadata, expected)
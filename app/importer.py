@@ -0,0 +1,119 @@
+# app/importer.py
+import os
+import sys
+import mmap
+import time
+import errno
+import shutil
+from pathlib import Path
+from contextlib import contextmanager
+from PIL import Image
+import config
+from app import tracing
+try:
+    import fcntl  # no existe en Windows
+except ImportError:
+    fcntl = None
+
+"""
+Entrada de las fotos capturadas.
+
+* ``import_file`` lleva la foto de la galería a ``tmp_photos`` sin copiar los
+  datos cuando el sistema de archivos lo permite: enlace duro (misma unidad) o
+  reflink (copia perezosa en Btrfs/XFS).  Si no, se copia una sola vez.
+  ``CAPTURE_IMPORT_MODE`` elige qué se intenta: ``auto`` (enlace, reflink,
+  copia), ``reflink`` (reflink o copia: el original se puede editar sin que
+  cambie la foto notarizada) o ``copy``.
+* ``mapped`` proyecta el fichero en memoria una vez; el EXIF, el hash, la
+  dHash y la vista previa se sacan de esa misma proyección.
+* ``make_preview`` decodifica el JPEG ya reducido (``draft``: escalado en el
+  dominio DCT, 1/2, 1/4 o 1/8) en lugar de la imagen completa.
+"""
+
+# ioctl FICLONE de Linux (<linux/fs.h>)
+FICLONE = 0x40049409
+
+
+def _hardlink(src: str, dest: str):
+    os.link(src, dest)
+
+
+def _reflink(src: str, dest: str):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "reflink no disponible")
+    with open(src, 'rb') as s, open(dest, 'xb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.unlink(dest)
+            raise
+    shutil.copystat(src, dest)
+
+
+def _copy(src: str, dest: str):
+    # copyfile usa sendfile/copy_file_range cuando puede: sin pasar por Python
+    shutil.copy2(src, dest)
+
+
+_METHODS = {
+    'auto': (('link', _hardlink), ('reflink', _reflink), ('copy', _copy)),
+    'reflink': (('reflink', _reflink), ('copy', _copy)),
+    'copy': (('copy', _copy),),
+}
+
+
+def import_file(src, dest_dir, mode: str = None) -> str:
+    """
+    Lleva ``src`` a ``dest_dir`` (enlace, reflink o copia, según ``mode``) y
+    devuelve la ruta nueva.  Si el nombre ya existe se le añade un sufijo.
+    """
+    mode = mode or config.CAPTURE_IMPORT_MODE
+    if mode not in _METHODS:
+        raise ValueError(f"CAPTURE_IMPORT_MODE desconocido: {mode}")
+    src = Path(src)
+    dest = Path(dest_dir) / src.name
+    if dest.exists():
+        dest = dest.with_name(f"{src.stem}_{time.time_ns()}{src.suffix}")
+    last_error = None
+    for name, method in _METHODS[mode]:
+        try:
+            method(str(src), str(dest))
+        except OSError as e:
+            last_error = e
+            continue
+        tracing.count('imports', method=name)
+        return str(dest)
+    raise last_error
+
+
+@contextmanager
+def mapped(path):
+    """Proyección en memoria de solo lectura de ``path`` (se usa como fichero)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"La imagen {path} está vacía")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mm
+    finally:
+        mm.close()
+
+
+def preview_path_for(image_path) -> str:
+    return os.path.join(config.PREVIEW_DIR, Path(image_path).stem + '.jpg')
+
+
+def make_preview(image, dest: str, size: int = None) -> str:
+    """
+    Guarda en ``dest`` una vista previa JPEG de ``image`` (ruta o fichero
+    abierto) cuyo lado mayor no pasa de ``size`` píxeles.
+    """
+    size = size or config.PREVIEW_SIZE
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    with Image.open(image) as img:
+        # El JPEG se decodifica ya a la escala DCT más pequeña que cubra ``size``
+        img.draft('RGB', (size, size))
+        img.thumbnail((size, size))
+        img.convert('RGB').save(dest, 'JPEG', quality=config.PREVIEW_QUALITY)
+    return dest
@@ -0,0 +1,223 @@
+# app/indexer.py
+import os
+import sqlite3
+import threading
+import config
+from app.rpc import batch_call
+
+"""
+Índice local de los eventos ``NotarizacionRealizada``.
+
+Los logs se leen con ``eth_getLogs`` por tramos de bloques y se guardan en
+SQLite junto con el último bloque procesado, de modo que cada sincronización
+solo pide los bloques nuevos.  Se guardan también los hashes de los últimos
+``INDEX_REORG_DEPTH`` bloques: si el nodo devuelve otro hash para alguno de
+ellos hubo una reorganización y se deshace el índice hasta el último bloque
+común.
+
+Después, comprobar un hash o listar las notarizaciones de un autor es una
+consulta local, sin ir al nodo.
+"""
+
+EVENT_SIGNATURE = 'NotarizacionRealizada(address,bytes32,uint256)'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notarizaciones (
+    hash TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_notarizaciones_hash ON notarizaciones (hash);
+CREATE INDEX IF NOT EXISTS idx_notarizaciones_autor ON notarizaciones (autor, block_number);
+CREATE TABLE IF NOT EXISTS bloques (
+    number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estado (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+
+def _hex(value) -> str:
+    """Hexadecimal en minúsculas sin prefijo '0x' (str, bytes o HexBytes)."""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    value = str(value).lower()
+    return value[2:] if value.startswith('0x') else value
+
+
+class EventIndex:
+    """Índice SQLite de notarizaciones, sincronizado de forma incremental."""
+
+    def __init__(self, w3, address: str, db_path: str = None, start_block: int = None,
+                 chunk_size: int = None, reorg_depth: int = None):
+        from web3 import Web3
+        self.w3 = w3
+        self.address = Web3.toChecksumAddress(address)
+        self.topic = Web3.keccak(text=EVENT_SIGNATURE).hex()
+        self.start_block = config.INDEX_START_BLOCK if start_block is None else start_block
+        self.chunk_size = chunk_size or config.INDEX_CHUNK_BLOCKS
+        self.reorg_depth = reorg_depth or config.INDEX_REORG_DEPTH
+        db_path = db_path or config.INDEX_DB_PATH
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    # --- Estado --------------------------------------------------------------
+
+    def last_block(self) -> int:
+        """Último bloque indexado (``start_block - 1`` si aún no hay ninguno)."""
+        row = self._db.execute("SELECT valor FROM estado WHERE clave = 'ultimo_bloque'").fetchone()
+        return int(row[0]) if row else self.start_block - 1
+
+    def _set_last_block(self, number: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO estado (clave, valor) VALUES ('ultimo_bloque', ?)", (str(number),)
+        )
+
+    # --- Reorganizaciones ----------------------------------------------------
+
+    def _block_hashes(self, numbers: list) -> dict:
+        """Hashes de los bloques ``numbers`` pedidos en un único lote JSON-RPC."""
+        blocks = batch_call(self.w3, [('eth_getBlockByNumber', [hex(n), False]) for n in numbers])
+        return {n: _hex(b['hash']) for n, b in zip(numbers, blocks)
+                if b and not isinstance(b, Exception)}
+
+    def _rollback_reorg(self) -> int:
+        """
+        Compara los últimos bloques guardados con los del nodo y, si difieren,
+        deshace el índice hasta el último bloque común.  Devuelve los bloques
+        deshechos.
+        """
+        stored = self._db.execute("SELECT number, hash FROM bloques ORDER BY number DESC").fetchall()
+        if not stored:
+            return 0
+        chain = self._block_hashes([n for n, _ in stored])
+        last = self.last_block()
+        common = None
+        for number, block_hash in stored:
+            if chain.get(number) == block_hash:
+                common = number
+                break
+        if common == last:
+            return 0
+        if common is None:
+            # Reorganización más profunda que la ventana: deshacerla entera
+            common = stored[-1][0] - 1
+        self._db.execute("DELETE FROM notarizaciones WHERE block_number > ?", (common,))
+        self._db.execute("DELETE FROM bloques WHERE number > ?", (common,))
+        self._set_last_block(common)
+        self._db.commit()
+        return last - common
+
+    # --- Sincronización ------------------------------------------------------
+
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        return self.w3.eth.get_logs({
+            'address': self.address,
+            'topics': [self.topic],
+            'fromBlock': from_block,
+            'toBlock': to_block,
+        })
+
+    def _store_logs(self, logs: list):
+        rows = []
+        for log in logs:
+            topics = log['topics']
+            rows.append((
+                _hex(topics[2]),
+                self.w3.toChecksumAddress('0x' + _hex(topics[1])[-40:]),
+                int(_hex(log['data']) or '0', 16),
+                log['blockNumber'],
+                _hex(log['transactionHash']),
+                log['logIndex'],
+            ))
+        self._db.executemany("INSERT OR REPLACE INTO notarizaciones VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def sync(self, to_block: int = None) -> int:
+        """
+        Indexa los eventos nuevos hasta ``to_block`` (por defecto, el último
+        bloque).  Devuelve el número de eventos añadidos.
+        """
+        with self._lock:
+            self._rollback_reorg()
+            head = self.w3.eth.block_number if to_block is None else to_block
+            start = self.last_block() + 1
+            added = 0
+            chunk = self.chunk_size
+            while start <= head:
+                end = min(start + chunk - 1, head)
+                try:
+                    logs = self._get_logs(start, end)
+                except ValueError:
+                    # El nodo limita los resultados por petición: tramo más pequeño
+                    if chunk == 1:
+                        raise
+                    chunk = max(1, chunk // 2)
+                    continue
+                self._store_logs(logs)
+                added += len(logs)
+                self._remember_blocks(end, head)
+                self._set_last_block(end)
+                self._db.commit()
+                start = end + 1
+            return added
+
+    def _remember_blocks(self, end: int, head: int):
+        """Guarda los hashes de los bloques de la ventana de reorganización."""
+        low = max(self.start_block, head - self.reorg_depth + 1)
+        numbers = [n for n in range(low, end + 1)]
+        if not numbers:
+            return
+        hashes = self._block_hashes(numbers)
+        self._db.executemany("INSERT OR REPLACE INTO bloques VALUES (?, ?)", hashes.items())
+        self._db.execute("DELETE FROM bloques WHERE number <= ?", (head - self.reorg_depth,))
+
+    # --- Consultas locales ---------------------------------------------------
+
+    def lookup(self, photo_hash) -> dict:
+        """Primera notarización de ``photo_hash`` (bytes o hex) o ``None``."""
+        row = self._db.execute(
+            "SELECT hash, autor, timestamp, block_number, tx_hash FROM notarizaciones "
+            "WHERE hash = ? ORDER BY block_number LIMIT 1", (_hex(photo_hash),)
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def is_notarized(self, photo_hash) -> bool:
+        return self.lookup(photo_hash) is not None
+
+    def by_author(self, autor: str, limit: int = 1000, offset: int = 0) -> list:
+        """Notarizaciones de ``autor``, de la más antigua a la más reciente."""
+        rows = self._db.execute(
+            "SELECT hash, autor, timestamp, block_number, tx_hash FROM notarizaciones "
+            "WHERE autor = ? ORDER BY block_number LIMIT ? OFFSET ?",
+            (self.w3.toChecksumAddress(autor), limit, offset)
+        ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def close(self):
+        self._db.close()
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        'hash': row[0],
+        'autor': row[1],
+        'timestamp': row[2],
+        'block_number': row[3],
+        'tx_hash': row[4],
+    }
+
+
+def open_index() -> EventIndex:
+    """Índice del contrato configurado, con el cliente Web3 de la aplicación."""
+    from app.blockchain import get_w3
+    return EventIndex(get_w3(), config.CONTRACT_ADDRESS)
@@ -1,5 +1,7 @@
 # app/keystore.py
 import os
+import time
+import threading
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.backends import default_backend
@@ -16,6 +18,9 @@ fotografías.  La clave privada se almacena en un fichero PEM cifrado.
   - En otras plataformas se utiliza el directorio personal del usuario (`~`).
 * La contraseña de cifrado se puede establecer mediante la variable de entorno
   ``NOTARIZACION_KEY_PASSWORD``.  Si no se define, se usa una contraseña por defecto.
+* Descifrar el PEM es lento a propósito, así que ``session`` mantiene la clave
+  desbloqueada en memoria y la vuelve a bloquear tras ``KEY_SESSION_TTL_S``
+  segundos sin uso.
 """
 
 from kivy.utils import platform as kivy_platform
@@ -82,5 +87,89 @@ def load_public_key():
     """
     Devuelve la clave pública asociada a la privada.
     """
-    private_key = load_private_key()
-    return private_key.public_key()
\ No newline at end of file
+    return session.public_key
+
+
+class SignerSession:
+    """
+    Clave privada desbloqueada en memoria, junto con la cuenta Ethereum y la
+    clave pública derivadas.  Acceder a ``private_key``, ``public_key`` o
+    ``account`` desbloquea la sesión si hace falta y renueva el plazo de uso.
+    """
+
+    def __init__(self, idle_ttl: float = None):
+        self.idle_ttl = config.KEY_SESSION_TTL_S if idle_ttl is None else idle_ttl
+        self._lock = threading.RLock()
+        self._private_key = None
+        self._public_key = None
+        self._account = None
+        self._last_used = 0.0
+        self._timer = None
+
+    @property
+    def is_unlocked(self) -> bool:
+        return self._private_key is not None
+
+    def unlock(self):
+        """Descifra la clave del disco y deriva la cuenta y la clave pública."""
+        from eth_account import Account
+        with self._lock:
+            if self._private_key is None:
+                private_key = load_private_key()
+                priv_int = private_key.private_numbers().private_value
+                self._account = Account.from_key(priv_int.to_bytes(32, byteorder='big'))
+                self._public_key = private_key.public_key()
+                self._private_key = private_key
+            self._last_used = time.monotonic()
+            self._schedule(self.idle_ttl)
+        return self
+
+    def lock(self):
+        """Olvida la clave y todo lo derivado de ella."""
+        with self._lock:
+            self._private_key = None
+            self._public_key = None
+            self._account = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _schedule(self, delay: float):
+        if self.idle_ttl <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Timer(delay, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            self._timer = None
+            if self._private_key is None:
+                return
+            remaining = self._last_used + self.idle_ttl - time.monotonic()
+            if remaining > 0:
+                # Se usó mientras tanto: esperar lo que queda
+                self._schedule(remaining)
+            else:
+                self.lock()
+
+    def _get(self, attr: str):
+        with self._lock:
+            self.unlock()
+            return getattr(self, attr)
+
+    @property
+    def private_key(self):
+        return self._get('_private_key')
+
+    @property
+    def public_key(self):
+        return self._get('_public_key')
+
+    @property
+    def account(self):
+        return self._get('_account')
+
+
+# Sesión de firma compartida por blockchain y wallet
+session = SignerSession()
\ No newline at end of file
@@ -0,0 +1,65 @@
+# app/merkle.py
+import hashlib
+
+"""
+Árbol Merkle SHA-256 compatible con ``Notarizacion.verificarInclusion``.
+
+* Hoja: ``sha256(0x00 || hash_foto)``.
+* Nodo interno: ``sha256(0x01 || min(a, b) || max(a, b))``.  Al ordenar el par
+  la prueba no necesita indicar el lado de cada hermano.
+* Si un nivel tiene un número impar de nodos, el último sube sin cambios.
+"""
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def leaf_hash(photo_hash: bytes) -> bytes:
+    """Hash de hoja para el hash de una foto."""
+    return hashlib.sha256(LEAF_PREFIX + photo_hash).digest()
+
+
+def node_hash(a: bytes, b: bytes) -> bytes:
+    """Hash de un nodo interno a partir de sus dos hijos (par ordenado)."""
+    if b < a:
+        a, b = b, a
+    return hashlib.sha256(NODE_PREFIX + a + b).digest()
+
+
+def build_levels(photo_hashes: list) -> list:
+    """Devuelve todos los niveles del árbol, de las hojas a la raíz."""
+    if not photo_hashes:
+        raise ValueError("No se puede construir un árbol Merkle vacío")
+    level = [leaf_hash(h) for h in photo_hashes]
+    levels = [level]
+    while len(level) > 1:
+        nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+        levels.append(level)
+    return levels
+
+
+def merkle_root(photo_hashes: list) -> bytes:
+    """Raíz del árbol construido sobre ``photo_hashes``."""
+    return build_levels(photo_hashes)[-1][0]
+
+
+def merkle_proof(levels: list, index: int) -> list:
+    """Prueba de inclusión (lista de hermanos) de la hoja ``index``."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify_proof(photo_hash: bytes, proof: list, root: bytes) -> bool:
+    """Comprueba que ``photo_hash`` pertenece al árbol de raíz ``root``."""
+    node = leaf_hash(photo_hash)
+    for sibling in proof:
+        node = node_hash(node, sibling)
+    return node == root
@@ -1,7 +1,7 @@
 # app/metadata.py
 from PIL import Image
 import piexif
-from utils.sensors import get_accelerometer, get_gyroscope
+from utils.sensors import get_accelerometer, get_gyroscope, get_sampler
 import os
 import platform
 import uuid
@@ -45,7 +45,14 @@ def extract_exif(image_path: str) -> dict:
         return {}
 
 def extract_sensors() -> dict:
-    """Lee datos de acelerómetro y giroscopio."""
+    """
+    Lee datos de acelerómetro y giroscopio.  Si el muestreador en segundo plano
+    está en marcha devuelve el resumen de los últimos ``SENSOR_WINDOW_MS`` ms
+    (media, varianza, mínimo y máximo por eje) sin esperar al sensor.
+    """
+    sampler = get_sampler()
+    if sampler.running:
+        return sampler.summary()
     try:
         accel = get_accelerometer()
     except Exception:
@@ -0,0 +1,230 @@
+# app/nonce.py
+import time
+import math
+import threading
+import config
+from app.rpc import batch_call, raise_errors, to_int
+
+"""
+Gestión local del nonce de la cuenta.
+
+El nonce se pide al nodo una sola vez y después se incrementa en memoria, así
+que se pueden firmar y enviar muchas transacciones seguidas sin esperar a la
+confirmación de la anterior.  Se vuelve a sincronizar con el nodo si un envío
+falla o si se detecta un hueco (el nodo espera un nonce menor que el de todas
+las transacciones en vuelo).  Los nonces que quedan libres por debajo de una
+transacción firmada y aún sin enviar se reparten antes que los nuevos, para que
+ésta no se quede esperando un nonce que nadie va a usar.
+
+Las transacciones que superan ``TX_STUCK_TIMEOUT_S`` sin minarse se sustituyen
+por la misma transacción, con el mismo nonce y un precio de gas un
+``GAS_BUMP_PERCENT`` mayor.  Con ``start()`` un hilo lo comprueba cada
+``TX_STUCK_CHECK_INTERVAL_S`` y avisa a ``on_replaced`` de cada reemplazo.
+"""
+
+# Campos de precio que se suben al reemplazar una transacción
+FEE_FIELDS = ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+
+
+def bump_fee(value: int, percent: float) -> int:
+    """Sube ``value`` un ``percent`` %, siempre al menos 1 wei."""
+    return max(value + 1, math.ceil(value * (100 + percent) / 100))
+
+
+class NonceManager:
+    """Reparte nonces consecutivos y vigila las transacciones en vuelo."""
+
+    def __init__(self, w3, address: str, sign, stuck_timeout: float = None, bump_percent: float = None,
+                 on_replaced=None):
+        self.w3 = w3
+        self.address = address
+        self.sign = sign  # callable(tx: dict) -> transacción firmada
+        self.stuck_timeout = stuck_timeout or config.TX_STUCK_TIMEOUT_S
+        self.bump_percent = bump_percent or config.GAS_BUMP_PERCENT
+        self.on_replaced = on_replaced  # callable(hash_anterior, transacción firmada nueva)
+        self._lock = threading.Lock()
+        self._next = None
+        self._in_flight = {}  # nonce -> {'tx', 'hash', 'sent_at'}
+        self._reserved = set()  # reservados y todavía sin firmar
+        self._free = []  # huecos por debajo de _next, de menor a mayor
+        self._stop = threading.Event()
+        self._thread = None
+
+    def resync(self):
+        """
+        Vuelve a leer el nonce del nodo y descarta lo que ya no está en vuelo.
+        Si el nodo no responde, la siguiente ``reserve()`` lo vuelve a intentar.
+        """
+        with self._lock:
+            try:
+                self._resync_locked()
+            except Exception:
+                self._next = None
+                raise
+
+    @property
+    def synced(self) -> bool:
+        return self._next is not None
+
+    def sync_calls(self) -> list:
+        """Llamadas JSON-RPC de la sincronización, para agruparlas con otras."""
+        return [
+            ('eth_getTransactionCount', [self.address, 'pending']),
+            ('eth_getTransactionCount', [self.address, 'latest']),
+        ]
+
+    def apply_sync(self, pending, mined):
+        """Sincroniza con los resultados de ``sync_calls`` ya obtenidos."""
+        with self._lock:
+            self._apply_sync_locked(to_int(pending), to_int(mined))
+
+    def _resync_locked(self):
+        pending, mined = raise_errors(batch_call(self.w3, self.sync_calls()))
+        self._apply_sync_locked(to_int(pending), to_int(mined))
+
+    def _apply_sync_locked(self, pending: int, mined: int):
+        # Lo minado ya no está en vuelo; lo enviado que el nodo no conoce se
+        # reutiliza.  Lo firmado y todavía sin enviar conserva su nonce.
+        self._in_flight = {
+            n: entry for n, entry in self._in_flight.items()
+            if n >= mined and (n < pending or entry['sent_at'] is None)
+        }
+        self._reserved = {n for n in self._reserved if n >= mined}
+        taken = set(self._in_flight) | self._reserved
+        self._next = max([pending] + [n + 1 for n in taken])
+        # Nonces descartados por debajo de lo que se conserva: se reparten primero
+        self._free = [n for n in range(pending, self._next) if n not in taken]
+
+    def reserve(self) -> int:
+        """Devuelve el siguiente nonce libre."""
+        with self._lock:
+            if self._next is None:
+                self._resync_locked()
+            if self._free:
+                nonce = self._free.pop(0)
+            else:
+                nonce = self._next
+                self._next += 1
+            self._reserved.add(nonce)
+            return nonce
+
+    def release(self, nonce: int):
+        """Devuelve un nonce reservado que no se va a usar (se reparte el siguiente)."""
+        with self._lock:
+            if nonce not in self._reserved:
+                return
+            self._reserved.discard(nonce)
+            if nonce == self._next - 1:
+                self._next -= 1
+            else:
+                self._free.append(nonce)
+                self._free.sort()
+
+    def track(self, nonce: int, signed_tx, tx: dict):
+        """Registra una transacción firmada con ``nonce`` (aún sin enviar)."""
+        with self._lock:
+            self._reserved.discard(nonce)
+            self._in_flight[nonce] = {'tx': tx, 'hash': signed_tx.hash.hex(), 'sent_at': None}
+
+    def mark_sent(self, signed_tx):
+        """Marca como enviada la transacción firmada."""
+        tx_hash = signed_tx.hash.hex()
+        with self._lock:
+            for entry in self._in_flight.values():
+                if entry['hash'] == tx_hash:
+                    entry['sent_at'] = time.monotonic()
+                    return
+
+    def discard(self, signed_tx):
+        """Olvida una transacción cuyo envío ha fallado."""
+        tx_hash = signed_tx.hash.hex()
+        with self._lock:
+            for n, entry in list(self._in_flight.items()):
+                if entry['hash'] == tx_hash:
+                    del self._in_flight[n]
+
+    def in_flight(self) -> int:
+        """Número de transacciones enviadas y aún sin minar."""
+        return len(self._in_flight)
+
+    def check_gap(self) -> bool:
+        """
+        Comprueba si el nodo espera un nonce que ninguna transacción en vuelo
+        cubre (por ejemplo, un envío perdido).  En ese caso resincroniza.
+        """
+        with self._lock:
+            if not self._in_flight:
+                return False
+            mined = self.w3.eth.get_transaction_count(self.address, 'latest')
+            for n in [n for n in self._in_flight if n < mined]:
+                del self._in_flight[n]
+            if (self._in_flight and mined not in self._in_flight and mined not in self._reserved
+                    and mined < self._next):
+                self._resync_locked()
+                return True
+            return False
+
+    def stuck(self) -> list:
+        """Nonces enviados hace más de ``stuck_timeout`` segundos y aún sin minar."""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                n for n, entry in self._in_flight.items()
+                if entry['sent_at'] is not None and now - entry['sent_at'] >= self.stuck_timeout
+            )
+
+    def replace_stuck(self) -> list:
+        """
+        Reenvía cada transacción atascada con el mismo nonce y el precio de gas
+        subido.  Devuelve los hashes de las transacciones de reemplazo; cada
+        reemplazo se comunica también a ``on_replaced``.
+        """
+        self.check_gap()
+        replaced = []
+        for nonce in self.stuck():
+            with self._lock:
+                entry = self._in_flight.get(nonce)
+                if entry is None:
+                    continue
+                tx = dict(entry['tx'])
+            for field in FEE_FIELDS:
+                if field in tx:
+                    tx[field] = bump_fee(tx[field], self.bump_percent)
+            signed_tx = self.sign(tx)
+            try:
+                self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            except ValueError:
+                # Se minó entre medias o el nodo rechaza el precio: resincronizar
+                self.resync()
+                continue
+            with self._lock:
+                old_hash = entry['hash']
+                self._in_flight[nonce] = {
+                    'tx': tx, 'hash': signed_tx.hash.hex(), 'sent_at': time.monotonic()
+                }
+            replaced.append(signed_tx.hash.hex())
+            if self.on_replaced is not None:
+                self.on_replaced(old_hash, signed_tx)
+        return replaced
+
+    def start(self, interval: float = None):
+        """Arranca el hilo que reemplaza las transacciones atascadas."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        interval = interval or config.TX_STUCK_CHECK_INTERVAL_S
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.replace_stuck()
+            except Exception as e:
+                print(f"Error reemplazando transacciones atascadas: {e}")
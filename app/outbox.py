@@ -0,0 +1,385 @@
+# app/outbox.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import config
+from app import tracing
+
+"""
+Bandeja de salida duradera de trabajos de notarización (SQLite en modo WAL).
+
+Cada foto procesada es un trabajo que avanza por los estados::
+
+    hashed -> signed -> sent -> confirmed
+                    \\-> failed
+
+La transacción firmada se guarda antes de enviarla, así que tras un cierre
+inesperado ``resume()`` libera los trabajos que estaban reclamados, reenvía
+los firmados y vuelve a vigilar los enviados.  Varios
+hilos o procesos pueden reclamar trabajos a la vez: la reclamación se hace
+dentro de una transacción ``BEGIN IMMEDIATE``.
+"""
+
+HASHED = 'hashed'
+SIGNED = 'signed'
+SENT = 'sent'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    photo_hash TEXT NOT NULL UNIQUE,
+    image_path TEXT NOT NULL,
+    record TEXT NOT NULL,
+    state TEXT NOT NULL,
+    raw_tx TEXT,
+    tx_hash TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_at REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (state, id);
+"""
+
+_COLUMNS = ('id', 'photo_hash', 'image_path', 'record', 'state', 'raw_tx', 'tx_hash',
+            'attempts', 'claimed_by', 'claimed_at', 'error', 'created_at', 'updated_at')
+
+
+def _row(row) -> dict:
+    job = dict(zip(_COLUMNS, row))
+    job['record'] = json.loads(job['record'])
+    return job
+
+
+class Outbox:
+    """Cola persistente de trabajos con estados y reclamación concurrente."""
+
+    def __init__(self, db_path: str = None):
+        db_path = db_path or config.OUTBOX_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # isolation_level=None: las transacciones se abren explícitamente
+        self._db = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """Agrupa varias escrituras en un único commit."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # --- Alta ----------------------------------------------------------------
+
+    def add_many(self, records: list) -> list:
+        """Añade registros en estado ``hashed`` en un solo commit. Devuelve sus ids."""
+        now = time.time()
+        ids = []
+        with self.transaction() as db:
+            for record in records:
+                db.execute(
+                    "INSERT OR IGNORE INTO trabajos (photo_hash, image_path, record, state, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (record['photo_hash'], record['image_path'], json.dumps(record), HASHED, now, now)
+                )
+                ids.append(db.execute("SELECT id FROM trabajos WHERE photo_hash = ?",
+                                      (record['photo_hash'],)).fetchone()[0])
+        return ids
+
+    def add(self, record: dict) -> int:
+        return self.add_many([record])[0]
+
+    # --- Reclamación ---------------------------------------------------------
+
+    def claim(self, worker_id: str, states=(HASHED,), limit: int = 1, job_id: int = None) -> list:
+        """
+        Reclama hasta ``limit`` trabajos libres en ``states`` (o el trabajo
+        ``job_id``) para ``worker_id``.  Ningún otro trabajador los recibirá
+        hasta que se liberen.
+        """
+        marks = ','.join('?' * len(states))
+        query = f"SELECT id FROM trabajos WHERE state IN ({marks}) AND claimed_by IS NULL"
+        params = list(states)
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self.transaction(immediate=True) as db:
+            ids = [r[0] for r in db.execute(query, params)]
+            if not ids:
+                return []
+            id_marks = ','.join('?' * len(ids))
+            db.execute(
+                f"UPDATE trabajos SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1 "
+                f"WHERE id IN ({id_marks})", [worker_id, time.time()] + ids
+            )
+            rows = db.execute(f"SELECT {', '.join(_COLUMNS)} FROM trabajos WHERE id IN ({id_marks})", ids)
+            return [_row(r) for r in rows]
+
+    def update(self, job_id: int, state: str, release: bool = False, **fields):
+        """Cambia el estado de un trabajo (y otros campos); opcionalmente lo libera."""
+        self.update_many([(job_id, state, fields)], release=release)
+
+    def update_many(self, updates: list, release: bool = False):
+        """Aplica ``[(id, estado, campos)]`` en un solo commit."""
+        now = time.time()
+        with self.transaction() as db:
+            for job_id, state, fields in updates:
+                fields = dict(fields)
+                if 'record' in fields:
+                    fields['record'] = json.dumps(fields['record'])
+                sets = ['state = ?', 'updated_at = ?'] + [f"{k} = ?" for k in fields]
+                values = [state, now] + list(fields.values())
+                if release:
+                    sets.append('claimed_by = NULL')
+                db.execute(f"UPDATE trabajos SET {', '.join(sets)} WHERE id = ?", values + [job_id])
+
+    def replace_tx(self, job_id: int, tx_hash: str, raw_tx: str = None):
+        """
+        Apunta el trabajo a la transacción que ha reemplazado a la suya (mismo
+        nonce, más gas), para que ``resume()`` reenvíe y vigile la nueva.
+        """
+        with self.transaction() as db:
+            row = db.execute("SELECT record, raw_tx FROM trabajos WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            record = json.loads(row[0])
+            record['tx_hash'] = tx_hash
+            db.execute(
+                "UPDATE trabajos SET tx_hash = ?, raw_tx = ?, record = ?, updated_at = ? WHERE id = ?",
+                (tx_hash, raw_tx or row[1], json.dumps(record), time.time(), job_id)
+            )
+
+    def release(self, job_id: int):
+        with self.transaction() as db:
+            db.execute("UPDATE trabajos SET claimed_by = NULL WHERE id = ?", (job_id,))
+
+    # --- Consulta y recuperación ---------------------------------------------
+
+    def get(self, job_id: int) -> dict:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM trabajos WHERE id = ?", (job_id,)).fetchone()
+        return _row(row) if row else None
+
+    def by_state(self, state: str, limit: int = 1000) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM trabajos WHERE state = ? ORDER BY id LIMIT ?", (state, limit)
+            ).fetchall()
+        return [_row(r) for r in rows]
+
+    def pending_paths(self) -> set:
+        """Rutas reales de las fotos de trabajos que aún no han terminado."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT image_path FROM trabajos WHERE state NOT IN (?, ?)", (CONFIRMED, FAILED)
+            ).fetchall()
+        return {os.path.realpath(r[0]) for r in rows}
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM trabajos GROUP BY state").fetchall())
+
+    def recover(self, stale_after: float = 0) -> int:
+        """
+        Libera los trabajos reclamados hace más de ``stale_after`` segundos (al
+        arrancar, todos: su trabajador ya no existe).  Devuelve cuántos.
+        """
+        with self.transaction() as db:
+            cur = db.execute(
+                "UPDATE trabajos SET claimed_by = NULL WHERE claimed_by IS NOT NULL AND claimed_at <= ?",
+                (time.time() - stale_after,)
+            )
+            return cur.rowcount
+
+    def close(self):
+        self._db.close()
+
+
+# --- Envío ---------------------------------------------------------------------
+
+def _send_signed(outbox: Outbox, job_id: int, record: dict) -> str:
+    """
+    Construye la transacción del registro ya firmado con el siguiente nonce, la
+    guarda y la envía.  Si el nodo la rechaza, ``send_transaction`` descarta
+    ese nonce: la transacción guardada ya no vale y se borra, para que el
+    siguiente intento la vuelva a firmar en lugar de reenviarla.
+    """
+    from app.blockchain import build_transaction, send_transaction
+
+    signed_tx = build_transaction(bytes.fromhex(record['photo_hash']), bytes.fromhex(record['signature']),
+                                  record['public_key'])
+    outbox.update(job_id, SIGNED, record=record, raw_tx=signed_tx.rawTransaction.hex(),
+                  tx_hash=signed_tx.hash.hex())
+    try:
+        return send_transaction(signed_tx)
+    except ValueError:
+        outbox.update(job_id, SIGNED, raw_tx=None, tx_hash=None)
+        raise
+
+
+def _mined(tx_hash: str) -> bool:
+    """Si la transacción ``tx_hash`` ya tiene recibo."""
+    from app.blockchain import get_w3
+    from app.rpc import batch_call
+
+    receipt = batch_call(get_w3(), [('eth_getTransactionReceipt', [tx_hash])])[0]
+    return bool(receipt) and not isinstance(receipt, Exception)
+
+
+def submit_job(outbox: Outbox, job: dict, report=None, check_cancelled=None) -> str:
+    """
+    Firma (si hace falta) y envía el trabajo reclamado ``job``.  La transacción
+    firmada se guarda antes de enviarla, de modo que un trabajo ``signed`` se
+    reenvía tal cual; si su nonce ya está usado por otra transacción, o el
+    envío anterior falló y se borró, se vuelve a firmar con un nonce nuevo.
+    Devuelve el hash de la transacción.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from app.wallet import sign_hash
+    from app.keystore import load_public_key, session
+    from app.blockchain import send_raw_transaction
+
+    record = job['record']
+    if job['state'] == HASHED:
+        if report is not None:
+            report('signing')
+        photo_hash = bytes.fromhex(record['photo_hash'])
+        with tracing.span('key_unlock'):
+            session.unlock()
+        fmt = config.SIGNATURE_FORMAT
+        with tracing.span('sign_hash'):
+            signature = sign_hash(photo_hash, fmt=fmt)
+        public_key = load_public_key()
+        if check_cancelled is not None:
+            check_cancelled()
+        record['signature'] = signature.hex()
+        record['signature_format'] = fmt
+        record['public_key'] = public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+        tx_hash = _send_signed(outbox, job['id'], record)
+    elif job['raw_tx'] is None:
+        with tracing.span('key_unlock'):
+            session.unlock()
+        tx_hash = _send_signed(outbox, job['id'], record)
+    else:
+        try:
+            tx_hash = send_raw_transaction(bytes.fromhex(job['raw_tx'][2:]))
+        except ValueError as e:
+            if 'known' in str(e):
+                # Ya estaba en el mempool antes del cierre
+                tx_hash = job['tx_hash']
+            elif 'nonce too low' not in str(e):
+                raise
+            elif _mined(job['tx_hash']):
+                # Se minó antes del cierre: no hay que volver a enviarla
+                tx_hash = job['tx_hash']
+            else:
+                # Otra transacción ocupó el nonce: firmar de nuevo con uno libre
+                with tracing.span('key_unlock'):
+                    session.unlock()
+                tx_hash = _send_signed(outbox, job['id'], record)
+    record['tx_hash'] = tx_hash
+    outbox.update(job['id'], SENT, record=record, tx_hash=tx_hash)
+    if report is not None:
+        report('submitted', tx_hash)
+    return tx_hash
+
+
+def track_job(outbox: Outbox, job_id: int, tx_hash: str, timeout: float = None):
+    """
+    Vigila la transacción del trabajo sin bloquear; al resolverse lo marca
+    ``confirmed`` o ``failed`` y lo libera.  Devuelve el Future del recibo.
+    """
+    from app.blockchain import track_confirmation
+    from app.receipts import receipt_succeeded
+    from app.phash import get_index
+
+    def done(future):
+        try:
+            receipt = future.result()
+            ok = receipt_succeeded(receipt)
+            error = None if ok else 'La transacción se revirtió'
+            # Tras un reemplazo se puede minar cualquiera de las dos
+            mined = receipt.get('transactionHash')
+            if mined and outbox.get(job_id)['tx_hash'] != mined:
+                outbox.replace_tx(job_id, mined)
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        outbox.update(job_id, CONFIRMED if ok else FAILED, release=True, error=error)
+        record = outbox.get(job_id)['record']
+        if ok and record.get('phash'):
+            get_index().add(int(record['phash'], 16), record['photo_hash'])
+
+    def replaced(old_hash, new_hash, raw_tx):
+        outbox.replace_tx(job_id, new_hash, raw_tx)
+
+    return track_confirmation(tx_hash, callback=done, timeout=timeout or config.OUTBOX_CONFIRM_TIMEOUT_S,
+                              on_replaced=replaced)
+
+
+def process_jobs(outbox: Outbox, worker_id: str, states=(HASHED, SIGNED), limit: int = None) -> int:
+    """
+    Un ciclo de un trabajador de envío: reclama trabajos en ``states``, los
+    envía y deja su confirmación al seguimiento compartido.  Un fallo devuelve
+    el trabajo a la cola hasta ``OUTBOX_MAX_ATTEMPTS`` intentos.  Devuelve
+    cuántos trabajos ha reclamado.
+    """
+    jobs = outbox.claim(worker_id, states=states, limit=limit or config.OUTBOX_CLAIM_BATCH)
+    for job in jobs:
+        try:
+            with tracing.capture(job['record'].get('capture_id')):
+                tx_hash = submit_job(outbox, job)
+        except Exception as e:
+            current = outbox.get(job['id'])['state']
+            state = FAILED if job['attempts'] >= config.OUTBOX_MAX_ATTEMPTS else current
+            outbox.update(job['id'], state, release=True, error=str(e))
+            continue
+        track_job(outbox, job['id'], tx_hash)
+    return len(jobs)
+
+
+def resume(outbox: Outbox) -> dict:
+    """
+    Recuperación al arrancar: libera las reclamaciones huérfanas, reenvía las
+    transacciones firmadas que no llegaron a enviarse y vuelve a vigilar las
+    enviadas.  Los trabajos ``hashed`` esperan a que el usuario los confirme.
+    """
+    released = outbox.recover()
+    sent = outbox.by_state(SENT, limit=-1)
+    for job in sent:
+        track_job(outbox, job['id'], job['tx_hash'])
+    resent = 0
+    while True:
+        claimed = process_jobs(outbox, f"recover-{os.getpid()}", states=(SIGNED,))
+        if not claimed:
+            break
+        resent += claimed
+    return {'released': released, 'tracking': len(sent), 'resent': resent}
+
+
+_outbox = None
+
+
+def get_outbox() -> Outbox:
+    """Bandeja de salida compartida por la aplicación."""
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
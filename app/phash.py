@@ -0,0 +1,165 @@
+# app/phash.py
+import os
+import sqlite3
+import threading
+import numpy as np
+from PIL import Image
+import config
+
+"""
+Huella perceptual (dHash de 64 bits) para detectar casi-duplicados.
+
+El hash exacto de la foto incluye los metadatos de sensores y dispositivo, así
+que dos fotos de una ráfaga o dos exportaciones de la misma imagen pagan cada
+una su transacción.  La dHash compara el brillo de píxeles vecinos en una
+miniatura de 9x8 y cambia muy poco entre imágenes casi iguales: se considera
+casi-duplicado todo lo que esté a una distancia de Hamming menor o igual que
+``PHASH_THRESHOLD``.
+
+Las huellas ya notarizadas se guardan en SQLite y se cargan en un árbol BK,
+donde buscar por distancia no exige comparar con todas.
+"""
+
+HASH_SIZE = 8
+
+
+def _thumbnail(image_path) -> np.ndarray:
+    """Miniatura en escala de grises de (HASH_SIZE) x (HASH_SIZE + 1) píxeles."""
+    with Image.open(image_path) as img:
+        # En JPEG, draft() decodifica ya reducido (escalado DCT): mucho más rápido
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+        return np.asarray(small, dtype=np.int16)
+
+
+def dhash_batch(image_paths: list) -> np.ndarray:
+    """dHash de varias imágenes a la vez; devuelve un array ``uint64``."""
+    if not image_paths:
+        return np.zeros(0, dtype=np.uint64)
+    stack = np.stack([_thumbnail(p) for p in image_paths])       # (N, 8, 9)
+    bits = stack[:, :, 1:] > stack[:, :, :-1]                     # (N, 8, 8)
+    packed = np.packbits(bits.reshape(len(image_paths), -1), axis=1)  # (N, 8) bytes
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+
+def dhash(image_path) -> int:
+    """dHash de una imagen (ruta o fichero abierto) como entero de 64 bits."""
+    return int(dhash_batch([image_path])[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Árbol BK sobre la distancia de Hamming."""
+
+    def __init__(self):
+        self._root = None  # [huella, valor, {distancia: hijo}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, fingerprint: int, value):
+        self._size += 1
+        node = [fingerprint, value, {}]
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            d = hamming(fingerprint, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def search(self, fingerprint: int, radius: int) -> list:
+        """Pares (distancia, valor) a distancia <= ``radius``, de menor a mayor."""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(fingerprint, node[0])
+            if d <= radius:
+                found.append((d, node[1]))
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return sorted(found, key=lambda x: x[0])
+
+
+def _to_signed(fp: int) -> int:
+    # SQLite guarda enteros de 64 bits con signo
+    return fp - (1 << 64) if fp >= (1 << 63) else fp
+
+
+class DuplicateIndex:
+    """Huellas de las fotos ya notarizadas, persistidas y en un árbol BK."""
+
+    def __init__(self, db_path: str = None, threshold: int = None):
+        db_path = db_path or config.PHASH_DB_PATH
+        self.threshold = config.PHASH_THRESHOLD if threshold is None else threshold
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS huellas (photo_hash TEXT PRIMARY KEY, fp INTEGER NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        for photo_hash, fp in self._db.execute("SELECT photo_hash, fp FROM huellas"):
+            self._tree.add(fp % (1 << 64), photo_hash)
+
+    def find(self, fingerprint: int):
+        """Hash de la foto notarizada más parecida, o ``None`` si no hay ninguna cerca."""
+        with self._lock:
+            matches = self._tree.search(fingerprint, self.threshold)
+        return matches[0][1] if matches else None
+
+    def add(self, fingerprint: int, photo_hash: str, commit: bool = True):
+        """Añade una huella; con ``commit=False`` se agrupan las escrituras."""
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO huellas VALUES (?, ?)", (photo_hash, _to_signed(fingerprint))
+            )
+            if commit:
+                self._db.commit()
+            if cur.rowcount:
+                self._tree.add(fingerprint, photo_hash)
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+
+def group_near_duplicates(fingerprints: list, threshold: int = None) -> list:
+    """
+    Agrupa las posiciones de ``fingerprints`` cuyas huellas están a distancia
+    <= ``threshold`` de la primera de su grupo (p. ej. una ráfaga).
+    """
+    threshold = config.PHASH_THRESHOLD if threshold is None else threshold
+    tree = BKTree()
+    groups = []
+    for i, fp in enumerate(fingerprints):
+        matches = tree.search(fp, threshold)
+        if matches:
+            groups[matches[0][1]].append(i)
+        else:
+            tree.add(fp, len(groups))
+            groups.append([i])
+    return groups
+
+
+_index = None
+
+
+def get_index() -> DuplicateIndex:
+    """Índice de casi-duplicados compartido por la aplicación."""
+    global _index
+    if _index is None:
+        _index = DuplicateIndex()
+    return _index
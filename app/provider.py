@@ -0,0 +1,29 @@
+# app/provider.py
+from web3.providers.base import JSONBaseProvider
+from app.rpc import EndpointPool
+
+"""
+Proveedor de web3 sobre ``rpc.EndpointPool``: todas las llamadas de web3 usan
+las conexiones keep-alive del pool y cambian de nodo si el actual falla.  Va
+en un módulo aparte porque importa web3, que es lento de cargar.
+"""
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Proveedor HTTP con varios nodos, selección por latencia y conmutación."""
+
+    def __init__(self, pool: EndpointPool = None):
+        super().__init__()
+        self.pool = pool or EndpointPool()
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.pool.best_url
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        raw_response = self.pool.post(request_data)
+        return self.decode_rpc_response(raw_response)
+
+    def __str__(self):
+        return f"RPC connection {[e.url for e in self.pool.endpoints]}"
@@ -0,0 +1,185 @@
+# app/receipts.py
+import time
+import threading
+from concurrent.futures import Future
+import config
+from app.rpc import batch_call, to_int
+from app import tracing
+
+"""
+Seguimiento de confirmaciones para todas las transacciones en vuelo.
+
+Un único hilo consulta el número de bloque y, solo cuando aparece un bloque
+nuevo, pide los recibos de todas las transacciones pendientes en lotes
+JSON-RPC.  El número de peticiones por bloque no crece con el número de
+transacciones (salvo una petición más cada ``RPC_BATCH_SIZE`` hashes).
+
+Cada transacción se resuelve cuando su recibo alcanza ``CONFIRMATIONS``
+bloques de profundidad.  Los recibos se vuelven a pedir en cada bloque hasta
+entonces, así que un recibo que desaparece por una reorganización vuelve a
+quedar pendiente.
+
+Si una transacción se reemplaza (mismo nonce, más gas), ``replace`` vigila
+también la nueva y el futuro se resuelve con el recibo de la que se mine.
+"""
+
+
+def _normalize(tx_hash: str) -> str:
+    return tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+
+
+class ConfirmationTracker:
+    """Resuelve futuros/callbacks cuando las transacciones se confirman."""
+
+    def __init__(self, w3, confirmations: int = None, poll_interval: float = None, batch_size: int = None):
+        self.w3 = w3
+        self.confirmations = confirmations or config.CONFIRMATIONS
+        self.poll_interval = poll_interval or config.RECEIPT_POLL_INTERVAL_S
+        self.batch_size = batch_size or config.RPC_BATCH_SIZE
+        # tx_hash -> {'future', 'deadline', 'timeout', 'hashes', 'on_replaced'}; una
+        # transacción reemplazada tiene la misma entrada con cada uno de sus hashes
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_block = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, tx_hash: str, callback=None, timeout: float = None, on_replaced=None) -> Future:
+        """
+        Empieza a vigilar ``tx_hash``.  Devuelve un ``Future`` que se resuelve con
+        el recibo (dict JSON-RPC) o falla con ``TimeoutError`` tras ``timeout`` s.
+        ``on_replaced(hash_anterior, hash_nuevo, raw_tx)`` se llama si la
+        transacción se reemplaza.
+        """
+        tx_hash = _normalize(tx_hash)
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            entry = self._pending.get(tx_hash)
+            if entry is not None:
+                # Ya se vigila: encadenar al futuro existente
+                entry['future'].add_done_callback(lambda f: _copy_result(f, future))
+                if on_replaced is not None:
+                    entry['on_replaced'].append(on_replaced)
+                return future
+            self._pending[tx_hash] = {
+                'future': future, 'deadline': deadline, 'timeout': timeout,
+                'hashes': [tx_hash], 'on_replaced': [on_replaced] if on_replaced else [],
+            }
+        self.start()
+        return future
+
+    def replace(self, old_hash: str, new_hash: str, raw_tx: str = None) -> bool:
+        """
+        ``old_hash`` se ha reemplazado por ``new_hash``: se vigilan las dos y el
+        plazo vuelve a empezar.  Devuelve ``False`` si ``old_hash`` no se vigilaba.
+        """
+        old_hash, new_hash = _normalize(old_hash), _normalize(new_hash)
+        with self._lock:
+            entry = self._pending.get(old_hash)
+            if entry is None:
+                return False
+            if new_hash not in entry['hashes']:
+                entry['hashes'].append(new_hash)
+            self._pending[new_hash] = entry
+            if entry['timeout']:
+                entry['deadline'] = time.monotonic() + entry['timeout']
+            hooks = list(entry['on_replaced'])
+        for hook in hooks:
+            hook(old_hash, new_hash, raw_tx)
+        return True
+
+    def pending(self) -> int:
+        """Número de transacciones vigiladas (un reemplazo no cuenta aparte)."""
+        with self._lock:
+            return len({id(entry) for entry in self._pending.values()})
+
+    def start(self):
+        """Arranca el hilo de sondeo si no está en marcha."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                # Un fallo puntual del nodo no detiene el seguimiento
+                print(f"Error consultando recibos: {e}")
+            # Sin nada pendiente el hilo termina; track() lo vuelve a arrancar.
+            # Se suelta _thread en el mismo bloque en que se decide salir: un
+            # track() posterior ya no ve este hilo y arranca otro
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+        with self._lock:
+            self._thread = None
+
+    def poll_once(self):
+        """Un ciclo de sondeo: bloque actual y, si es nuevo, recibos en lote."""
+        self._expire()
+        with self._lock:
+            hashes = list(self._pending)
+        if not hashes:
+            return
+        block = self.w3.eth.block_number
+        if block == self._last_block:
+            return
+        self._last_block = block
+
+        for start in range(0, len(hashes), self.batch_size):
+            chunk = hashes[start:start + self.batch_size]
+            receipts = batch_call(self.w3, [('eth_getTransactionReceipt', [h]) for h in chunk])
+            for tx_hash, receipt in zip(chunk, receipts):
+                if not receipt or isinstance(receipt, Exception):
+                    continue
+                depth = block - to_int(receipt['blockNumber']) + 1
+                if depth >= self.confirmations:
+                    self._resolve(tx_hash, receipt)
+
+    def _resolve(self, tx_hash: str, receipt: dict):
+        with self._lock:
+            entry = self._pending.pop(tx_hash, None)
+            if entry is not None:
+                for other in entry['hashes']:
+                    self._pending.pop(other, None)
+        if entry is not None:
+            tracing.count('gas_used', to_int(receipt.get('gasUsed', 0)))
+            entry['future'].set_result(receipt)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list({id(e): e for e in self._pending.values()
+                            if e['deadline'] is not None and now >= e['deadline']}.values())
+            for entry in entries:
+                for tx_hash in entry['hashes']:
+                    self._pending.pop(tx_hash, None)
+        for entry in entries:
+            hashes = ', '.join(entry['hashes'])
+            entry['future'].set_exception(TimeoutError(f"Sin confirmación para {hashes}"))
+
+
+def _copy_result(source: Future, target: Future):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def receipt_succeeded(receipt: dict) -> bool:
+    """Indica si el recibo JSON-RPC corresponde a una ejecución correcta."""
+    return to_int(receipt.get('status', 0)) == 1
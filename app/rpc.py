@@ -0,0 +1,254 @@
+# app/rpc.py
+import json
+import time
+import itertools
+import threading
+from collections.abc import Mapping
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from app import tracing
+
+"""
+Acceso JSON-RPC a los nodos.
+
+* ``EndpointPool`` reparte las peticiones entre varios nodos (``ETH_NODE_URLS``)
+  con conexiones keep-alive reutilizadas.  Se usa el nodo sano con menor
+  latencia media; si falla (conexión, tiempo agotado, respuesta HTTP de
+  error) la misma petición pasa al siguiente y el que falló queda apartado un
+  tiempo que crece con cada fallo seguido.  ``probe()`` mide latencia y altura de todos y
+  aparta los que se quedan atrás.
+* ``batch_call`` envía varias llamadas en un único array JSON-RPC: web3 5.x no
+  permite agrupar peticiones, así que N consultas cuestan una sola petición
+  HTTP.
+"""
+
+_ids = itertools.count(1)
+_HEADERS = {'Content-Type': 'application/json'}
+
+# Peso de la última medida en la latencia media (media móvil exponencial)
+LATENCY_ALPHA = 0.3
+
+
+class Endpoint:
+    """Un nodo RPC con su latencia media y su estado de salud."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency = None   # segundos (media móvil)
+        self.failures = 0     # fallos seguidos
+        self.down_until = 0.0
+        self.block = None
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def record_success(self, elapsed: float):
+        self.latency = elapsed if self.latency is None else (
+            (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * elapsed
+        )
+        self.failures = 0
+        self.down_until = 0.0
+
+    def record_failure(self, cooldown: float):
+        self.failures += 1
+        self.down_until = time.monotonic() + cooldown * 2 ** min(self.failures - 1, 6)
+
+
+class EndpointPool:
+    """Varios nodos RPC con selección por latencia y conmutación por error."""
+
+    def __init__(self, urls: list = None, pool_size: int = None, timeout: float = None,
+                 cooldown: float = None, max_lag: int = None):
+        urls = urls or config.ETH_NODE_URLS
+        if not urls:
+            raise ValueError("No hay ningún nodo RPC configurado")
+        self.endpoints = [Endpoint(u) for u in urls]
+        self.timeout = timeout or config.RPC_TIMEOUT_S
+        self.cooldown = config.RPC_COOLDOWN_S if cooldown is None else cooldown
+        self.max_lag = config.RPC_MAX_BLOCK_LAG if max_lag is None else max_lag
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(urls),
+            pool_maxsize=pool_size or config.RPC_POOL_SIZE,
+            max_retries=0,  # los reintentos los hace la conmutación entre nodos
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ordered(self) -> list:
+        """Nodos sanos de menor a mayor latencia y, al final, los apartados."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self.endpoints if e.healthy(now)]
+            down = [e for e in self.endpoints if not e.healthy(now)]
+        # Sin medida todavía cuenta como el más rápido, para medirlo cuanto antes
+        healthy.sort(key=lambda e: e.latency if e.latency is not None else 0.0)
+        down.sort(key=lambda e: e.down_until)
+        return healthy + down
+
+    @property
+    def best_url(self) -> str:
+        return self.ordered()[0].url
+
+    def _post_to(self, endpoint: Endpoint, body: bytes, timeout: float) -> bytes:
+        t0 = time.perf_counter()
+        try:
+            response = self.session.post(endpoint.url, data=body, headers=_HEADERS, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            with self._lock:
+                endpoint.record_failure(self.cooldown)
+            tracing.count('rpc_failures', endpoint=endpoint.url)
+            raise
+        with self._lock:
+            endpoint.record_success(time.perf_counter() - t0)
+        return response.content
+
+    def post(self, body: bytes, timeout: float = None) -> bytes:
+        """
+        Envía ``body`` (JSON-RPC ya codificado) al mejor nodo y, si falla, a los
+        siguientes.  Devuelve el cuerpo de la respuesta.
+        """
+        timeout = timeout or self.timeout
+        errors = []
+        for endpoint in self.ordered():
+            try:
+                return self._post_to(endpoint, body, timeout)
+            except requests.RequestException as e:
+                errors.append(f"{endpoint.url}: {e}")
+        raise ConnectionError("Ningún nodo RPC responde: " + "; ".join(errors))
+
+    def probe(self):
+        """
+        Mide latencia y último bloque de cada nodo; aparta los caídos y los que
+        van más de ``max_lag`` bloques por detrás del más adelantado.
+        """
+        body = json.dumps({'jsonrpc': '2.0', 'id': 0, 'method': 'eth_blockNumber', 'params': []}).encode()
+        for endpoint in self.endpoints:
+            try:
+                endpoint.block = int(json.loads(self._post_to(endpoint, body, self.timeout))['result'], 16)
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                endpoint.block = None
+        heights = [e.block for e in self.endpoints if e.block is not None]
+        if not heights:
+            return
+        best = max(heights)
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.block is not None and best - endpoint.block > self.max_lag:
+                    endpoint.record_failure(self.cooldown)
+
+    def start(self, interval: float = None):
+        """Arranca el hilo que sondea los nodos cada ``interval`` segundos."""
+        if self._thread is not None or len(self.endpoints) < 2:
+            return
+        interval = interval or config.RPC_PROBE_INTERVAL_S
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"Error sondeando nodos RPC: {e}")
+            if self._stop.wait(interval):
+                break
+
+
+# Sesión para proveedores HTTP de web3 sin pool propio
+_session = requests.Session()
+
+
+def endpoint_of(w3) -> str:
+    """URL HTTP del proveedor de ``w3`` (el mejor nodo si usa un pool)."""
+    pool = getattr(w3.provider, 'pool', None)
+    if pool is not None:
+        return pool.best_url
+    return w3.provider.endpoint_uri
+
+
+def _wire(value):
+    """Resultado ya formateado por web3 a la forma JSON-RPC (bytes en hex)."""
+    if isinstance(value, Mapping):
+        return {k: _wire(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_wire(v) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    return value
+
+
+def _single_call(w3, method: str, params: list):
+    # Pasa por los middlewares: el proveedor de eth-tester, por sí solo,
+    # devuelve los campos en snake_case (``block_number``...)
+    try:
+        return _wire(w3.manager.request_blocking(method, params))
+    except Exception as e:
+        return ValueError(str(e))
+
+
+def batch_call(w3, calls: list, timeout: float = 30) -> list:
+    """
+    Ejecuta ``calls`` (lista de ``(método, params)``) en una sola petición y
+    devuelve los resultados en el mismo orden.  Un error individual se
+    devuelve como instancia de ``ValueError`` en su posición.
+    """
+    if not calls:
+        return []
+    for method, _ in calls:
+        tracing.count('rpc_calls', method=method)
+    pool = getattr(w3.provider, 'pool', None)
+    if pool is None and getattr(w3.provider, 'endpoint_uri', None) is None:
+        # Proveedor sin HTTP (p. ej. eth-tester en proceso): una llamada por vez,
+        # ya contadas arriba aunque pasen por el middleware de las trazas
+        with tracing.rpc_counted():
+            return [_single_call(w3, method, params) for method, params in calls]
+    tracing.count('rpc_batches')
+    ids = [next(_ids) for _ in calls]
+    payload = [
+        {'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+        for i, (method, params) in zip(ids, calls)
+    ]
+    body = json.dumps(payload).encode('utf-8')
+    if pool is not None:
+        raw = pool.post(body, timeout)
+    else:
+        response = _session.post(endpoint_of(w3), data=body, headers=_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        raw = response.content
+    by_id = {item.get('id'): item for item in json.loads(raw)}
+    results = []
+    for i in ids:
+        item = by_id.get(i)
+        if item is None:
+            results.append(ValueError("Respuesta ausente en el lote JSON-RPC"))
+        elif 'error' in item:
+            results.append(ValueError(item['error']))
+        else:
+            results.append(item.get('result'))
+    return results
+
+
+def to_int(value) -> int:
+    """Entero de un resultado JSON-RPC (hexadecimal) o de eth-tester (int)."""
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def raise_errors(results: list) -> list:
+    """Lanza el primer error de un lote; si no hay, devuelve ``results``."""
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
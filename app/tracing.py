@@ -0,0 +1,235 @@
+# app/tracing.py
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+import config
+
+"""
+Trazas y métricas de la cadena de notarización.
+
+* ``span(nombre)`` mide una etapa (captura, EXIF, sensores, hash, desbloqueo de
+  la clave, construcción, envío, confirmación) y, al cerrarla, escribe una
+  línea JSON en ``TRACE_FILE`` con el identificador de captura activo
+  (``capture(id)``), de modo que todas las etapas de una foto se pueden unir.
+* ``count(nombre, valor, **etiquetas)`` acumula contadores: llamadas RPC por
+  método, bytes pasados por el hash y gas consumido.
+* ``write_metrics()`` vuelca contadores y tiempos por etapa en formato de texto
+  de Prometheus (``METRICS_FILE``); se llama también al salir.
+
+Desactivado (``TRACE_ENABLED=0``, por defecto) ``span`` devuelve un objeto
+vacío compartido y ``count`` retorna en la primera línea.
+"""
+
+_enabled = False
+_trace_path = None
+_metrics_path = None
+_trace_file = None
+_lock = threading.Lock()
+_counters = {}  # (nombre, etiquetas) -> valor
+_stages = {}    # etapa -> [número, segundos]
+_capture_id = contextvars.ContextVar('capture_id', default=None)
+_rpc_counted = contextvars.ContextVar('rpc_counted', default=False)
+
+# Descripción de cada contador en la exportación de Prometheus
+COUNTERS = {
+    'rpc_calls': "Llamadas JSON-RPC al nodo, por método",
+    'rpc_batches': "Peticiones HTTP con un lote JSON-RPC",
+    'bytes_hashed': "Bytes de imagen procesados por el hash",
+    'gas_used': "Gas consumido por las transacciones confirmadas",
+    'imports': "Capturas llevadas a tmp_photos, por método (enlace, reflink, copia)",
+}
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(trace_path: str = None, metrics_path: str = None):
+    """Activa las trazas (también se activan con ``TRACE_ENABLED=1``)."""
+    global _enabled, _trace_path, _metrics_path
+    _trace_path = trace_path or config.TRACE_FILE
+    _metrics_path = metrics_path or config.METRICS_FILE
+    if not _enabled:
+        atexit.register(write_metrics)
+    _enabled = True
+
+
+def disable():
+    global _enabled, _trace_file
+    _enabled = False
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def new_capture_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_capture() -> str:
+    return _capture_id.get()
+
+
+@contextmanager
+def capture(capture_id: str):
+    """Asocia a ``capture_id`` los spans abiertos dentro del bloque."""
+    token = _capture_id.set(capture_id)
+    try:
+        yield capture_id
+    finally:
+        _capture_id.reset(token)
+
+
+class _Span:
+    __slots__ = ('name', 'attrs', 'start', 't0')
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Añade atributos al span (p. ej. el gas de un recibo)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _emit(self.name, self.start, time.perf_counter() - self.t0, self.attrs, exc)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager que mide la etapa ``name``."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def record(name: str, start: float, duration: float, **attrs):
+    """Registra una etapa medida por otros medios (``start`` en época Unix)."""
+    if _enabled:
+        _emit(name, start, duration, attrs, None)
+
+
+def _emit(name: str, start: float, duration: float, attrs: dict, error):
+    global _trace_file
+    event = {
+        'capture_id': _capture_id.get(),
+        'span': name,
+        'start': round(start, 6),
+        'duration_ms': round(duration * 1000, 3),
+    }
+    if attrs:
+        event['attrs'] = attrs
+    if error is not None:
+        event['error'] = f"{type(error).__name__}: {error}"
+    line = json.dumps(event, default=str) + '\n'
+    with _lock:
+        stage = _stages.setdefault(name, [0, 0.0])
+        stage[0] += 1
+        stage[1] += duration
+        if _trace_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(_trace_path)), exist_ok=True)
+            _trace_file = open(_trace_path, 'a', encoding='utf-8', buffering=1)
+        _trace_file.write(line)
+
+
+def count(name: str, value=1, **labels):
+    """Suma ``value`` al contador ``name`` con ``labels``."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextmanager
+def rpc_counted():
+    """Las llamadas RPC del bloque ya están contadas: el middleware no las repite."""
+    token = _rpc_counted.set(True)
+    try:
+        yield
+    finally:
+        _rpc_counted.reset(token)
+
+
+def rpc_middleware(make_request, w3):
+    """Middleware de web3 que cuenta las llamadas RPC por método."""
+    def middleware(method, params):
+        if not _rpc_counted.get():
+            count('rpc_calls', method=method)
+        return make_request(method, params)
+    return middleware
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def prometheus_text() -> str:
+    """Contadores y tiempos por etapa en formato de texto de Prometheus."""
+    with _lock:
+        counters = dict(_counters)
+        stages = {k: list(v) for k, v in _stages.items()}
+    lines = []
+    for name in sorted({n for n, _ in counters}):
+        metric = f'notarizacion_{name}_total'
+        lines.append(f'# HELP {metric} {COUNTERS.get(name, name)}')
+        lines.append(f'# TYPE {metric} counter')
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f'{metric}{_labels(labels)} {value}')
+    if stages:
+        lines.append('# HELP notarizacion_stage_seconds Duración de cada etapa de la notarización')
+        lines.append('# TYPE notarizacion_stage_seconds summary')
+        for stage, (n, total) in sorted(stages.items()):
+            lines.append(f'notarizacion_stage_seconds_count{{stage="{stage}"}} {n}')
+            lines.append(f'notarizacion_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path: str = None):
+    """Escribe la instantánea de métricas (de forma atómica)."""
+    path = path or _metrics_path
+    if not _enabled or path is None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+if config.TRACE_ENABLED:
+    enable()
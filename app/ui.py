@@ -1,47 +1,145 @@
 # app/ui.py
 
+import time
 import config
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
 from kivy.uix.label import Label
+from kivy.uix.image import Image
 from kivy.clock import Clock
 import app.camera as camera_module
 from app.blockchain import get_gas_price
+from app.worker import worker, HASHING, SIGNING, SUBMITTED, CONFIRMED
+from app import tracing
+
+# Texto que se muestra para cada estado de progreso
+PROGRESS_TEXT = {
+    HASHING: "Calculando hash...",
+    SIGNING: "Firmando transacción...",
+    SUBMITTED: "Transacción enviada, esperando confirmación...",
+    CONFIRMED: "Transacción confirmada",
+}
+
 
 class CaptureScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         layout = BoxLayout(orientation='vertical', padding=20, spacing=20)
-        layout.add_widget(Label(text="Abriendo cámara nativa..."))
+        self.msg = Label(text="Abriendo cámara nativa...")
+        layout.add_widget(self.msg)
         self.add_widget(layout)
+        self.job = None
 
     def on_enter(self, *args):
-        Clock.schedule_once(lambda dt: camera_module.capture_photo_with_native(self.on_picture), 0)
+        # La cámara nativa puede tardar (espera de la foto): fuera del hilo de Kivy
+        self.capture_id = tracing.new_capture_id()
+        self._capture_start = (time.time(), time.perf_counter())
+        self.job = worker.submit(self._capture, on_error=self._on_error)
+
+    def _capture(self, job):
+        camera_module.capture_photo_with_native(
+            lambda path: Clock.schedule_once(lambda dt: job._deliver(self.on_picture, path), 0),
+            check_cancelled=job.check_cancelled,
+        )
 
     def on_picture(self, image_path):
-        camera_module.process_photo(image_path)
+        start, t0 = self._capture_start
+        with tracing.capture(self.capture_id):
+            tracing.record('capture', start, time.perf_counter() - t0)
+        capture_id = self.capture_id
+        self.job = worker.submit(
+            lambda job: camera_module.process_photo(image_path, job, capture_id),
+            on_progress=self._on_progress,
+            on_done=self._on_processed,
+            on_error=self._on_error,
+        )
+
+    def _on_processed(self, data):
+        confirm = self.manager.get_screen('confirm')
+        confirm.job_id = data['job_id']
+        confirm.preview_path = data.get('preview')
         self.manager.current = 'confirm'
 
+    def _on_progress(self, state, info):
+        self.msg.text = PROGRESS_TEXT.get(state, state)
+
+    def _on_error(self, error):
+        self.msg.text = f"Error: {error}"
+
+    def on_leave(self, *args):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+
 class ConfirmScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         layout = BoxLayout(orientation='vertical', padding=20, spacing=20)
+        # Vista previa reducida (app.importer): no se decodifica la foto completa
+        self.preview = Image(size_hint_y=0.5)
+        layout.add_widget(self.preview)
         self.msg = Label(text="Preparando transacción...")
         layout.add_widget(self.msg)
+        self.cancel_button = Button(text="Cancelar", size_hint_y=0.2)
+        self.cancel_button.bind(on_release=self._cancel)
+        layout.add_widget(self.cancel_button)
         self.add_widget(layout)
+        self.job = None
+        self.job_id = None  # trabajo de la bandeja de salida a confirmar
+        self.preview_path = None
 
     def on_enter(self):
-        price = get_gas_price()
-        self.msg.text = f"Gas actual: {price} Gwei. Toca para confirmar."
+        self.preview.source = self.preview_path or ''
+        self.msg.text = "Consultando precio del gas..."
+        self.job = worker.submit(
+            lambda job: get_gas_price(),
+            on_done=self._show_price,
+            on_error=lambda e: self._show_price(None),
+        )
+
+    def _show_price(self, price):
+        if price is None:
+            self.msg.text = "Precio del gas no disponible. Toca para confirmar."
+        else:
+            self.msg.text = f"Gas actual: {price} Gwei. Toca para confirmar."
+        self.job = None
         self.bind(on_touch_down=self._confirm)
 
-    def _confirm(self, *args):
+    def _confirm(self, instance, touch):
+        if self.cancel_button.collide_point(*touch.pos):
+            return False
+        self.unbind(on_touch_down=self._confirm)
+        self.job = worker.submit(
+            camera_module.confirm_and_send_transaction, self.job_id,
+            on_progress=lambda state, info: setattr(self.msg, 'text', PROGRESS_TEXT.get(state, state)),
+            on_done=self._show_result,
+            on_error=lambda e: self._show_result(False),
+        )
+        return True
+
+    def _cancel(self, *args):
+        # La transacción ya enviada no se puede retirar: solo se deja de esperar
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
         self.unbind(on_touch_down=self._confirm)
-        success = camera_module.confirm_and_send_transaction()
+        self.manager.current = 'capture'
+
+    def _show_result(self, success: bool):
+        self.job = None
         result = self.manager.get_screen('result')
         result.display(success)
         self.manager.current = 'result'
 
+    def on_leave(self, *args):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        self.unbind(on_touch_down=self._confirm)
+
+
 class ResultScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -60,4 +158,3 @@ def build_screen_manager():
     sm.add_widget(ConfirmScreen(name='confirm'))
     sm.add_widget(ResultScreen(name='result'))
     return sm
-
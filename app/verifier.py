@@ -0,0 +1,173 @@
+# app/verifier.py
+import json
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import config
+from app.hasher import compute_hash, compute_tree, HASH_V1, HASH_V3
+from app.merkle import verify_proof
+from app.rpc import batch_call
+
+"""
+Verificación pública en bloque.
+
+Para cada registro (formato de la bandeja de salida) se recalcula el
+hash del fichero con sus metadatos, se consulta ``Notarizacion.registros`` (o
+``raices`` si la foto se notarizó en un lote Merkle) y se comprueba la firma.
+Los hashes se recalculan en un pool de procesos y las consultas al contrato se
+agrupan en lotes JSON-RPC de ``eth_call``, no una petición por fichero.
+"""
+
+
+def _selector(signature: str) -> str:
+    from web3 import Web3
+    return Web3.keccak(text=signature).hex()[2:10]
+
+
+def load_records(paths) -> list:
+    """Lee registros JSON de ficheros o de todos los ``*.json`` de un directorio."""
+    records = []
+    for item in paths:
+        path = Path(item)
+        files = sorted(path.glob('*.json')) if path.is_dir() else [path]
+        for f in files:
+            with open(f, 'r', encoding='utf-8') as fh:
+                records.append(json.load(fh))
+    return records
+
+
+def _recorded_hash(record: dict) -> str:
+    # Los registros antiguos guardan el hash bajo 'hash'
+    return (record.get('photo_hash') or record.get('hash') or '').lower()
+
+
+def _rehash(job) -> tuple:
+    """
+    Trabajo de cada proceso: recalcular el hash de un fichero. Devuelve
+    ``(hash, error)``.  La v3 se recalcula con el tamaño de bloque de su
+    manifiesto, que forma parte del hash.
+    """
+    image_path, metadata, version, chunk_size = job
+    try:
+        if version == HASH_V3 and chunk_size:
+            return compute_tree(image_path, metadata, chunk_size)[0].hex(), None
+        return compute_hash(image_path, metadata, version).hex(), None
+    except Exception as e:
+        # Fichero ausente, versión desconocida, metadatos no serializables...:
+        # el registro falla, pero no la verificación de los demás
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _check_signatures(records: list, reports: list, workers: int = None):
+    """
+    Rellena ``signature_ok``: True/False si el registro trae firma y clave
+    pública, None si no.  Las firmas se verifican en lote (ver app.wallet).
+    """
+    from app.wallet import verify_many as verify_signatures, SIG_DER
+    items, targets = [], []
+    for record, report in zip(records, reports):
+        if not report['photo_hash'] or not record.get('signature') or not record.get('public_key'):
+            continue
+        try:
+            item = (bytes.fromhex(report['photo_hash']), bytes.fromhex(record['signature']),
+                    record['public_key'], record.get('signature_format', SIG_DER))
+        except ValueError:
+            report['signature_ok'] = False
+            continue
+        items.append(item)
+        targets.append(report)
+    for report, ok in zip(targets, verify_signatures(items, workers)):
+        report['signature_ok'] = ok
+
+
+def _batched_timestamps(w3, address: str, selector: str, keys: list) -> dict:
+    """Lee ``mapping(bytes32 => uint256)`` para ``keys`` con eth_call en lote."""
+    keys = list(dict.fromkeys(keys))
+    result = {}
+    size = config.RPC_BATCH_SIZE
+    for start in range(0, len(keys), size):
+        chunk = keys[start:start + size]
+        calls = [('eth_call', [{'to': address, 'data': '0x' + selector + k}, 'latest']) for k in chunk]
+        for key, value in zip(chunk, batch_call(w3, calls)):
+            if isinstance(value, Exception) or not value or value == '0x':
+                result[key] = None
+            else:
+                result[key] = int(value, 16)
+    return result
+
+
+def verify_many(records: list, w3=None, address: str = None, workers: int = None, index=None) -> list:
+    """
+    Verifica ``records`` y devuelve un informe por fichero con las claves
+    ``image_path``, ``photo_hash``, ``hash_ok``, ``notarized``, ``timestamp``,
+    ``via``, ``signature_ok`` y ``error`` (por qué no se pudo verificar, o
+    ``None``).  Si se pasa un ``EventIndex`` sincronizado, los hashes que ya
+    estén en él no se consultan al nodo.
+    """
+    if w3 is None:
+        from app.blockchain import get_w3
+        w3 = get_w3()
+    address = address or config.CONTRACT_ADDRESS
+
+    jobs = [(r.get('image_path'), r.get('metadata', {}), r.get('hash_version', HASH_V1),
+             (r.get('chunks') or {}).get('chunk_size')) for r in records]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rehashed = list(pool.map(_rehash, jobs, chunksize=64))
+
+    reports = []
+    for record, (actual, error) in zip(records, rehashed):
+        expected = _recorded_hash(record)
+        reports.append({
+            'image_path': record.get('image_path'),
+            'photo_hash': expected,
+            'hash_ok': actual is not None and actual == expected,
+            'notarized': False,
+            'timestamp': None,
+            'via': None,
+            'signature_ok': None,
+            'error': error,
+        })
+    _check_signatures(records, reports, workers)
+
+    # Consultas al contrato: hashes individuales y raíces de lotes Merkle
+    direct, roots = [], []
+    for record, report in zip(records, reports):
+        if not report['hash_ok']:
+            continue
+        merkle = record.get('merkle')
+        if merkle:
+            try:
+                proof = [bytes.fromhex(p) for p in merkle['proof']]
+                included = verify_proof(bytes.fromhex(report['photo_hash']), proof, bytes.fromhex(merkle['root']))
+            except (KeyError, TypeError, ValueError) as e:
+                report['error'] = f"Prueba Merkle ilegible: {e}"
+                continue
+            if included:
+                roots.append(merkle['root'])
+        else:
+            known = index.lookup(report['photo_hash']) if index is not None else None
+            if known:
+                report.update(notarized=True, timestamp=known['timestamp'], via='registros')
+            else:
+                direct.append(report['photo_hash'])
+
+    registros = _batched_timestamps(w3, address, _selector('registros(bytes32)'), direct)
+    raices = _batched_timestamps(w3, address, _selector('raices(bytes32)'), roots)
+
+    for record, report in zip(records, reports):
+        if not report['hash_ok'] or report['notarized'] or report['error']:
+            continue
+        merkle = record.get('merkle')
+        if merkle:
+            ts = raices.get(merkle['root'])
+            via = 'merkle'
+        else:
+            ts = registros.get(report['photo_hash'])
+            via = 'registros'
+        if ts:
+            report.update(notarized=True, timestamp=ts, via=via)
+        elif merkle and merkle.get('anchor_status') in ('pending', 'failed'):
+            # La prueba se escribe al enviar el lote, antes de su recibo
+            report['error'] = ("La transacción del lote Merkle no se confirmó"
+                               if merkle['anchor_status'] == 'failed'
+                               else "Lote Merkle pendiente de confirmación")
+    return reports
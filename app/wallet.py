@@ -1,28 +1,169 @@
 # app/wallet.py
+import os
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    Prehashed, decode_dss_signature, encode_dss_signature,
+)
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.exceptions import InvalidSignature
+import config
+from app.keystore import session
 
+"""
+Firmas ECDSA del hash de cada foto.
 
-def sign_hash(hash_bytes: bytes, private_key) -> bytes:
+Formatos (``signature_format`` del registro; sin él, el antiguo):
+
+* ``der``: el formato original.  El hash, que ya es un resumen SHA-256, se
+  vuelve a pasar por SHA-256 al firmar, y la firma se guarda en DER, de
+  longitud variable (70-72 bytes).  Se sigue pudiendo verificar.
+* ``compact``: se firma el resumen tal cual (``Prehashed``) y la firma se
+  guarda como ``r || s`` de tamaño fijo (64 bytes en secp256k1).
+
+``verify_many`` reparte los lotes grandes entre un pool de procesos, por
+tramos de ``SIGN_CHUNK_SIZE``, porque una operación ECDSA dura decenas de
+microsegundos y, de uno en uno, costaría más el reparto.  ``sign_many`` firma
+en el propio proceso, con la clave de la sesión desbloqueada: la clave privada
+no se serializa para pasarla a otros procesos.
+"""
+
+SIG_DER = 'der'
+SIG_COMPACT = 'compact'
+FORMATS = (SIG_DER, SIG_COMPACT)
+
+
+def _algorithm(fmt: str):
+    if fmt == SIG_DER:
+        return ec.ECDSA(hashes.SHA256())
+    if fmt == SIG_COMPACT:
+        return ec.ECDSA(Prehashed(hashes.SHA256()))
+    raise ValueError(f"Formato de firma desconocido: {fmt}")
+
+
+def _coordinate_size(key) -> int:
+    return (key.curve.key_size + 7) // 8
+
+
+def to_compact(der: bytes, key) -> bytes:
+    """Firma DER a ``r || s`` de tamaño fijo (según la curva de ``key``)."""
+    r, s = decode_dss_signature(der)
+    n = _coordinate_size(key)
+    return r.to_bytes(n, 'big') + s.to_bytes(n, 'big')
+
+
+def from_compact(signature: bytes, key) -> bytes:
+    """``r || s`` a DER, el formato que espera ``cryptography``."""
+    n = _coordinate_size(key)
+    if len(signature) != 2 * n:
+        raise ValueError(f"Una firma compacta ocupa {2 * n} bytes, no {len(signature)}")
+    return encode_dss_signature(int.from_bytes(signature[:n], 'big'), int.from_bytes(signature[n:], 'big'))
+
+
+def sign_hash(hash_bytes: bytes, private_key=None, fmt: str = None) -> bytes:
+    """
+    Firma el hash usando ECDSA con clave privada (por defecto, la de la sesión
+    de firma desbloqueada), en el formato ``fmt`` (por defecto,
+    ``config.SIGNATURE_FORMAT``).
+    """
+    if private_key is None:
+        private_key = session.private_key
+    fmt = fmt or config.SIGNATURE_FORMAT
+    signature = private_key.sign(hash_bytes, _algorithm(fmt))
+    return to_compact(signature, private_key) if fmt == SIG_COMPACT else signature
+
+
+def detect_format(signature: bytes, key) -> str:
     """
-    Firma el hash usando ECDSA con clave privada.
+    Formato de ``signature``: una firma compacta ocupa exactamente dos
+    coordenadas de la curva de ``key`` (64 bytes en secp256k1); una DER, no.
     """
-    signature = private_key.sign(
-        hash_bytes,
-        ec.ECDSA(hashes.SHA256())
-    )
-    return signature
+    return SIG_COMPACT if len(signature) == 2 * _coordinate_size(key) else SIG_DER
+
 
-def verify_signature(hash_bytes: bytes, signature: bytes, public_key) -> bool:
+def verify_signature(hash_bytes: bytes, signature: bytes, public_key=None, fmt: str = None) -> bool:
     """
-    Verifica la firma ECDSA del hash.
+    Verifica la firma ECDSA del hash (por defecto, con la clave pública de la
+    sesión de firma).  ``fmt`` es el formato con el que se firmó (los
+    registros antiguos son ``der``); sin él se deduce de la longitud.
     """
+    if public_key is None:
+        public_key = session.public_key
+    fmt = fmt or detect_format(signature, public_key)
     try:
-        public_key.verify(
-            signature,
-            hash_bytes,
-            ec.ECDSA(hashes.SHA256())
-        )
+        if fmt == SIG_COMPACT:
+            signature = from_compact(signature, public_key)
+        public_key.verify(signature, hash_bytes, _algorithm(fmt))
         return True
-    except Exception:
-        return False
\ No newline at end of file
+    except (InvalidSignature, ValueError):
+        return False
+
+
+def _chunks(items: list, size: int):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _pool_workers(n_items: int, workers: int):
+    """Procesos a usar para ``n_items``; 0 si no compensa salir del proceso."""
+    workers = workers or os.cpu_count() or 1
+    if n_items < 2 * config.SIGN_CHUNK_SIZE or workers < 2:
+        return 0
+    return workers
+
+
+def sign_many(hash_list: list, private_key=None, fmt: str = None) -> list:
+    """
+    Firma todos los hashes de ``hash_list`` (en el mismo orden) con la clave
+    de la sesión, sin sacarla de este proceso.
+    """
+    if private_key is None:
+        private_key = session.private_key
+    fmt = fmt or config.SIGNATURE_FORMAT
+    return [sign_hash(h, private_key, fmt) for h in hash_list]
+
+
+# Claves públicas ya cargadas en cada proceso (PEM -> clave)
+_public_keys = {}
+
+
+def _load_public(key):
+    if not isinstance(key, (bytes, str)):
+        return key
+    pem = key.encode('utf-8') if isinstance(key, str) else key
+    loaded = _public_keys.get(pem)
+    if loaded is None:
+        loaded = _public_keys[pem] = serialization.load_pem_public_key(pem)
+    return loaded
+
+
+def _verify_item(item) -> bool:
+    hash_bytes, signature, public_key, fmt = item
+    try:
+        return verify_signature(hash_bytes, signature, _load_public(public_key), fmt)
+    except ValueError:
+        return False  # PEM inválido
+
+
+def _verify_chunk(items: list) -> list:
+    return [_verify_item(item) for item in items]
+
+
+def verify_many(items: list, workers: int = None) -> list:
+    """
+    Verifica ``items``, tuplas ``(hash, firma, clave_pública, formato)``, y
+    devuelve un booleano por cada una.  La clave pública puede ser un objeto
+    o su PEM (en los lotes grandes conviene el PEM: cada proceso lo carga una
+    vez y no hay que serializar objetos).
+    """
+    items = list(items)
+    workers = _pool_workers(len(items), workers)
+    if not workers:
+        return [_verify_item(item) for item in items]
+    pem_items = [
+        (h, s, k.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+         if not isinstance(k, (bytes, str)) else k, fmt)
+        for h, s, k, fmt in items
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [ok for chunk in pool.map(_verify_chunk, _chunks(pem_items, config.SIGN_CHUNK_SIZE))
+                for ok in chunk]
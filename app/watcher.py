@@ -0,0 +1,380 @@
+# app/watcher.py
+import os
+import sys
+import time
+import select
+import struct
+import sqlite3
+import threading
+import collections
+import ctypes
+import ctypes.util
+import config
+
+"""
+Detección de fotos nuevas en una carpeta (galería o ``tmp_photos``).
+
+Buscar la foto más reciente con ``rglob`` y un ``stat()`` por archivo cuesta
+tanto como la galería entera en cada captura.  ``GalleryWatcher`` solo mira lo
+que cambia:
+
+* En Linux usa inotify: el núcleo avisa al cerrar un archivo escrito
+  (``IN_CLOSE_WRITE``) o al moverlo a la carpeta (``IN_MOVED_TO``) y la foto se
+  detecta en milisegundos, sin recorrer nada.
+* En el resto (Windows incluido) sondea cada ``WATCH_POLL_INTERVAL_S`` la fecha
+  de modificación de las carpetas, que cambia al crear o borrar un archivo, y
+  solo lista las que han cambiado.  Una foto se da por terminada cuando su
+  tamaño no varía entre dos pasadas.
+
+``SeenIndex`` guarda en SQLite las fotos ya vistas y la fecha de cada carpeta,
+de modo que al arrancar solo se vuelven a listar las carpetas que cambiaron
+mientras la aplicación estaba cerrada.
+"""
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (+ nombre)
+
+
+class SeenIndex:
+    """Fotos ya vistas por carpeta y fecha de la última lectura de cada carpeta."""
+
+    def __init__(self, db_path: str = None):
+        db_path = db_path or config.WATCH_INDEX_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS vistos (
+                dir TEXT NOT NULL, name TEXT NOT NULL, PRIMARY KEY (dir, name)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS carpetas (dir TEXT PRIMARY KEY, mtime_ns INTEGER);
+        """)
+        self._lock = threading.Lock()
+
+    def names(self, directory: str) -> set:
+        with self._lock:
+            return {n for (n,) in self._db.execute("SELECT name FROM vistos WHERE dir = ?", (directory,))}
+
+    def contains(self, directory: str, name: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM vistos WHERE dir = ? AND name = ?", (directory, name)
+            ).fetchone() is not None
+
+    def add(self, directory: str, names):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO vistos VALUES (?, ?)",
+                                 ((directory, n) for n in names))
+
+    def forget(self, directory: str, names):
+        """Olvida archivos borrados (su nombre puede volver a usarse)."""
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM vistos WHERE dir = ? AND name = ?",
+                                 ((directory, n) for n in names))
+
+    def dirs_under(self, root: str) -> dict:
+        """``{carpeta: mtime_ns}`` guardadas de ``root`` y sus subcarpetas."""
+        prefix = os.path.join(root, '')
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT dir, mtime_ns FROM carpetas WHERE dir = ? OR substr(dir, 1, ?) = ?",
+                (root, len(prefix), prefix),
+            ).fetchall()
+        return dict(rows)
+
+    def set_dirs(self, dirs: dict):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO carpetas VALUES (?, ?)", dirs.items())
+
+    def drop_dir(self, directory: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM carpetas WHERE dir = ?", (directory,))
+            self._db.execute("DELETE FROM vistos WHERE dir = ?", (directory,))
+
+
+class _Inotify:
+    """inotify mediante ctypes (sin dependencias)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.paths = {}  # descriptor de vigilancia -> carpeta
+
+    def add(self, path: str):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.paths[wd] = path
+
+    def read(self, timeout: float) -> list:
+        """Eventos ``(carpeta, nombre, máscara)`` llegados en ``timeout`` segundos."""
+        if not select.select([self.fd], [], [], max(timeout, 0))[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            path = self.paths.pop(wd, None) if mask & IN_IGNORED else self.paths.get(wd)
+            events.append((path, name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def inotify_available() -> bool:
+    return sys.platform.startswith('linux')
+
+
+class GalleryWatcher:
+    """
+    Vigila ``root`` (con sus subcarpetas) y entrega las fotos nuevas.
+
+    ``drain()`` descarta lo pendiente justo antes de abrir la cámara y
+    ``wait(timeout)`` devuelve la ruta de la primera foto que aparezca después.
+    """
+
+    def __init__(self, root, index: SeenIndex = None, extensions=IMAGE_EXTENSIONS,
+                 interval: float = None, use_inotify: bool = None):
+        self.root = os.path.abspath(root)
+        self.index = index or get_seen_index()
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.interval = interval or config.WATCH_POLL_INTERVAL_S
+        self.use_inotify = inotify_available() if use_inotify is None else use_inotify
+        self._dirs = {}     # carpeta -> mtime_ns de la última lectura completa
+        self._sizes = {}    # ruta -> tamaño en la pasada anterior (sondeo)
+        self._ready = collections.deque()
+        self._inotify = None
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def start(self):
+        """Lee las carpetas que cambiaron desde la última vez y empieza a vigilar."""
+        with self._lock:
+            if self._started:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            self._dirs = self.index.dirs_under(self.root)
+            # Lo que ya estaba al arrancar no es una captura
+            self._sync(report=False)
+            if self.use_inotify:
+                try:
+                    self._inotify = _Inotify()
+                    for directory in list(self._dirs):
+                        self._inotify.add(directory)
+                except OSError as e:
+                    # Sin inotify o sin vigilancias libres (max_user_watches): sondeo
+                    print(f"inotify no disponible ({e}); se sondeará {self.root}")
+                    if self._inotify is not None:
+                        self._inotify.close()
+                    self._inotify = None
+                # Lo creado mientras se añadían las vigilancias
+                self._sync(report=False)
+            self._started = True
+
+    def close(self):
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._started = False
+
+    def drain(self):
+        """Marca como vistas las fotos aparecidas hasta ahora."""
+        self.start()
+        with self._lock:
+            self._poll(0)
+            self._ready.clear()
+
+    def wait(self, timeout: float, check_cancelled=None):
+        """
+        Ruta de la siguiente foto nueva, o ``None`` si no aparece ninguna en
+        ``timeout`` segundos.  ``check_cancelled`` se llama al menos cada medio
+        segundo (ver app.worker).
+        """
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self._ready:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._poll(min(remaining, 0.5))
+                if check_cancelled is not None:
+                    check_cancelled()
+            return self._ready.popleft()
+
+    def _poll(self, timeout: float):
+        if self._inotify is not None:
+            self._handle(self._inotify.read(timeout))
+            return
+        self._sync(report=True)
+        if not self._ready and timeout > 0:
+            time.sleep(min(timeout, self.interval))
+            self._sync(report=True)
+
+    def _is_image(self, name: str) -> bool:
+        return name.lower().endswith(self.extensions)
+
+    def _report(self, directory: str, name: str):
+        if not self._is_image(name) or self.index.contains(directory, name):
+            return
+        self.index.add(directory, [name])
+        self._ready.append(os.path.join(directory, name))
+
+    def _handle(self, events: list):
+        for directory, name, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: leer las carpetas que cambiaron
+                self._sync(report=True)
+                continue
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(directory, None)
+                self.index.drop_dir(directory)
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._report(directory, name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.index.forget(directory, [name])
+
+    def _add_tree(self, top: str):
+        """Vigila una carpeta nueva y entrega las fotos que ya tenga."""
+        for directory, _dirnames, filenames in os.walk(top):
+            try:
+                self._inotify.add(directory)
+            except OSError:
+                continue
+            self._dirs[directory] = None
+            for name in filenames:
+                self._report(directory, name)
+
+    def _sync(self, report: bool):
+        """
+        Lista las carpetas cuya fecha cambió.  Con ``report`` entrega las fotos
+        nuevas ya terminadas; sin él, solo las marca como vistas.
+        """
+        pending = list(self._dirs)
+        if self.root not in self._dirs:
+            pending.append(self.root)
+        changed = {}
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                self._dirs.pop(directory, None)
+                self.index.drop_dir(directory)
+                continue
+            if self._dirs.get(directory) == mtime:
+                continue
+            try:
+                subdirs, complete = self._scan(directory, report)
+            except FileNotFoundError:
+                continue
+            for sub in subdirs:
+                if sub not in self._dirs:
+                    self._dirs[sub] = None
+                    pending.append(sub)
+                    if self._inotify is not None:
+                        try:
+                            self._inotify.add(sub)
+                        except OSError:
+                            pass
+            # Con fotos a medio escribir la carpeta se vuelve a leer en la siguiente pasada
+            if complete:
+                self._dirs[directory] = changed[directory] = mtime
+        if changed:
+            self.index.set_dirs(changed)
+
+    def _scan(self, directory: str, report: bool):
+        seen = self.index.names(directory)
+        subdirs, present, fresh = [], set(), []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif self._is_image(entry.name):
+                    present.add(entry.name)
+                    if entry.name not in seen:
+                        fresh.append(entry)
+        gone = seen - present
+        if gone:
+            self.index.forget(directory, gone)
+        if not report:
+            self.index.add(directory, [e.name for e in fresh])
+            return subdirs, True
+        complete = True
+        for entry in fresh:
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            # Con inotify la foto ya cerrada no vuelve a avisar: basta con que tenga datos
+            if size and (self._inotify is not None or self._sizes.get(entry.path) == size):
+                self._sizes.pop(entry.path, None)
+                self._report(directory, entry.name)
+            else:
+                self._sizes[entry.path] = size
+                complete = False
+        return subdirs, complete
+
+
+_seen_index = None
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_seen_index() -> SeenIndex:
+    """Índice de fotos vistas compartido por la aplicación."""
+    global _seen_index
+    with _watchers_lock:
+        if _seen_index is None:
+            _seen_index = SeenIndex()
+        return _seen_index
+
+
+def get_watcher(root) -> GalleryWatcher:
+    """Vigilante de ``root``, creado y arrancado en el primer uso."""
+    index = get_seen_index()
+    key = os.path.abspath(root)
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = _watchers[key] = GalleryWatcher(key, index)
+    watcher.start()
+    return watcher
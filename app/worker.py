@@ -0,0 +1,93 @@
+# app/worker.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from kivy.clock import Clock
+
+"""
+Ejecución en segundo plano para la interfaz.
+
+Los trabajos lentos (captura, hash, firma, envío y espera de la transacción)
+se ejecutan en un pool de hilos; los avisos de progreso y el resultado se
+devuelven al hilo principal de Kivy con ``Clock.schedule_once``, de modo que
+la interfaz sigue dibujando mientras tanto.
+"""
+
+# Estados de progreso de una notarización
+HASHING = 'hashing'
+SIGNING = 'signing'
+SUBMITTED = 'submitted'
+CONFIRMED = 'confirmed'
+
+
+class Cancelled(Exception):
+    """El trabajo se canceló antes de terminar."""
+
+
+class Job:
+    """Trabajo en segundo plano con progreso y cancelación cooperativa."""
+
+    def __init__(self, on_progress=None, on_done=None, on_error=None):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.state = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Pide la cancelación; el trabajo la atiende en su próximo punto de control."""
+        self._cancel.set()
+
+    def check_cancelled(self):
+        """Punto de control: lanza ``Cancelled`` si se pidió la cancelación."""
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def report(self, state: str, info=None):
+        """Publica un estado de progreso en el hilo principal."""
+        self.check_cancelled()
+        self.state = state
+        if self.on_progress is not None:
+            Clock.schedule_once(lambda dt: self._deliver(self.on_progress, state, info), 0)
+
+    def _deliver(self, callback, *args):
+        # Tras cancelar no se entrega nada a la interfaz
+        if not self.cancelled:
+            callback(*args)
+
+
+class BackgroundWorker:
+    """Pool de hilos que ejecuta ``fn(job, *args)`` fuera del hilo de Kivy."""
+
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notarizacion')
+
+    def submit(self, fn, *args, on_progress=None, on_done=None, on_error=None) -> Job:
+        job = Job(on_progress, on_done, on_error)
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn, args):
+        try:
+            result = fn(job, *args)
+        except Cancelled:
+            return
+        except Exception as e:
+            if job.on_error is not None:
+                # ``e`` deja de existir al salir del except: se pasa por defecto
+                Clock.schedule_once(lambda dt, error=e: job._deliver(job.on_error, error), 0)
+            else:
+                print(f"Error en segundo plano: {e}")
+            return
+        if job.on_done is not None:
+            Clock.schedule_once(lambda dt: job._deliver(job.on_done, result), 0)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+# Worker compartido por todas las pantallas
+worker = BackgroundWorker()
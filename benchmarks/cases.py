@@ -0,0 +1,122 @@
+# benchmarks/cases.py
+import os
+import io
+from PIL import Image
+import piexif
+
+"""
+Casos de benchmark de las operaciones locales: hash de la foto, EXIF, firma y
+verificación, y descifrado de la clave del disco.  Cada función devuelve una
+lista de ``(nombre, función, opciones de measure)`` preparada sobre ``workdir``.
+"""
+
+# Tamaños de fichero para el hash (bytes)
+HASH_SIZES = {
+    '64k': 64 * 1024,
+    '1m': 1024 * 1024,
+    '16m': 16 * 1024 * 1024,
+}
+
+METADATA = {
+    'datetime': '2024:01:01 12:00:00',
+    'gps_latitude': 40.4168,
+    'gps_longitude': -3.7038,
+    'accelerometer': {'x': 0.01, 'y': -0.02, 'z': 9.81},
+    'gyroscope': {'x': 0.0, 'y': 0.0, 'z': 0.0},
+    'device_id': 'benchmark',
+}
+
+
+def _write_random(path: str, size: int):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining:
+            n = min(remaining, 1024 * 1024)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+def _write_jpeg_with_exif(path: str):
+    """JPEG 1024x768 con fecha y GPS, como los de la cámara."""
+    gps = {
+        piexif.GPSIFD.GPSLatitude: ((40, 1), (25, 1), (0, 1)),
+        piexif.GPSIFD.GPSLongitude: ((3, 1), (42, 1), (13, 1)),
+    }
+    exif = piexif.dump({'0th': {piexif.ImageIFD.DateTime: b'2024:01:01 12:00:00'}, 'GPS': gps})
+    buf = io.BytesIO()
+    Image.new('RGB', (1024, 768), (120, 80, 40)).save(buf, 'JPEG', quality=90, exif=exif)
+    with open(path, 'wb') as f:
+        f.write(buf.getvalue())
+
+
+def hash_cases(workdir: str, quick: bool = False) -> list:
+    from app.hasher import compute_hash, HASH_V1, HASH_V2
+    cases = []
+    for label, size in HASH_SIZES.items():
+        path = os.path.join(workdir, f'hash_{label}.bin')
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            _write_random(path, size)
+        iterations = max(3, min(200, (64 * 1024 * 1024) // size // (4 if quick else 1)))
+        for version in (HASH_V1, HASH_V2):
+            cases.append((
+                f'hash_v{version}_{label}',
+                lambda p=path, v=version: compute_hash(p, METADATA, v),
+                {'iterations': iterations},
+            ))
+    return cases
+
+
+def exif_cases(workdir: str, quick: bool = False) -> list:
+    from app.metadata import extract_exif
+    from app.exif import extract_exif_fast
+    path = os.path.join(workdir, 'exif.jpg')
+    if not os.path.exists(path):
+        _write_jpeg_with_exif(path)
+    iterations = 100 if quick else 500
+    return [
+        ('exif_piexif', lambda: extract_exif(path), {'iterations': iterations}),
+        ('exif_fast', lambda: extract_exif_fast(path), {'iterations': iterations}),
+    ]
+
+
+def signing_cases(workdir: str, quick: bool = False) -> list:
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from app.wallet import sign_hash, verify_signature, sign_many, verify_many, SIG_DER, SIG_COMPACT
+    private_key = ec.generate_private_key(ec.SECP256K1())
+    public_key = private_key.public_key()
+    digest = os.urandom(32)
+    signature = sign_hash(digest, private_key, SIG_DER)
+    compact = sign_hash(digest, private_key, SIG_COMPACT)
+    iterations = 200 if quick else 1000
+    # Lote de auditoría: verificación repartida entre procesos
+    batch = 1000 if quick else 4000
+    digests = [os.urandom(32) for _ in range(batch)]
+    signatures = sign_many(digests, private_key, SIG_COMPACT)
+    items = [(d, s, public_key, SIG_COMPACT) for d, s in zip(digests, signatures)]
+    return [
+        ('sign_hash', lambda: sign_hash(digest, private_key, SIG_DER), {'iterations': iterations}),
+        ('verify_signature', lambda: verify_signature(digest, signature, public_key), {'iterations': iterations}),
+        ('sign_hash_compact', lambda: sign_hash(digest, private_key, SIG_COMPACT), {'iterations': iterations}),
+        ('verify_compact', lambda: verify_signature(digest, compact, public_key, SIG_COMPACT),
+         {'iterations': iterations}),
+        ('verify_many', lambda: verify_many(items), {'iterations': 3, 'items': batch, 'memory_iterations': 1}),
+    ]
+
+
+def keystore_cases(workdir: str, quick: bool = False) -> list:
+    from app import keystore
+    # Clave propia del benchmark: nunca tocar la del usuario
+    keystore.KEY_FILE = os.path.join(workdir, 'bench_key.pem')
+    if not os.path.exists(keystore.KEY_FILE):
+        keystore.generate_keypair()
+    return [
+        ('load_private_key', keystore.load_private_key, {'iterations': 5 if quick else 20, 'warmup': 0}),
+    ]
+
+
+LOCAL_GROUPS = {
+    'hash': hash_cases,
+    'exif': exif_cases,
+    'signing': signing_cases,
+    'keystore': keystore_cases,
+}
@@ -0,0 +1,102 @@
+# benchmarks/chain.py
+import os
+import json
+import hashlib
+import config
+
+"""
+Benchmark del camino completo de ``app.blockchain`` (construir, firmar,
+enviar y confirmar ``notarizar``) contra una cadena local.
+
+Por defecto la cadena es eth-tester en proceso (``pip install
+"web3[tester]"``), que mina un bloque por transacción; con ``--chain URL`` se
+usa un nodo de desarrollo (ganache, anvil) con cuentas desbloqueadas.  El
+contrato se despliega desde el bytecode del artefacto de brownie, que tiene
+que estar compilado a partir del ``Notarizacion.sol`` actual.
+"""
+
+# Transacciones por iteración del caso en lote
+PIPELINE_SIZE = 20
+
+
+def connect(url: str = None):
+    from web3 import Web3
+    if url:
+        return Web3(Web3.HTTPProvider(url))
+    from web3 import EthereumTesterProvider
+    return Web3(EthereumTesterProvider())
+
+
+def deploy(w3) -> str:
+    """Despliega Notarizacion desde el artefacto y devuelve su dirección."""
+    from app.blockchain import ABI_FILE
+    with open(ABI_FILE, 'r') as f:
+        artifact = json.load(f)
+    # brownie guarda el SHA-1 del código fuente con el que generó el bytecode
+    source = ABI_FILE.parents[2] / artifact['sourcePath']
+    with open(source, 'rb') as f:
+        if hashlib.sha1(f.read()).hexdigest() != artifact['sha1']:
+            raise RuntimeError(f"El bytecode de {ABI_FILE} no corresponde a {source}: "
+                               "ejecuta 'brownie compile' en Contract/")
+    contract = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    tx_hash = contract.constructor().transact({'from': w3.eth.accounts[0]})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+
+def setup_chain(workdir: str, url: str = None):
+    """
+    Prepara ``app.blockchain`` contra la cadena local: contrato desplegado,
+    clave de firma temporal con fondos y sondeo rápido de recibos.
+    """
+    from app import keystore, blockchain
+    w3 = connect(url)
+    address = deploy(w3)
+    with open(blockchain.ABI_FILE, 'r') as f:
+        abi = json.load(f)['abi']
+
+    config.CHAIN_ID = w3.eth.chain_id
+    # Con un bloque por transacción el sondeo por defecto (1 s) sería la medida
+    config.RECEIPT_POLL_INTERVAL_S = 0.01
+    blockchain.configure(w3, address, abi)
+
+    keystore.KEY_FILE = os.path.join(workdir, 'bench_chain_key.pem')
+    keystore.session.lock()
+    account = keystore.session.account
+    tx_hash = w3.eth.send_transaction({
+        'from': w3.eth.accounts[0],
+        'to': account.address,
+        'value': w3.toWei(100, 'ether'),
+    })
+    w3.eth.wait_for_transaction_receipt(tx_hash)
+    return w3
+
+
+def chain_cases(workdir: str, quick: bool = False, url: str = None) -> list:
+    from app.blockchain import build_transaction, send_transaction, track_confirmation
+    from app.receipts import receipt_succeeded
+    setup_chain(workdir, url)
+    counter = iter(range(1, 1 << 62))
+
+    def next_hash() -> bytes:
+        return next(counter).to_bytes(32, 'big')
+
+    def notarize_one():
+        signed_tx = build_transaction(next_hash(), b'', None)
+        tx_hash = send_transaction(signed_tx)
+        if not receipt_succeeded(track_confirmation(tx_hash, timeout=60).result()):
+            raise RuntimeError(f"Transacción revertida: {tx_hash}")
+
+    def notarize_pipelined():
+        futures = [
+            track_confirmation(send_transaction(build_transaction(next_hash(), b'', None)), timeout=60)
+            for _ in range(PIPELINE_SIZE)
+        ]
+        if not all(receipt_succeeded(f.result()) for f in futures):
+            raise RuntimeError("Alguna transacción del lote se revirtió")
+
+    iterations = 10 if quick else 50
+    return [
+        ('notarize_e2e', notarize_one, {'iterations': iterations}),
+        ('notarize_pipelined', notarize_pipelined,
+         {'iterations': max(2, iterations // PIPELINE_SIZE * 2), 'items': PIPELINE_SIZE}),
+    ]
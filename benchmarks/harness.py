@@ -0,0 +1,103 @@
+# benchmarks/harness.py
+import gc
+import json
+import time
+import tracemalloc
+
+"""
+Medición de los benchmarks y comparación con la línea base.
+
+Cada caso se ejecuta dos veces: una pasada cronometrada (sin tracemalloc, que
+ralentiza las asignaciones) de la que salen el rendimiento y las latencias p50
+y p99, y otra corta con tracemalloc para la memoria pico.  La memoria medida es
+la de Python; lo que reserva OpenSSL por su cuenta no aparece.
+"""
+
+# Métricas comparadas con la línea base: (un valor mayor es peor, múltiplo del
+# umbral tolerado).  El p99 depende de unas pocas muestras y es más ruidoso.
+METRICS = {
+    'throughput': (False, 1),
+    'p50_ms': (True, 1),
+    'p99_ms': (True, 2),
+    'peak_kib': (True, 1),
+}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # techo sin float
+    return sorted_values[int(rank) - 1]
+
+
+def measure(fn, iterations: int, warmup: int = 1, items: int = 1, memory_iterations: int = 3) -> dict:
+    """
+    Ejecuta ``fn()`` ``iterations`` veces.  ``items`` es cuántas operaciones
+    hace cada llamada (p. ej. transacciones de un lote), para el rendimiento.
+    """
+    for _ in range(warmup):
+        fn()
+    gc.collect()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(min(memory_iterations, iterations)):
+            fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'throughput': round(iterations * items / elapsed, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Regresiones de ``results`` frente a ``baseline`` (ambos ``{caso: métricas}``)
+    de más de ``threshold`` (fracción, 0.2 = 20 %; el doble para el p99).  Los
+    casos sin línea base no se comparan.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, (higher_is_worse, factor) in METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change if higher_is_worse else -change) > threshold * factor:
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['results']
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: dict, environment: dict):
+    """Guarda ``results`` como línea base, conservando los casos no ejecutados."""
+    merged = load_baseline(path)
+    merged.update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment, 'results': merged}, f, indent=2, sort_keys=True)
@@ -0,0 +1,87 @@
+# benchmarks/run.py
+import os
+os.environ.setdefault('KIVY_NO_ARGS', '1')  # que kivy no interprete nuestras opciones
+import sys
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.harness import measure, compare, load_baseline, save_baseline
+from benchmarks.cases import LOCAL_GROUPS
+
+"""
+Ejecuta los benchmarks, compara con la línea base y termina con código 1 si
+algún resultado empeora más que el umbral.
+
+    python benchmarks/run.py                   # todo menos la cadena
+    python benchmarks/run.py --chain           # también el envío (eth-tester)
+    python benchmarks/run.py --save-baseline   # fija los resultados actuales
+"""
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def _environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de notarización")
+    parser.add_argument('--only', nargs='*', choices=sorted(LOCAL_GROUPS) + ['chain'],
+                        help="Grupos a ejecutar (por defecto, todos los locales)")
+    parser.add_argument('--chain', nargs='?', const='', default=None, metavar='URL',
+                        help="Incluir el envío a la cadena: eth-tester o el nodo de URL")
+    parser.add_argument('--quick', action='store_true', help="Menos iteraciones")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Empeoramiento tolerado respecto a la línea base (0.2 = 20%%)")
+    parser.add_argument('--workdir', default=None,
+                        help="Carpeta para los ficheros de prueba (por defecto, una temporal)")
+    args = parser.parse_args(argv)
+
+    groups = args.only or sorted(LOCAL_GROUPS)
+    run_chain = 'chain' in groups or args.chain is not None
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_')
+    os.makedirs(workdir, exist_ok=True)
+
+    cases = []
+    for group in groups:
+        if group in LOCAL_GROUPS:
+            cases.extend(LOCAL_GROUPS[group](workdir, args.quick))
+    if run_chain:
+        from benchmarks.chain import chain_cases
+        cases.extend(chain_cases(workdir, args.quick, url=args.chain or None))
+
+    results = {}
+    print(f"{'caso':<22}{'ops/s':>12}{'p50 ms':>11}{'p99 ms':>11}{'pico KiB':>11}")
+    for name, fn, options in cases:
+        r = measure(fn, **options)
+        results[name] = r
+        print(f"{name:<22}{r['throughput']:>12.1f}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}{r['peak_kib']:>11.1f}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, _environment())
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print("Sin línea base: ejecuta con --save-baseline para fijarla")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESIÓN {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -27,9 +27,129 @@ GAS_PRICE_GWEI = float(os.getenv("GAS_PRICE_GWEI", "1.0"))
 
 # Carpeta donde guardaremos fotos temporales
 TMP_PHOTO_DIR = os.getenv("TMP_PHOTO_DIR", "./tmp_photos")
+# Carpeta de los datos que deben sobrevivir a la limpieza de las fotos
+# temporales: bandeja de salida, índices y cachés SQLite y progreso de ingesta
+DATA_DIR = os.getenv("DATA_DIR", "./datos")
 
 # Opciones de la cámara (para Plyer o Kivy Camera)
 CAMERA_RESOLUTION = (
     int(os.getenv("CAMERA_WIDTH", "1280")),
     int(os.getenv("CAMERA_HEIGHT", "720"))
 )
+
+# Versión del formato de hash (1 = JSON hexadecimal original, 2 = streaming,
+# 3 = árbol de bloques en paralelo, pensado para vídeos grandes)
+HASH_VERSION = int(os.getenv("HASH_VERSION", "2"))
+# Tamaño de bloque de lectura para el hash en streaming (bytes)
+HASH_CHUNK_SIZE = int(os.getenv("HASH_CHUNK_SIZE", str(1024 * 1024)))
+# Hash en árbol (v3): tamaño de cada bloque hoja y hilos que los calculan
+# (0 = uno por núcleo)
+HASH_TREE_CHUNK_SIZE = int(os.getenv("HASH_TREE_CHUNK_SIZE", str(4 * 1024 * 1024)))
+HASH_TREE_WORKERS = int(os.getenv("HASH_TREE_WORKERS", "0"))
+
+# Lotes Merkle: se cierra un lote al alcanzar BATCH_MAX_SIZE hashes o cuando
+# el hash más antiguo lleva BATCH_MAX_AGE_S segundos esperando
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "256"))
+BATCH_MAX_AGE_S = float(os.getenv("BATCH_MAX_AGE_S", "60"))
+# Segundos que ingest.py espera la confirmación de un lote antes de darlo por no anclado
+BATCH_CONFIRM_TIMEOUT_S = float(os.getenv("BATCH_CONFIRM_TIMEOUT_S", "600"))
+
+# Segundos sin minarse tras los que una transacción se considera atascada y
+# porcentaje de subida del precio de gas al reemplazarla (mínimo 10 % en geth).
+# Debe ser menor que los plazos de confirmación (OUTBOX_CONFIRM_TIMEOUT_S):
+# cada reemplazo vuelve a dar a la transacción el plazo completo
+TX_STUCK_TIMEOUT_S = float(os.getenv("TX_STUCK_TIMEOUT_S", "60"))
+TX_STUCK_CHECK_INTERVAL_S = float(os.getenv("TX_STUCK_CHECK_INTERVAL_S", "15"))
+GAS_BUMP_PERCENT = float(os.getenv("GAS_BUMP_PERCENT", "12.5"))
+
+# Confirmaciones: bloques de profundidad exigidos, intervalo de sondeo del
+# número de bloque y máximo de peticiones por lote JSON-RPC
+CONFIRMATIONS = int(os.getenv("CONFIRMATIONS", "1"))
+RECEIPT_POLL_INTERVAL_S = float(os.getenv("RECEIPT_POLL_INTERVAL_S", "1.0"))
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", "100"))
+
+# Segundos sin uso tras los que la sesión de firma vuelve a bloquear la clave
+# privada (0 = no bloquear automáticamente)
+KEY_SESSION_TTL_S = float(os.getenv("KEY_SESSION_TTL_S", "300"))
+
+# Índice local de eventos NotarizacionRealizada
+INDEX_DB_PATH = os.getenv("INDEX_DB_PATH", os.path.join(DATA_DIR, "eventos.sqlite"))
+INDEX_START_BLOCK = int(os.getenv("INDEX_START_BLOCK", "0"))
+INDEX_CHUNK_BLOCKS = int(os.getenv("INDEX_CHUNK_BLOCKS", "2000"))
+INDEX_REORG_DEPTH = int(os.getenv("INDEX_REORG_DEPTH", "12"))
+
+# Comisiones: segundos de validez máxima de la caché (un bloque nuevo la
+# invalida antes), cada cuántos segundos se mira si hay bloque nuevo, bloques
+# de historial para eth_feeHistory y urgencia por defecto (lenta, normal,
+# rapida).  GAS_PRICE_GWEI queda como respaldo si el nodo no responde.
+FEE_TTL_S = float(os.getenv("FEE_TTL_S", "12"))
+FEE_BLOCK_POLL_S = float(os.getenv("FEE_BLOCK_POLL_S", "2"))
+FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "20"))
+FEE_URGENCY = os.getenv("FEE_URGENCY", "normal")
+
+# Muestreo de sensores en segundo plano: frecuencia, tamaño del búfer circular
+# (muestras) y ventana que se resume en cada captura
+SENSOR_RATE_HZ = float(os.getenv("SENSOR_RATE_HZ", "50"))
+SENSOR_BUFFER_SIZE = int(os.getenv("SENSOR_BUFFER_SIZE", "256"))
+SENSOR_WINDOW_MS = float(os.getenv("SENSOR_WINDOW_MS", "500"))
+# Fuente de sensores: 'plyer' (dispositivo real) o 'fake' (simulada, escritorio)
+SENSOR_SOURCE = os.getenv("SENSOR_SOURCE", "plyer")
+
+# Caché persistente de EXIF (clave: ruta, tamaño y fecha de modificación)
+EXIF_CACHE_PATH = os.getenv("EXIF_CACHE_PATH", os.path.join(DATA_DIR, "exif_cache.sqlite"))
+
+# Casi-duplicados (dHash): distancia de Hamming máxima, si se omite el envío de
+# los casi-duplicados (si no, solo se marcan) y base de datos de huellas
+PHASH_THRESHOLD = int(os.getenv("PHASH_THRESHOLD", "6"))
+PHASH_SKIP_DUPLICATES = os.getenv("PHASH_SKIP_DUPLICATES", "0") == "1"
+PHASH_DB_PATH = os.getenv("PHASH_DB_PATH", os.path.join(DATA_DIR, "huellas.sqlite"))
+
+# Bandeja de salida de notarizaciones (SQLite WAL): trabajos reclamados por
+# lote, intentos antes de marcar un trabajo como fallido y espera máxima de
+# confirmación de cada transacción
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(DATA_DIR, "outbox.sqlite"))
+OUTBOX_CLAIM_BATCH = int(os.getenv("OUTBOX_CLAIM_BATCH", "16"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_CONFIRM_TIMEOUT_S = float(os.getenv("OUTBOX_CONFIRM_TIMEOUT_S", "120"))
+
+# Trazas por etapa (JSON por líneas) y métricas en formato Prometheus
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(TMP_PHOTO_DIR, "trace.jsonl"))
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join(TMP_PHOTO_DIR, "metrics.prom"))
+
+# Nodos RPC: lista separada por comas (por defecto, solo ETH_NODE_URL).  Se
+# elige el más rápido de los sanos; uno que falla se aparta RPC_COOLDOWN_S
+# segundos (el doble en cada fallo seguido) y uno que va más de
+# RPC_MAX_BLOCK_LAG bloques por detrás del mejor también.  RPC_POOL_SIZE es el
+# número de conexiones keep-alive por nodo.
+ETH_NODE_URLS = [u.strip() for u in os.getenv("ETH_NODE_URLS", ETH_NODE_URL).split(",") if u.strip()]
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "10"))
+RPC_TIMEOUT_S = float(os.getenv("RPC_TIMEOUT_S", "10"))
+RPC_COOLDOWN_S = float(os.getenv("RPC_COOLDOWN_S", "5"))
+RPC_MAX_BLOCK_LAG = int(os.getenv("RPC_MAX_BLOCK_LAG", "5"))
+RPC_PROBE_INTERVAL_S = float(os.getenv("RPC_PROBE_INTERVAL_S", "30"))
+
+# Notarización en bloque (notarizarLote): gas máximo por transacción, margen
+# sobre la estimación del nodo y tamaño de la muestra para estimar el gas por hash
+BULK_MAX_GAS = int(os.getenv("BULK_MAX_GAS", "5000000"))
+GAS_ESTIMATE_MARGIN = float(os.getenv("GAS_ESTIMATE_MARGIN", "1.2"))
+BULK_SAMPLE_SIZE = int(os.getenv("BULK_SAMPLE_SIZE", "16"))
+
+# Detección de fotos nuevas (app.watcher): índice de fotos ya vistas, intervalo
+# de sondeo cuando no hay inotify y espera máxima de una captura
+WATCH_INDEX_PATH = os.getenv("WATCH_INDEX_PATH", os.path.join(DATA_DIR, "vistos.sqlite"))
+WATCH_POLL_INTERVAL_S = float(os.getenv("WATCH_POLL_INTERVAL_S", "0.25"))
+CAPTURE_TIMEOUT_S = float(os.getenv("CAPTURE_TIMEOUT_S", "120"))
+
+# Importación de capturas a tmp_photos: 'auto' (enlace duro, reflink o copia),
+# 'reflink' (reflink o copia) o 'copy'; vista previa de la pantalla de
+# confirmación (carpeta, lado mayor en píxeles y calidad JPEG)
+CAPTURE_IMPORT_MODE = os.getenv("CAPTURE_IMPORT_MODE", "auto")
+PREVIEW_DIR = os.getenv("PREVIEW_DIR", os.path.join(TMP_PHOTO_DIR, "previews"))
+PREVIEW_SIZE = int(os.getenv("PREVIEW_SIZE", "640"))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "80"))
+
+# Firmas (app.wallet): formato de las nuevas ('compact' = r||s de 64 bytes sobre
+# el resumen, 'der' = formato antiguo) y verificaciones por tarea en los lotes grandes
+SIGNATURE_FORMAT = os.getenv("SIGNATURE_FORMAT", "compact")
+SIGN_CHUNK_SIZE = int(os.getenv("SIGN_CHUNK_SIZE", "256"))
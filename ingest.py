@@ -0,0 +1,240 @@
+# ingest.py
+"""
+Ingesta masiva sin interfaz gráfica.
+
+Recorre un directorio (o una lista de ficheros), reparte la extracción EXIF y
+el hash entre un pool de procesos y envía los resultados al lote Merkle a
+medida que llegan.  Los ficheros ya anclados se apuntan en un fichero de
+progreso, de modo que una ejecución interrumpida continúa donde se quedó.
+
+Uso:
+    python ingest.py ~/Pictures/archivo --workers 8
+    python ingest.py foto1.jpg foto2.jpg --dry-run
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+# app.metadata importa kivy, que por defecto interpreta sys.argv
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+import config
+from app.metadata import extract_device_id, combine_metadata
+from app.exif import extract_exif_cached
+from app.hasher import hash_with_manifest
+from app.batcher import MerkleBatcher, save_record, set_anchor_status
+from app.phash import BKTree, dhash, get_index
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def iter_files(inputs):
+    """Devuelve las imágenes de ``inputs`` (ficheros o directorios) en orden estable."""
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for p in sorted(path.rglob('*')):
+                if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS:
+                    yield str(p)
+        elif path.is_file():
+            yield str(path)
+
+
+def load_progress(progress_path) -> set:
+    """Lee las rutas ya ancladas en ejecuciones anteriores."""
+    if not os.path.exists(progress_path):
+        return set()
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def process_file(image_path: str, device_id: str) -> dict:
+    """Trabajo de cada proceso: EXIF + metadatos + hash de un fichero."""
+    # EXIF de cabecera, memorizado: reprocesar un archivo casi no cuesta
+    exif = extract_exif_cached(image_path)
+    # Las fotos de archivo no tienen lecturas de sensores del momento de captura
+    metadata = combine_metadata(exif, {}, device_id)
+    photo_hash, manifest = hash_with_manifest(image_path, metadata)
+    # La huella perceptual es opcional: si Pillow no decodifica la imagen
+    # (formato raro, JPEG truncado) se notariza igualmente, sin ella
+    try:
+        phash = f"{dhash(image_path):016x}"
+    except Exception:
+        phash = None
+    record = {
+        'image_path': image_path,
+        'metadata': metadata,
+        'photo_hash': photo_hash.hex(),
+        'hash_version': config.HASH_VERSION,
+        'phash': phash
+    }
+    if manifest is not None:
+        record['chunks'] = manifest
+    return record
+
+
+def ingest(paths, workers: int, records_dir, progress_path, batcher, report_every: float = 5.0,
+           dry_run: bool = False) -> int:
+    """
+    Procesa ``paths`` en paralelo y alimenta ``batcher``.  Devuelve el número de
+    fotos procesadas.  Las rutas se apuntan en ``progress_path`` solo cuando la
+    transacción de su lote se ha confirmado, así que al reanudar nunca se
+    pierde un hash sin anclar.  Las huellas perceptuales entran en el índice
+    de casi-duplicados también al confirmarse el lote.  Con ``dry_run`` no se
+    apunta nada, ni en el progreso ni en el índice.
+    """
+    done = load_progress(progress_path)
+    device_id = extract_device_id()
+    duplicates = get_index()
+    skipped = 0
+    failed = 0
+    unflushed = []
+    fingerprints = []  # [(huella, photo_hash)] de las fotos enviadas al lote
+    sent = BKTree()  # las mismas huellas, para los casi-duplicados de esta ejecución
+    anchoring = []  # [(futuro del recibo, tx_hash, rutas, registros, huellas del lote)]
+    processed = 0
+    start = last_report = time.perf_counter()
+
+    def near_duplicate(fingerprint: int, photo_hash: str):
+        """Foto notarizada, o enviada en esta ejecución, casi igual que ``photo_hash``."""
+        match = duplicates.find(fingerprint)
+        if match is None:
+            matches = sent.search(fingerprint, duplicates.threshold)
+            match = matches[0][1] if matches else None
+        # La propia foto no es un duplicado de sí misma (p. ej. de otra ejecución)
+        return None if match == photo_hash else match
+
+    def closed(summary):
+        """El lote se ha enviado: sus rutas y huellas esperan a la confirmación."""
+        paths, batch_fingerprints = list(unflushed), list(fingerprints)
+        unflushed.clear()
+        fingerprints.clear()
+        if dry_run:
+            return
+        from app.blockchain import track_confirmation
+        tx_hash = summary['tx_hash']
+        anchoring.append((track_confirmation(tx_hash, timeout=config.BATCH_CONFIRM_TIMEOUT_S), tx_hash, paths,
+                          summary.get('records', []), batch_fingerprints))
+
+    def record_confirmed(progress, block: bool = False):
+        """
+        Apunta en el progreso las rutas de los lotes ya confirmados, sus
+        huellas en el índice de casi-duplicados y el resultado del anclaje en
+        las pruebas de sus registros.
+        """
+        from app.receipts import receipt_succeeded
+        for item in list(anchoring):
+            future, tx_hash, paths, records, batch_fingerprints = item
+            if not block and not future.done():
+                continue
+            anchoring.remove(item)
+            try:
+                confirmed = receipt_succeeded(future.result())
+            except Exception as e:
+                print(f"Error esperando la confirmación del lote {tx_hash}: {e}")
+                confirmed = False
+            set_anchor_status(records, 'confirmed' if confirmed else 'failed')
+            if not confirmed:
+                print(f"El lote {tx_hash} no se ha confirmado; sus {len(paths)} fotos "
+                      f"se reprocesarán en la siguiente ejecución")
+                continue
+            for fingerprint, photo_hash in batch_fingerprints:
+                duplicates.add(fingerprint, photo_hash, commit=False)
+            duplicates.commit()
+            progress.writelines(p + '\n' for p in paths)
+            progress.flush()
+
+    def anchor(close, *args):
+        """Llama a ``close`` (``add``, ``poll`` o ``close`` del lote) sin abortar si falla."""
+        try:
+            summary = close(*args)
+        except Exception as e:
+            # Los hashes siguen en el lote abierto: se reintenta al volver a cerrarlo
+            print(f"Error anclando el lote: {e}")
+            return
+        if summary:
+            closed(summary)
+
+    with open(os.devnull if dry_run else progress_path, 'a', encoding='utf-8') as progress, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}  # futuro -> ruta
+        todo = (p for p in paths if p not in done)
+        exhausted = False
+        while pending or not exhausted:
+            # Mantener acotado el número de trabajos en vuelo
+            while not exhausted and len(pending) < workers * 4:
+                try:
+                    path = next(todo)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[pool.submit(process_file, path, device_id)] = path
+            if not pending:
+                break
+            finished, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                path = pending.pop(fut)
+                try:
+                    record = fut.result()
+                except Exception as e:
+                    # Un fichero ilegible no detiene la ingesta; no se apunta en el progreso
+                    print(f"Error procesando {path}: {e}")
+                    failed += 1
+                    continue
+                processed += 1
+                unflushed.append(record['image_path'])
+                # Casi-duplicado de algo ya notarizado: marcar y, si se pide, no enviar
+                fingerprint = int(record['phash'], 16) if record['phash'] else None
+                match = near_duplicate(fingerprint, record['photo_hash']) if fingerprint is not None else None
+                if match is not None:
+                    record['near_duplicate_of'] = match
+                    if config.PHASH_SKIP_DUPLICATES:
+                        save_record(record, records_dir)
+                        skipped += 1
+                        continue
+                record_path = save_record(record, records_dir)
+                if fingerprint is not None:
+                    fingerprints.append((fingerprint, record['photo_hash']))
+                    sent.add(fingerprint, record['photo_hash'])
+                anchor(batcher.add, bytes.fromhex(record['photo_hash']), record_path)
+            anchor(batcher.poll)
+            record_confirmed(progress)
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f"{processed} fotos, {processed / (now - start):.1f} fotos/s")
+                last_report = now
+
+        anchor(batcher.close)
+        record_confirmed(progress, block=True)
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Total: {processed} fotos en {elapsed:.1f}s ({rate:.1f} fotos/s), "
+          f"{skipped} casi-duplicados sin enviar, {failed} con errores")
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta masiva de fotos para notarizar")
+    parser.add_argument('inputs', nargs='+', help="Directorios o ficheros de imagen")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--records-dir', default=os.path.join(config.TMP_PHOTO_DIR, 'records'))
+    parser.add_argument('--progress', default=os.path.join(config.DATA_DIR, 'ingest_progress.txt'))
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Calcula hashes y pruebas sin enviar transacciones")
+    args = parser.parse_args(argv)
+
+    os.makedirs(config.TMP_PHOTO_DIR, exist_ok=True)
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    batcher = MerkleBatcher(max_size=args.batch_size)
+    if args.dry_run:
+        batcher.submit = lambda root, leaf_count: None
+    ingest(iter_files(args.inputs), args.workers, args.records_dir, args.progress, batcher,
+           dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
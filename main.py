@@ -1,14 +1,31 @@
 # main.py
+import time
+_T0 = time.perf_counter()  # inicio del arranque, antes de los imports pesados
+
 import os
+import sys
+if '--startup-time' in sys.argv:
+    os.environ['KIVY_NO_ARGS'] = '1'  # que kivy no intente interpretar la opción
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager
 import config
 from app.ui import build_screen_manager
+from utils.sensors import get_sampler
+from app.outbox import get_outbox, resume
+from app.worker import worker
+
+# Tiempo que cuesta importar la aplicación (kivy + módulos de app)
+IMPORT_TIME_S = time.perf_counter() - _T0
 
 # 1. Inicialización de la aplicación (crear carpetas, cargar configuración)
 def initialize_app():
     os.makedirs(config.TMP_PHOTO_DIR, exist_ok=True)
-    # Aquí podríamos inicializar logs, clientes Web3, etc.
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    # Llenar el búfer de sensores antes de la primera captura
+    get_sampler().start()
+    # Web3 y el contrato se crean en el primer uso (ver app.blockchain)
+    # Recuperar la bandeja de salida tras un cierre, sin retrasar la ventana
+    worker.submit(lambda job: resume(get_outbox()))
 
 # 2. Definición de la App Kivy
 def run_app():
@@ -18,7 +35,15 @@ def run_app():
             self.sm = build_screen_manager()
             return self.sm
 
+        def on_start(self):
+            print(f"Arranque: imports {IMPORT_TIME_S * 1000:.0f} ms, "
+                  f"primera pantalla {(time.perf_counter() - _T0) * 1000:.0f} ms")
+
     NotarizacionApp().run()
 
 if __name__ == '__main__':
-    run_app()
\ No newline at end of file
+    if '--startup-time' in sys.argv:
+        # Solo medir el coste de importar la aplicación, sin abrir ventana
+        print(f"{IMPORT_TIME_S * 1000:.1f} ms")
+    else:
+        run_app()
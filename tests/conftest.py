@@ -0,0 +1,108 @@
+import os
+import types
+import hashlib
+import pytest
+
+# app.keystore y app.metadata importan kivy, que por defecto interpreta sys.argv
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+
+class HexHash(bytes):
+    """Como ``HexBytes`` de web3 5: ``hex()`` incluye el prefijo ``0x``."""
+
+    def hex(self):
+        return '0x' + super().hex()
+
+
+class SignedTx:
+    """Transacción firmada falsa: el hash depende de todos los campos."""
+
+    def __init__(self, tx: dict):
+        self.tx = dict(tx)
+        self.rawTransaction = HexHash(repr(sorted(self.tx.items())).encode())
+        self.hash = HexHash(hashlib.sha256(self.rawTransaction).digest())
+
+
+class _Eth:
+    """``w3.eth`` del nodo falso."""
+
+    def __init__(self, node):
+        self._node = node
+
+    @property
+    def block_number(self):
+        return self._node.block
+
+    def get_transaction_count(self, address, tag='latest'):
+        return self._node.mined if tag == 'latest' else self._node.pending
+
+    def send_raw_transaction(self, raw):
+        return self._node.send_raw_transaction(raw)
+
+
+class FakeNode:
+    """
+    Nodo en memoria con lo que usan ``app.nonce``, ``app.receipts`` y
+    ``app.fees``: llamadas JSON-RPC (``manager.request_blocking``) y la API
+    ``w3.eth`` de web3 5.
+    """
+
+    def __init__(self):
+        self.block = 100
+        self.mined = 0       # eth_getTransactionCount 'latest'
+        self.pending = 0     # eth_getTransactionCount 'pending'
+        self.receipts = {}   # tx_hash -> recibo JSON-RPC
+        self.sent = []       # raw_tx enviados
+        self.send_error = None
+        self.gas_price = hex(10**9)
+        self.fee_history = None
+        self.calls = {}      # datos de eth_call -> resultado
+        self.requests = []
+        self.provider = types.SimpleNamespace(make_request=self.make_request)
+        self.manager = types.SimpleNamespace(request_blocking=self.request_blocking)
+        self.eth = _Eth(self)
+
+    def make_request(self, method, params):
+        self.requests.append(method)
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(self.pending if params[1] == 'pending' else self.mined)}
+        if method == 'eth_blockNumber':
+            return {'result': hex(self.block)}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': self.receipts.get(params[0])}
+        if method == 'eth_call':
+            return {'result': self.calls.get(params[0]['data'], '0x' + '00' * 32)}
+        if method == 'eth_gasPrice':
+            return {'result': self.gas_price}
+        if method == 'eth_feeHistory':
+            if self.fee_history is None:
+                return {'error': {'code': -32601, 'message': 'method not found'}}
+            return {'result': self.fee_history}
+        return {'error': {'code': -32601, 'message': f'{method} no existe'}}
+
+    def request_blocking(self, method, params):
+        response = self.make_request(method, params)
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    def send_raw_transaction(self, raw):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sent.append(raw)
+        self.pending += 1
+        return HexHash(hashlib.sha256(raw).digest())
+
+    def mine(self, tx_hash, status=1, blocks=1):
+        """Incluye ``tx_hash`` en el bloque siguiente y avanza ``blocks`` bloques."""
+        self.block += 1
+        self.receipts[tx_hash] = {
+            'transactionHash': tx_hash, 'blockNumber': hex(self.block),
+            'status': hex(status), 'gasUsed': hex(21000),
+        }
+        self.block += blocks - 1
+
+
+@pytest.fixture
+def node():
+    return FakeNode()
@@ -0,0 +1,118 @@
+import json
+import hashlib
+import pytest
+from app import batcher as batcher_mod
+from app.batcher import MerkleBatcher, save_record, set_anchor_status, verify_record
+
+
+def _hash(i):
+    return hashlib.sha256(str(i).encode()).digest()
+
+
+class _Submit:
+    """Sustituye al anclaje en la cadena; falla mientras ``fail`` sea cierto."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, root, leaf_count):
+        if self.fail:
+            raise ConnectionError("nodo caído")
+        self.calls.append((root, leaf_count))
+        return '0x' + f'{len(self.calls):064x}'
+
+
+def _record(tmp_path, i):
+    h = _hash(i)
+    return h, save_record({'photo_hash': h.hex(), 'metadata': {}}, tmp_path)
+
+
+def test_cierra_por_tamano(tmp_path):
+    submit = _Submit()
+    b = MerkleBatcher(max_size=3, max_age=3600, submit=submit)
+    assert b.add(*_record(tmp_path, 0)) is None
+    assert b.add(*_record(tmp_path, 1)) is None
+    summary = b.add(*_record(tmp_path, 2))
+    assert summary['leaf_count'] == 3 and summary['tx_hash'] == '0x' + f'{1:064x}'
+    assert len(b) == 0 and len(submit.calls) == 1
+
+
+def test_cierra_por_antiguedad(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(batcher_mod.time, 'monotonic', lambda: now[0])
+    b = MerkleBatcher(max_size=100, max_age=10, submit=_Submit())
+    assert not b.should_close() and b.poll() is None
+    b.add(_hash(0))
+    now[0] += 9
+    b.add(_hash(1))
+    assert not b.should_close()
+    # La antigüedad cuenta desde el primer hash del lote
+    now[0] += 1
+    assert b.should_close()
+    assert b.poll()['leaf_count'] == 2
+    assert not b.should_close()
+
+
+def test_registros_con_prueba(tmp_path):
+    b = MerkleBatcher(max_size=100, max_age=3600, submit=_Submit())
+    paths = [_record(tmp_path, i)[1] for i in range(5)]
+    for i, path in enumerate(paths):
+        b.add(_hash(i), path)
+    b.add(_hash(3))  # repetido y sin registro: no añade hoja
+    summary = b.close()
+    assert summary['leaf_count'] == 5
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            record = json.load(f)
+        assert record['merkle']['root'] == summary['root']
+        assert record['merkle']['tx_hash'] == summary['tx_hash']
+        assert record['merkle']['anchor_status'] == 'pending'
+        assert verify_record(record, check_chain=False)
+    assert summary['records'] == paths
+
+
+def test_estado_del_anclaje_tras_el_recibo(tmp_path):
+    b = MerkleBatcher(max_size=100, max_age=3600, submit=_Submit())
+    h, path = _record(tmp_path, 0)
+    b.add(h, path)
+    unbatched = _record(tmp_path, 1)[1]
+    summary = b.close()
+    set_anchor_status(summary['records'] + [unbatched], 'failed')
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['merkle']['anchor_status'] == 'failed'
+    # Un registro sin prueba no se toca
+    with open(unbatched, encoding='utf-8') as f:
+        assert 'merkle' not in json.load(f)
+
+
+def test_fallo_del_envio_conserva_el_lote(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(batcher_mod.time, 'monotonic', lambda: now[0])
+    submit = _Submit(fail=True)
+    b = MerkleBatcher(max_size=100, max_age=10, submit=submit)
+    h0, path0 = _record(tmp_path, 0)
+    b.add(h0, path0)
+    now[0] += 20
+    with pytest.raises(ConnectionError):
+        b.close()
+    assert len(b) == 1
+    # Conserva la antigüedad original: el reintento no espera otro max_age
+    b.add(_hash(1))
+    assert b.should_close()
+
+    submit.fail = False
+    summary = b.close()
+    assert summary['leaf_count'] == 2 and len(b) == 0
+    with open(path0, encoding='utf-8') as f:
+        assert verify_record(json.load(f), check_chain=False)
+
+
+def test_close_sin_pendientes():
+    submit = _Submit()
+    assert MerkleBatcher(submit=submit).close() is None
+    assert submit.calls == []
+
+
+def test_verify_record_sin_prueba():
+    assert not verify_record({'photo_hash': _hash(0).hex()}, check_chain=False)
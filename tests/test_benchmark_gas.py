@@ -0,0 +1,72 @@
+import json
+import importlib.util
+from pathlib import Path
+import pytest
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'Contract' / 'scripts' / 'benchmark_gas.py'
+
+
+@pytest.fixture
+def bench(tmp_path, monkeypatch):
+    """El script de brownie cargado como módulo, con los informes en ``tmp_path``."""
+    spec = importlib.util.spec_from_file_location('benchmark_gas', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'REPORT_DIR', tmp_path / 'gas')
+    monkeypatch.setattr(module, 'BASELINE_FILE', tmp_path / 'gas' / 'baseline.json')
+    monkeypatch.delenv('GAS_REGRESSION_THRESHOLD', raising=False)
+    return module
+
+
+def _report(gas: int) -> dict:
+    return {
+        'report_version': 1,
+        'created_at': '2024-05-01T10:20:30+00:00',
+        'bytecode_sha256': 'ab' * 32,
+        'environment': {'python': '3.11.0', 'chain_id': 1337},
+        'block_gas_limit': 30_000_000,
+        'results': {
+            'notarizar.first': {'gas': gas, 'tx_per_block': 30_000_000 // gas},
+            'throughput': {'tx_per_s': 50.0},
+        },
+    }
+
+
+def test_compare_solo_marca_subidas_por_encima_del_umbral(bench, capsys):
+    baseline = {'a': {'gas': 1000}, 'b': {'gas': 1000}, 'c': {'gas': 1000}, 'd': {'tx_per_s': 10}}
+    results = {'a': {'gas': 1001}, 'b': {'gas': 990}, 'c': {'gas': 1000}, 'd': {'tx_per_s': 5},
+               'nuevo': {'gas': 50}}
+    assert bench.compare(results, baseline, 0) == ['a: 1000 -> 1001 (+0.1%)']
+    # Las bajadas se informan, pero no son regresiones
+    assert 'b: 1000 -> 990 (-1.0%)' in capsys.readouterr().out
+    assert bench.compare(results, baseline, 0.01) == []
+
+
+def test_per_block_y_hashes_nuevos(bench):
+    assert bench._per_block(21_000, 30_000_000) == 1428
+    assert bench._per_block(0, 30_000_000) == 0
+    hashes = bench._fresh(3) + bench._fresh(2)
+    assert len(set(hashes)) == 5 and all(len(h) == 32 for h in hashes)
+
+
+def test_sin_linea_base_solo_guarda_el_informe(bench, monkeypatch, tmp_path):
+    monkeypatch.setattr(bench, '_report', lambda: _report(50_000))
+    bench.main()
+    path = tmp_path / 'gas' / f"gas_20240501T102030Z_{'ab' * 4}.json"
+    assert json.loads(path.read_text()) == _report(50_000)
+    assert not bench.BASELINE_FILE.exists()
+
+
+def test_save_baseline_y_regresion(bench, monkeypatch):
+    monkeypatch.setattr(bench, '_report', lambda: _report(50_000))
+    bench.save_baseline()
+    assert json.loads(bench.BASELINE_FILE.read_text())['results']['notarizar.first']['gas'] == 50_000
+    assert bench.main()['results']['notarizar.first']['gas'] == 50_000
+
+    monkeypatch.setattr(bench, '_report', lambda: _report(50_100))
+    with pytest.raises(SystemExit) as exc:
+        bench.main()
+    assert exc.value.code == 1
+    # Con un umbral del 1 % la misma subida se tolera
+    monkeypatch.setenv('GAS_REGRESSION_THRESHOLD', '0.01')
+    assert bench.main()['results']['notarizar.first']['gas'] == 50_100
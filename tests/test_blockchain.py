@@ -0,0 +1,95 @@
+import json
+import types
+import pytest
+
+pytest.importorskip('kivy')
+from app import blockchain  # noqa: E402
+
+ABI = [{'name': 'notarizar', 'type': 'function', 'inputs': [], 'outputs': []}]
+
+
+@pytest.fixture
+def artifact(tmp_path, monkeypatch):
+    path = tmp_path / 'Notarizacion.json'
+    path.write_text(json.dumps({'abi': ABI, 'bytecode': '0x00'}))
+    monkeypatch.setattr(blockchain, 'ABI_FILE', path)
+    monkeypatch.setattr(blockchain, 'ABI_CACHE_FILE', tmp_path / 'contract_abi.json')
+    return path
+
+
+def test_importar_no_conecta():
+    assert blockchain._w3 is None and blockchain._contract is None
+
+
+def test_load_abi_crea_la_cache(artifact):
+    assert blockchain.load_abi() == ABI
+    cached = json.loads(blockchain.ABI_CACHE_FILE.read_text())
+    assert cached['abi'] == ABI and cached['artifact'] == blockchain._artifact_stamp()
+
+
+def test_load_abi_usa_la_cache(artifact, monkeypatch):
+    blockchain.load_abi()
+    opened = []
+
+    def spy(path, *args, **kwargs):
+        opened.append(path)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(blockchain, 'open', spy, raising=False)
+    assert blockchain.load_abi() == ABI
+    # Con la caché al día el artefacto completo no se vuelve a leer
+    assert opened == [blockchain.ABI_CACHE_FILE]
+
+
+def test_load_abi_regenera_si_cambia_el_artefacto(artifact):
+    blockchain.load_abi()
+    new_abi = ABI + [{'name': 'raices', 'type': 'function', 'inputs': [], 'outputs': []}]
+    artifact.write_text(json.dumps({'abi': new_abi, 'bytecode': '0x0000'}))
+    assert blockchain.load_abi() == new_abi
+
+
+def test_load_abi_sin_artefacto(artifact):
+    blockchain.load_abi()
+    artifact.unlink()
+    assert blockchain.load_abi() == ABI
+    blockchain.ABI_CACHE_FILE.unlink()
+    with pytest.raises(RuntimeError):
+        blockchain.load_abi()
+
+
+@pytest.fixture
+def chain(monkeypatch, node):
+    """``app.blockchain`` sobre el nodo falso, sin hilos en segundo plano."""
+    from app.fees import FeeOracle
+    from app.nonce import NonceManager
+
+    make_request = node.make_request
+
+    def with_chain_id(method, params):
+        if method == 'eth_chainId':
+            return {'result': hex(blockchain.config.CHAIN_ID)}
+        return make_request(method, params)
+
+    monkeypatch.setattr(node, 'make_request', with_chain_id)
+    monkeypatch.setattr(blockchain, '_w3', node)
+    monkeypatch.setattr(blockchain, '_fee_oracle', FeeOracle(node))
+    monkeypatch.setattr(blockchain, 'nonce_manager', NonceManager(node, '0xabc', sign=None))
+    return types.SimpleNamespace(address='0xabc')
+
+
+def test_prime_sincroniza_nonce_y_comisiones(chain, node):
+    node.pending = node.mined = 7
+    blockchain.prime(chain)
+    assert blockchain.nonce_manager.synced
+    assert blockchain.get_fee_oracle().fresh
+    assert blockchain.fee_params() == {'gasPrice': 10**9}
+
+
+def test_prime_con_comisiones_ilegibles_usa_el_respaldo(chain, node):
+    node.pending = node.mined = 7
+    node.gas_price = 'no es un número'
+    blockchain.prime(chain)
+    # El nonce queda sincronizado aunque las comisiones no se puedan leer
+    assert blockchain.nonce_manager.synced
+    assert blockchain.nonce_manager.reserve() == 7
+    assert not blockchain.get_fee_oracle().fresh
@@ -0,0 +1,48 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+import pytest
+
+CONTRACT = Path(__file__).resolve().parent.parent / 'Contract'
+SOURCE = CONTRACT / 'contracts' / 'Notarizacion.sol'
+ARTIFACT = CONTRACT / 'build' / 'contracts' / 'Notarizacion.json'
+
+# El artefacto se compiló antes de añadir notarizarRaiz y notarizarLote, y aquí
+# no hay solc para regenerarlo.  Tras ``brownie compile`` (en Contract/) estas
+# pruebas pasan y, por ser ``strict``, fallan hasta que se quite la marca.
+stale = pytest.mark.xfail(strict=True, reason="Regenerar el artefacto con 'brownie compile'")
+
+
+def _artifact() -> dict:
+    with open(ARTIFACT, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@stale
+def test_el_artefacto_es_el_del_codigo_fuente():
+    # brownie guarda el código compilado y su sha1: el bytecode es el de esa fuente
+    source = SOURCE.read_text(encoding='utf-8')
+    artifact = _artifact()
+    assert artifact['sha1'] == hashlib.sha1(source.encode('utf-8')).hexdigest()
+    assert artifact['source'] == source
+
+
+@stale
+def test_el_artefacto_tiene_la_abi_de_todo_el_contrato():
+    source = SOURCE.read_text(encoding='utf-8')
+    declared = set(re.findall(r'\bfunction\s+(\w+)\s*\(', source))
+    declared |= set(re.findall(r'\bpublic\s+(\w+)\s*;', source))
+    declared |= set(re.findall(r'\bevent\s+(\w+)\s*\(', source))
+    abi = {entry['name'] for entry in _artifact()['abi'] if 'name' in entry}
+    assert declared - abi == set()
+
+
+def test_el_artefacto_es_coherente_consigo_mismo():
+    # Un artefacto editado a mano conserva el sha1 de la fuente con la que se compiló
+    artifact = _artifact()
+    assert artifact['sha1'] == hashlib.sha1(artifact['source'].encode('utf-8')).hexdigest()
+    declared = set(re.findall(r'\bfunction\s+(\w+)\s*\(', artifact['source']))
+    declared |= set(re.findall(r'\bevent\s+(\w+)\s*\(', artifact['source']))
+    abi = {entry['name'] for entry in artifact['abi'] if entry.get('type') in ('function', 'event')}
+    assert abi <= declared | set(re.findall(r'\bpublic\s+(\w+)\s*;', artifact['source']))
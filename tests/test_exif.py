@@ -0,0 +1,101 @@
+import io
+import os
+import pytest
+
+pytest.importorskip('kivy')
+pytest.importorskip('plyer')
+import piexif  # noqa: E402
+from PIL import Image  # noqa: E402
+from app import exif  # noqa: E402
+from app.exif import ExifCache, extract_exif_cached, extract_exif_fast  # noqa: E402
+from app.metadata import extract_exif  # noqa: E402
+
+GPS = {
+    piexif.GPSIFD.GPSLatitudeRef: b'N',
+    piexif.GPSIFD.GPSLatitude: ((40, 1), (25, 1), (1234, 100)),
+    piexif.GPSIFD.GPSLongitudeRef: b'W',
+    piexif.GPSIFD.GPSLongitude: ((3, 1), (42, 1), (0, 1)),
+}
+
+
+def _jpeg(path, exif_dict=None):
+    img = Image.new('RGB', (16, 16), (200, 10, 10))
+    kwargs = {'exif': piexif.dump(exif_dict)} if exif_dict is not None else {}
+    img.save(path, 'JPEG', **kwargs)
+    return str(path)
+
+
+@pytest.fixture
+def images(tmp_path):
+    png = tmp_path / 'captura.png'
+    Image.new('RGB', (8, 8)).save(png, 'PNG')
+    return {
+        'completo': _jpeg(tmp_path / 'completo.jpg', {
+            '0th': {piexif.ImageIFD.DateTime: b'2024:05:01 12:30:00', piexif.ImageIFD.Make: b'Prueba'},
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2024:05:01 12:30:00'},
+            'GPS': GPS,
+        }),
+        'sin_gps': _jpeg(tmp_path / 'sin_gps.jpg', {'0th': {piexif.ImageIFD.DateTime: b'2023:01:02 03:04:05'}}),
+        'solo_gps': _jpeg(tmp_path / 'solo_gps.jpg', {'GPS': GPS}),
+        'sin_exif': _jpeg(tmp_path / 'sin_exif.jpg'),
+        'png': str(png),
+    }
+
+
+def test_fast_coincide_con_extract_exif(images):
+    for name, path in images.items():
+        assert extract_exif_fast(path) == extract_exif(path), name
+
+
+def test_fast_lee_fecha_y_gps(images):
+    result = extract_exif_fast(images['completo'])
+    assert result['datetime'] == '2024:05:01 12:30:00'
+    assert result['gps_latitude'] == pytest.approx(40 + 25 / 60 + 12.34 / 3600)
+    assert result['gps_longitude'] == pytest.approx(3 + 42 / 60)
+    assert extract_exif_fast(images['png']) == {}
+
+
+def test_fast_desde_fichero_abierto(images):
+    with open(images['completo'], 'rb') as f:
+        data = io.BytesIO(f.read())
+    assert extract_exif_fast('no-se-abre.jpg', fileobj=data) == extract_exif(images['completo'])
+
+
+def test_fast_delega_si_un_puntero_se_sale_del_bloque(tmp_path, images):
+    with open(images['completo'], 'rb') as f:
+        data = bytearray(f.read())
+    # Puntero al IFD de GPS fuera del bloque (piexif escribe en big endian):
+    # se delega en piexif, que decide el resultado
+    entry = data.index(b'\x88\x25\x00\x04\x00\x00\x00\x01')
+    data[entry + 8:entry + 12] = b'\xff\xff\xff\x00'
+    broken = tmp_path / 'roto.jpg'
+    broken.write_bytes(bytes(data))
+    assert extract_exif_fast(str(broken)) == extract_exif(str(broken))
+
+
+def test_cache_por_ruta_tamano_y_mtime(tmp_path):
+    cache = ExifCache(str(tmp_path / 'exif.sqlite'))
+    cache.put('/a.jpg', 10, 5, {'datetime': 'x'})
+    assert cache.get('/a.jpg', 10, 5) == {'datetime': 'x'}
+    assert cache.get('/a.jpg', 11, 5) is None
+    assert cache.get('/a.jpg', 10, 6) is None
+    assert cache.get('/b.jpg', 10, 5) is None
+
+
+def test_cached_no_vuelve_a_leer_el_fichero(tmp_path, monkeypatch, images):
+    monkeypatch.setattr(exif, '_cache', ExifCache(str(tmp_path / 'exif.sqlite')))
+    monkeypatch.setattr(exif, '_cache_pid', os.getpid())
+    calls = []
+    original = exif.extract_exif_fast
+    monkeypatch.setattr(exif, 'extract_exif_fast', lambda path: calls.append(path) or original(path))
+
+    path = images['completo']
+    first = extract_exif_cached(path)
+    assert extract_exif_cached(path) == first == extract_exif(path)
+    assert calls == [path]
+
+    # Al cambiar el fichero cambia la clave y se vuelve a leer
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    extract_exif_cached(path)
+    assert len(calls) == 2
@@ -0,0 +1,91 @@
+import time
+import pytest
+from app.fees import FeeOracle
+
+HISTORY = {
+    'baseFeePerGas': ['0x64', '0x6e', '0x78'],
+    # Percentiles 10, 50 y 90 de cada bloque
+    'reward': [['0x1', '0x5', '0xa'], ['0x3', '0x7', '0x14']],
+}
+
+
+def _as_ints(history):
+    return {
+        'baseFeePerGas': [int(v, 16) for v in history['baseFeePerGas']],
+        'reward': [[int(v, 16) for v in r] for r in history['reward']],
+    }
+
+
+@pytest.fixture
+def oracle(node):
+    node.fee_history = HISTORY
+    o = FeeOracle(node, ttl=60, poll_interval=0.01)
+    yield o
+    o.stop()
+
+
+def test_apply_hexadecimal_o_enteros(oracle):
+    from_hex = oracle.apply(['0x10', '0x3b9aca00', HISTORY])
+    from_int = oracle.apply([16, 10**9, _as_ints(HISTORY)])
+    assert from_hex == from_int
+    assert from_hex == {'block': 16, 'gas_price': 10**9, 'base_fee': 120, 'tips': {10: 2, 50: 6, 90: 15}}
+
+
+def test_fee_params(oracle):
+    oracle.apply([16, 10**9, HISTORY])
+    assert oracle.fee_params('normal') == {'maxFeePerGas': 2 * 120 + 6, 'maxPriorityFeePerGas': 6}
+    assert oracle.fee_params('rapida')['maxPriorityFeePerGas'] == 15
+    with pytest.raises(ValueError):
+        oracle.fee_params('inmediata')
+
+
+def test_sin_eip1559_usa_gas_price(oracle):
+    oracle.apply([16, '0x2540be400', ValueError('method not found')])
+    assert oracle.fee_params() == {'gasPrice': 10**10}
+
+
+def test_error_de_gas_price(oracle):
+    with pytest.raises(ValueError):
+        oracle.apply([16, ValueError('caído'), HISTORY])
+
+
+def test_refresh_en_un_lote(oracle, node):
+    snapshot = oracle.refresh()
+    assert snapshot['block'] == node.block and snapshot['base_fee'] == 120
+    assert node.requests == ['eth_blockNumber', 'eth_gasPrice', 'eth_feeHistory']
+    assert oracle.fresh
+
+
+def test_bloque_nuevo_invalida_la_cache(oracle, node):
+    oracle.refresh()
+    oracle.observe_block(node.block)
+    assert oracle.fresh
+    oracle.observe_block(hex(node.block + 1))
+    assert not oracle.fresh
+    # Sin hilo, snapshot() vuelve al nodo
+    node.block += 1
+    assert oracle.snapshot()['block'] == node.block
+    assert oracle.fresh
+
+
+def test_ttl(node):
+    o = FeeOracle(node, ttl=0.01)
+    o.refresh()
+    time.sleep(0.02)
+    assert not o.fresh
+
+
+def test_el_hilo_renueva_con_cada_bloque(oracle, node):
+    oracle.start()
+    deadline = time.monotonic() + 5
+    while not oracle.fresh and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert oracle.snapshot()['block'] == node.block
+    # Sin bloque nuevo solo se pregunta el número de bloque
+    time.sleep(0.05)
+    assert node.requests.count('eth_gasPrice') == 1
+    node.block += 1
+    while oracle.snapshot()['block'] != node.block and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert oracle.snapshot()['block'] == node.block
+    assert node.requests.count('eth_gasPrice') == 2
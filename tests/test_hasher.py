@@ -0,0 +1,134 @@
+import hashlib
+import pytest
+import config
+from app.hasher import (
+    HASH_V1, HASH_V2, HASH_V3, compute_hash, compute_tree, hash_with_manifest,
+    verify_hash, verify_manifest, verify_segment, verify_range,
+)
+
+METADATA = {'fecha': '2024-01-01', 'gps': None}
+CHUNK = 1024
+# Tres bloques completos y uno parcial de 100 bytes, todos distintos
+DATA = b''.join(hashlib.sha256(i.to_bytes(4, 'big')).digest() for i in range(100))[:3 * CHUNK + 100]
+
+# Hashes v1 de la implementación original: no pueden cambiar nunca
+V1_VECTORS = [
+    (b'', {}, 'ef66a2ba9506c136e213dd28c7e29be547dddcc1a29a6fff5f813db9f3187868'),
+    (b'\x00\x01\xff', {'a': 1, 'b': 'x'}, 'a6f1b1b1b2fab206d5fbb4316590972a66cdbd7336e2535780cc75f19cef180c'),
+    (bytes(range(256)) * 3, METADATA, '6eb8344441fd4539c2daa3555caae00a63c043243f24cb4c24cab168d87dcae6'),
+]
+
+
+@pytest.fixture
+def foto(tmp_path):
+    path = tmp_path / 'foto.jpg'
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture
+def arbol(foto):
+    return compute_tree(str(foto), METADATA, chunk_size=CHUNK, workers=2)
+
+
+@pytest.mark.parametrize('image, metadata, expected', V1_VECTORS)
+def test_v1_vectores_de_regresion(image, metadata, expected):
+    assert compute_hash(image, metadata, HASH_V1).hex() == expected
+    assert verify_hash(image, metadata, expected)
+
+
+def test_v1_ruta_igual_que_bytes(foto):
+    assert compute_hash(str(foto), METADATA, HASH_V1) == compute_hash(DATA, METADATA, HASH_V1)
+
+
+def test_v2_ruta_igual_que_bytes(foto, monkeypatch):
+    # Un bloque de lectura que no divide el tamaño fuerza una lectura parcial
+    monkeypatch.setattr(config, 'HASH_CHUNK_SIZE', 1000)
+    from_path = compute_hash(str(foto), METADATA, HASH_V2)
+    assert from_path == compute_hash(DATA, METADATA, HASH_V2)
+    assert from_path == compute_hash(memoryview(DATA), METADATA, HASH_V2)
+    assert from_path != compute_hash(DATA, {**METADATA, 'gps': [0, 0]}, HASH_V2)
+    assert from_path != compute_hash(str(foto), METADATA, HASH_V1)
+
+
+def test_v3_manifiesto(foto, arbol):
+    digest, manifest = arbol
+    assert manifest['chunk_size'] == CHUNK
+    assert manifest['size'] == len(DATA)
+    assert len(manifest['digests']) == 4
+    assert compute_tree(DATA, METADATA, chunk_size=CHUNK, workers=1) == arbol
+    assert verify_manifest(manifest, METADATA, digest)
+    assert verify_manifest(manifest, METADATA, '0x' + digest.hex())
+    assert not verify_manifest(manifest, {'fecha': 'otra'}, digest)
+    tampered = {**manifest, 'digests': manifest['digests'][::-1]}
+    assert not verify_manifest(tampered, METADATA, digest)
+
+
+def test_v3_fichero_vacio(tmp_path):
+    path = tmp_path / 'vacia.jpg'
+    path.write_bytes(b'')
+    digest, manifest = compute_tree(str(path), METADATA, chunk_size=CHUNK)
+    assert manifest['size'] == 0 and len(manifest['digests']) == 1
+    assert digest == compute_tree(b'', METADATA, chunk_size=CHUNK)[0]
+
+
+def test_v3_hash_with_manifest(foto, monkeypatch):
+    monkeypatch.setattr(config, 'HASH_TREE_CHUNK_SIZE', CHUNK)
+    digest, manifest = hash_with_manifest(str(foto), METADATA, HASH_V3)
+    assert digest == compute_hash(str(foto), METADATA, HASH_V3)
+    assert manifest['chunk_size'] == CHUNK
+    assert hash_with_manifest(str(foto), METADATA, HASH_V2)[1] is None
+
+
+def test_verify_segment(arbol):
+    digest, manifest = arbol
+    assert verify_segment(DATA[CHUNK:3 * CHUNK], 1, manifest, METADATA, digest)
+    # El último bloque es parcial
+    assert verify_segment(DATA[3 * CHUNK:], 3, manifest, METADATA, digest)
+    assert verify_segment(DATA[2 * CHUNK:], 2, manifest, METADATA, digest)
+    assert verify_segment(DATA, 0, manifest, METADATA, digest)
+
+
+def test_verify_segment_rechaza(arbol):
+    digest, manifest = arbol
+    assert not verify_segment(b'', 0, manifest, METADATA, digest)
+    # Bloque en la posición equivocada
+    assert not verify_segment(DATA[:CHUNK], 1, manifest, METADATA, digest)
+    # Tramo que no termina en el límite de un bloque
+    assert not verify_segment(DATA[:CHUNK + 10], 0, manifest, METADATA, digest)
+    # Un byte cambiado en el bloque parcial
+    tail = bytearray(DATA[3 * CHUNK:])
+    tail[-1] ^= 1
+    assert not verify_segment(bytes(tail), 3, manifest, METADATA, digest)
+    # Más allá del final del fichero
+    assert not verify_segment(DATA[3 * CHUNK:] + b'x', 3, manifest, METADATA, digest)
+    assert not verify_segment(DATA[:CHUNK], 4, manifest, METADATA, digest)
+
+
+@pytest.mark.parametrize('start, end', [
+    (0, 1),
+    (CHUNK - 1, CHUNK + 1),          # cruza el límite entre bloques
+    (CHUNK, 2 * CHUNK),              # exactamente un bloque
+    (500, 3 * CHUNK + 50),           # varios bloques hasta el parcial
+    (3 * CHUNK + 99, len(DATA)),     # último byte
+    (0, len(DATA)),
+])
+def test_verify_range(foto, arbol, start, end):
+    digest, manifest = arbol
+    assert verify_range(str(foto), start, end, manifest, METADATA, digest)
+
+
+@pytest.mark.parametrize('start, end', [(0, 0), (10, 5), (-1, 10), (0, len(DATA) + 1)])
+def test_verify_range_limites(foto, arbol, start, end):
+    digest, manifest = arbol
+    assert not verify_range(str(foto), start, end, manifest, METADATA, digest)
+
+
+def test_verify_range_detecta_cambios(foto, arbol):
+    digest, manifest = arbol
+    data = bytearray(DATA)
+    data[2 * CHUNK + 7] ^= 0xff
+    foto.write_bytes(bytes(data))
+    assert verify_range(str(foto), 0, CHUNK, manifest, METADATA, digest)
+    assert not verify_range(str(foto), 2 * CHUNK, 2 * CHUNK + 8, manifest, METADATA, digest)
+    assert not verify_range(str(foto), CHUNK + 1, 3 * CHUNK + 1, manifest, METADATA, digest)
@@ -0,0 +1,100 @@
+import os
+import pytest
+from PIL import Image
+from app import importer, tracing
+from app.importer import import_file, make_preview, mapped, preview_path_for
+
+
+@pytest.fixture
+def photo(tmp_path):
+    src = tmp_path / 'galeria' / 'IMG_0001.jpg'
+    src.parent.mkdir()
+    Image.new('RGB', (640, 480), (30, 120, 200)).save(src, 'JPEG')
+    return src
+
+
+@pytest.fixture
+def methods(monkeypatch):
+    """Cuenta los métodos de importación usados (contador ``imports``)."""
+    used = []
+    monkeypatch.setattr(tracing, 'count', lambda name, value=1, **labels: used.append(labels['method']))
+    return used
+
+
+def test_auto_usa_un_enlace_duro(photo, tmp_path, methods):
+    dest = import_file(photo, tmp_path, mode='auto')
+    assert os.path.samefile(dest, photo)
+    assert methods == ['link']
+
+
+def test_copy_no_comparte_el_fichero(photo, tmp_path, methods):
+    dest = import_file(photo, tmp_path, mode='copy')
+    assert not os.path.samefile(dest, photo)
+    assert open(dest, 'rb').read() == photo.read_bytes()
+    assert methods == ['copy']
+
+
+def test_sin_enlace_ni_reflink_se_copia(photo, tmp_path, monkeypatch, methods):
+    def unsupported(src, dest):
+        raise OSError("no soportado")
+
+    monkeypatch.setitem(importer._METHODS, 'auto', (('link', unsupported), ('reflink', unsupported),
+                                                    ('copy', importer._copy)))
+    dest = import_file(photo, tmp_path, mode='auto')
+    assert open(dest, 'rb').read() == photo.read_bytes()
+    assert methods == ['copy']
+
+
+def test_reflink_fallido_no_deja_restos(photo, tmp_path, methods):
+    # tmpfs y ext4 no admiten FICLONE: se copia y no queda un destino vacío
+    dest = import_file(photo, tmp_path, mode='reflink')
+    assert methods[-1] in ('reflink', 'copy')
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_file()) == [os.path.basename(dest)]
+    assert open(dest, 'rb').read() == photo.read_bytes()
+
+
+def test_nombre_repetido_lleva_sufijo(photo, tmp_path, methods):
+    first = import_file(photo, tmp_path, mode='copy')
+    second = import_file(photo, tmp_path, mode='copy')
+    assert first != second
+    assert os.path.basename(second).startswith('IMG_0001_') and second.endswith('.jpg')
+
+
+def test_modo_desconocido(photo, tmp_path):
+    with pytest.raises(ValueError):
+        import_file(photo, tmp_path, mode='mover')
+
+
+def test_todos_los_metodos_fallan(tmp_path, methods):
+    with pytest.raises(OSError):
+        import_file(tmp_path / 'no_existe.jpg', tmp_path / 'destino', mode='copy')
+    assert methods == []
+
+
+def test_mapped_lee_el_fichero_y_se_cierra(photo):
+    with mapped(photo) as mm:
+        assert mm[:2] == b'\xff\xd8'
+        assert mm.read() == photo.read_bytes()
+    assert mm.closed
+
+
+def test_mapped_rechaza_un_fichero_vacio(tmp_path):
+    empty = tmp_path / 'vacia.jpg'
+    empty.write_bytes(b'')
+    with pytest.raises(ValueError):
+        with mapped(empty):
+            pass
+
+
+def test_vista_previa_reducida_desde_la_proyeccion(photo, tmp_path):
+    dest = str(tmp_path / 'previews' / 'p.jpg')
+    with mapped(photo) as mm:
+        assert make_preview(mm, dest, size=100) == dest
+    with Image.open(dest) as img:
+        assert img.format == 'JPEG'
+        assert max(img.size) <= 100 and img.size[0] > img.size[1]
+
+
+def test_ruta_de_la_vista_previa(monkeypatch):
+    monkeypatch.setattr(importer.config, 'PREVIEW_DIR', '/previas')
+    assert preview_path_for('/fotos/IMG_0001.png') == os.path.join('/previas', 'IMG_0001.jpg')
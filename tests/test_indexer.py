@@ -0,0 +1,126 @@
+import pytest
+
+web3 = pytest.importorskip('web3')
+from conftest import HexHash  # noqa: E402
+from app.indexer import EventIndex  # noqa: E402
+
+ADDRESS = '0x' + '22' * 20
+AUTHOR = web3.Web3.toChecksumAddress('0x' + 'ab' * 20)
+OTHER = web3.Web3.toChecksumAddress('0x' + 'cd' * 20)
+
+
+class _Chain:
+    """Bloques y eventos ``NotarizacionRealizada`` sobre el nodo falso."""
+
+    def __init__(self, node, max_range=None):
+        self.node = node
+        self.max_range = max_range  # el nodo rechaza tramos más largos
+        self.hashes = {}  # número -> hash del bloque
+        self.logs = []
+        self.ranges = []  # (desde, hasta) de cada eth_getLogs atendido
+        make_request = node.make_request
+
+        def with_blocks(method, params):
+            if method == 'eth_getBlockByNumber':
+                number = int(params[0], 16)
+                return {'result': {'number': params[0], 'hash': self.block_hash(number)}}
+            return make_request(method, params)
+
+        node.make_request = node.provider.make_request = with_blocks
+        node.eth.get_logs = self.get_logs
+        node.toChecksumAddress = web3.Web3.toChecksumAddress
+
+    def block_hash(self, number):
+        return self.hashes.get(number, '0x' + f'{number:064x}')
+
+    def notarize(self, block, photo_hash, author=AUTHOR, timestamp=1700000000):
+        self.node.block = max(self.node.block, block)
+        self.logs.append({
+            'topics': [HexHash(b'\x00' * 32), HexHash(bytes(12) + bytes.fromhex(author[2:])),
+                       HexHash(photo_hash)],
+            'data': hex(timestamp),
+            'blockNumber': block,
+            'transactionHash': HexHash(bytes([len(self.logs)]) * 32),
+            'logIndex': 0,
+        })
+
+    def get_logs(self, params):
+        start, end = params['fromBlock'], params['toBlock']
+        if self.max_range is not None and end - start + 1 > self.max_range:
+            raise ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+        self.ranges.append((start, end))
+        return [log for log in self.logs if start <= log['blockNumber'] <= end]
+
+
+@pytest.fixture
+def chain(node):
+    node.block = 100
+    return _Chain(node)
+
+
+def _index(node, tmp_path, **kwargs):
+    kwargs.setdefault('start_block', 90)
+    kwargs.setdefault('chunk_size', 5)
+    return EventIndex(node, ADDRESS, db_path=str(tmp_path / 'eventos.sqlite'), reorg_depth=4, **kwargs)
+
+
+def test_sincroniza_y_consulta_en_local(chain, node, tmp_path):
+    chain.notarize(92, b'\x01' * 32)
+    chain.notarize(95, b'\x02' * 32, author=OTHER)
+    chain.notarize(99, b'\x03' * 32, timestamp=1700000500)
+    index = _index(node, tmp_path)
+    assert index.sync() == 3
+    assert chain.ranges == [(90, 94), (95, 99), (100, 100)]
+    assert index.last_block() == 100
+
+    found = index.lookup(b'\x03' * 32)
+    assert found['autor'] == AUTHOR and found['timestamp'] == 1700000500 and found['block_number'] == 99
+    assert index.is_notarized('0x' + '01' * 32)
+    assert not index.is_notarized(b'\x04' * 32)
+    assert [r['block_number'] for r in index.by_author(AUTHOR.lower())] == [92, 99]
+
+
+def test_solo_pide_los_bloques_nuevos(chain, node, tmp_path):
+    chain.notarize(92, b'\x01' * 32)
+    _index(node, tmp_path).sync()
+    chain.ranges.clear()
+    chain.notarize(103, b'\x02' * 32)
+    # Reabrir el índice conserva el último bloque procesado
+    index = _index(node, tmp_path)
+    assert index.sync() == 1
+    assert chain.ranges == [(101, 103)]
+    assert index.is_notarized(b'\x01' * 32) and index.is_notarized(b'\x02' * 32)
+
+
+def test_tramo_rechazado_se_parte(node, tmp_path):
+    chain = _Chain(node, max_range=2)
+    chain.notarize(95, b'\x01' * 32)
+    index = _index(node, tmp_path, start_block=93)
+    assert index.sync(to_block=97) == 1
+    assert chain.ranges == [(93, 94), (95, 96), (97, 97)]
+
+
+def test_reorganizacion_deshace_hasta_el_bloque_comun(chain, node, tmp_path):
+    chain.notarize(99, b'\x01' * 32)
+    chain.notarize(100, b'\x02' * 32)
+    index = _index(node, tmp_path)
+    index.sync()
+
+    # Los bloques 99 y 100 cambian: el evento del 100 desaparece y otro entra en el 101
+    for number in (99, 100):
+        chain.hashes[number] = '0x' + 'ff' * 32
+    chain.logs.pop()
+    chain.notarize(101, b'\x03' * 32)
+    chain.ranges.clear()
+    assert index.sync() == 2
+    assert chain.ranges == [(99, 101)]
+    assert index.is_notarized(b'\x01' * 32) and index.is_notarized(b'\x03' * 32)
+    assert not index.is_notarized(b'\x02' * 32)
+
+
+def test_sin_cambios_no_deshace_nada(chain, node, tmp_path):
+    chain.notarize(99, b'\x01' * 32)
+    index = _index(node, tmp_path)
+    index.sync()
+    assert index._rollback_reorg() == 0
+    assert index.sync() == 0 and index.is_notarized(b'\x01' * 32)
@@ -0,0 +1,110 @@
+import json
+import pytest
+from concurrent.futures import Future
+
+pytest.importorskip('kivy')
+pytest.importorskip('plyer')
+from PIL import Image  # noqa: E402
+import ingest  # noqa: E402
+from app import phash  # noqa: E402
+from app.batcher import MerkleBatcher  # noqa: E402
+from app.phash import DuplicateIndex  # noqa: E402
+
+
+@pytest.fixture
+def photos(tmp_path, monkeypatch):
+    """Dos JPEG distintos y un índice de casi-duplicados en un directorio temporal."""
+    monkeypatch.setattr(ingest.config, 'EXIF_CACHE_PATH', str(tmp_path / 'exif.sqlite'))
+    monkeypatch.setattr(phash, '_index', DuplicateIndex(str(tmp_path / 'phash.sqlite')))
+    paths = []
+    # Degradados en sentidos opuestos: huellas lejos del umbral de casi-duplicado
+    for i, angle in enumerate([90, 270]):
+        img = Image.linear_gradient('L').rotate(angle).convert('RGB')
+        path = tmp_path / f'foto{i}.jpg'
+        img.save(path, 'JPEG')
+        paths.append(str(path))
+    return paths
+
+
+def _run(tmp_path, paths, dry_run, submit=None):
+    batcher = MerkleBatcher(max_size=10, submit=submit or (lambda root, leaf_count: '0x' + root.hex()))
+    return ingest.ingest(paths, 1, tmp_path / 'records', tmp_path / 'progreso.txt', batcher,
+                         dry_run=dry_run)
+
+
+def _undecodable(path):
+    raise OSError("no se puede decodificar")
+
+
+def test_process_file_sin_huella_si_dhash_falla(photos, monkeypatch):
+    monkeypatch.setattr(ingest, 'dhash', _undecodable)
+    record = ingest.process_file(photos[0], 'dispositivo')
+    assert record['phash'] is None
+    assert len(record['photo_hash']) == 64
+
+
+def test_ingesta_continua_sin_huella(tmp_path, photos, monkeypatch):
+    monkeypatch.setattr(ingest, 'dhash', _undecodable)
+    assert _run(tmp_path, photos, dry_run=True) == 2
+    records = [json.loads(p.read_text()) for p in (tmp_path / 'records').glob('*.json')]
+    assert len(records) == 2 and all(r['phash'] is None for r in records)
+
+
+def test_dry_run_no_toca_el_indice_de_duplicados(tmp_path, photos):
+    assert _run(tmp_path, photos, dry_run=True) == 2
+    fingerprints = [ingest.dhash(p) for p in photos]
+    assert all(phash.get_index().find(fp) is None for fp in fingerprints)
+    assert all(DuplicateIndex(str(tmp_path / 'phash.sqlite')).find(fp) is None for fp in fingerprints)
+    assert not (tmp_path / 'progreso.txt').exists()
+
+
+@pytest.fixture
+def receipts(monkeypatch):
+    """Recibos de los lotes anclados: ``status`` decide si se confirman."""
+    from app import blockchain
+    state = {'status': '0x1'}
+
+    def track(tx_hash, timeout=None):
+        future = Future()
+        future.set_result({'transactionHash': tx_hash, 'status': state['status']})
+        return future
+
+    monkeypatch.setattr(blockchain, 'track_confirmation', track)
+    monkeypatch.setattr(ingest.config, 'PHASH_SKIP_DUPLICATES', True)
+    return state
+
+
+def _records(tmp_path):
+    return [json.loads(p.read_text()) for p in sorted((tmp_path / 'records').glob('*.json'))]
+
+
+def test_lote_no_confirmado_se_vuelve_a_anclar(tmp_path, photos, receipts):
+    anchored = []
+
+    def submit(root, leaf_count):
+        anchored.append(leaf_count)
+        return '0x' + root.hex()
+
+    receipts['status'] = '0x0'
+    assert _run(tmp_path, photos, dry_run=False, submit=submit) == 2
+    assert (tmp_path / 'progreso.txt').read_text() == ''
+    assert all(phash.get_index().find(ingest.dhash(p)) is None for p in photos)
+    assert all(r['merkle']['anchor_status'] == 'failed' for r in _records(tmp_path))
+
+    # En la siguiente ejecución ninguna foto es casi-duplicado de sí misma
+    receipts['status'] = '0x1'
+    assert _run(tmp_path, photos, dry_run=False, submit=submit) == 2
+    assert anchored == [2, 2]
+    assert sorted((tmp_path / 'progreso.txt').read_text().split()) == sorted(photos)
+    records = _records(tmp_path)
+    assert all('near_duplicate_of' not in r and r['merkle']['anchor_status'] == 'confirmed' for r in records)
+    assert {phash.get_index().find(ingest.dhash(p)) for p in photos} == {r['photo_hash'] for r in records}
+
+
+def test_la_propia_huella_no_es_un_duplicado(tmp_path, photos, receipts):
+    # Huella que quedó en el índice sin que la foto llegara al progreso
+    record = ingest.process_file(photos[0], ingest.extract_device_id())
+    phash.get_index().add(int(record['phash'], 16), record['photo_hash'])
+    assert _run(tmp_path, photos[:1], dry_run=False) == 1
+    assert 'near_duplicate_of' not in _records(tmp_path)[0]
+    assert (tmp_path / 'progreso.txt').read_text().split() == photos[:1]
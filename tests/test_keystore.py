@@ -0,0 +1,71 @@
+import time
+import pytest
+
+pytest.importorskip('kivy')
+from app import keystore  # noqa: E402
+from app.keystore import SignerSession  # noqa: E402
+
+
+@pytest.fixture
+def loads(tmp_path, monkeypatch):
+    """Clave en un directorio temporal; cuenta cuántas veces se descifra el PEM."""
+    monkeypatch.setattr(keystore, 'KEY_FILE', str(tmp_path / 'clave.pem'))
+    calls = []
+    original = keystore.load_private_key
+
+    def counting():
+        calls.append(1)
+        return original()
+
+    monkeypatch.setattr(keystore, 'load_private_key', counting)
+    return calls
+
+
+def test_descifra_una_sola_vez(loads):
+    session = SignerSession(idle_ttl=60)
+    try:
+        key = session.private_key
+        assert session.public_key.public_numbers() == key.public_key().public_numbers()
+        value = key.private_numbers().private_value
+        assert int.from_bytes(session.account.key, 'big') == value
+        assert len(loads) == 1
+    finally:
+        session.lock()
+
+
+def test_la_clave_persiste_entre_sesiones(loads):
+    first, second = SignerSession(idle_ttl=0), SignerSession(idle_ttl=0)
+    assert first.account.address == second.account.address
+    assert len(loads) == 2
+
+
+def test_lock_olvida_la_clave(loads):
+    session = SignerSession(idle_ttl=60)
+    address = session.account.address
+    session.lock()
+    assert not session.is_unlocked
+    assert session.account.address == address
+    assert len(loads) == 2
+    session.lock()
+
+
+def test_se_bloquea_sin_uso(loads):
+    session = SignerSession(idle_ttl=0.05)
+    session.unlock()
+    for _ in range(4):
+        # Cada uso renueva el plazo
+        time.sleep(0.02)
+        session.private_key
+    assert session.is_unlocked
+    deadline = time.monotonic() + 5
+    while session.is_unlocked and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not session.is_unlocked
+    assert len(loads) == 1
+
+
+def test_sin_plazo_no_se_bloquea(loads):
+    session = SignerSession(idle_ttl=0)
+    session.unlock()
+    assert session._timer is None
+    session.lock()
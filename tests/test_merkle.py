@@ -0,0 +1,52 @@
+import hashlib
+import pytest
+from app.merkle import build_levels, leaf_hash, merkle_proof, merkle_root, node_hash, verify_proof
+
+
+def _hashes(n):
+    return [hashlib.sha256(str(i).encode()).digest() for i in range(n)]
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 5, 7, 8, 13])
+def test_pruebas_de_todas_las_hojas(n):
+    hashes = _hashes(n)
+    levels = build_levels(hashes)
+    root = merkle_root(hashes)
+    assert levels[-1] == [root]
+    for i, h in enumerate(hashes):
+        assert verify_proof(h, merkle_proof(levels, i), root)
+
+
+def test_hoja_unica_es_la_raiz():
+    h = _hashes(1)[0]
+    assert merkle_root([h]) == leaf_hash(h)
+    assert merkle_proof(build_levels([h]), 0) == []
+
+
+def test_nodo_impar_sube_sin_cambios():
+    a, b, c = _hashes(3)
+    assert merkle_root([a, b, c]) == node_hash(node_hash(leaf_hash(a), leaf_hash(b)), leaf_hash(c))
+    # El último nodo no tiene hermano en el primer nivel
+    assert len(merkle_proof(build_levels([a, b, c]), 2)) == 1
+
+
+def test_par_ordenado():
+    a, b = leaf_hash(b'a'), leaf_hash(b'b')
+    assert node_hash(a, b) == node_hash(b, a)
+
+
+def test_pruebas_invalidas():
+    hashes = _hashes(5)
+    levels = build_levels(hashes)
+    root = levels[-1][0]
+    proof = merkle_proof(levels, 1)
+    assert not verify_proof(hashes[2], proof, root)
+    assert not verify_proof(hashes[1], proof[:-1], root)
+    assert not verify_proof(hashes[1], proof, merkle_root(hashes[:4]))
+    # La hoja lleva prefijo: un nodo interno no pasa por hoja
+    assert not verify_proof(levels[1][0], merkle_proof(levels[1:], 0), root)
+
+
+def test_arbol_vacio():
+    with pytest.raises(ValueError):
+        build_levels([])
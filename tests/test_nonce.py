@@ -0,0 +1,177 @@
+import threading
+import pytest
+from app import nonce as nonce_mod
+from app.nonce import NonceManager, bump_fee
+from conftest import SignedTx
+
+ADDRESS = '0x' + '11' * 20
+
+
+@pytest.fixture
+def manager(node):
+    node.mined = node.pending = 5
+    return NonceManager(node, ADDRESS, sign=SignedTx, stuck_timeout=60, bump_percent=12.5)
+
+
+def _sign(manager, gas_price=100):
+    nonce = manager.reserve()
+    tx = {'nonce': nonce, 'gasPrice': gas_price}
+    signed = SignedTx(tx)
+    manager.track(nonce, signed, tx)
+    return signed
+
+
+def test_bump_fee():
+    assert bump_fee(100, 12.5) == 113
+    assert bump_fee(0, 12.5) == 1
+
+
+def test_nonces_consecutivos_sin_volver_al_nodo(manager, node):
+    assert [manager.reserve() for _ in range(3)] == [5, 6, 7]
+    assert node.requests.count('eth_getTransactionCount') == 2
+
+
+def test_release_devuelve_el_nonce(manager):
+    a, b, c = manager.reserve(), manager.reserve(), manager.reserve()
+    manager.release(c)
+    assert manager.reserve() == c
+    manager.release(b)
+    # El hueco se reparte antes que un nonce nuevo
+    assert manager.reserve() == b
+    assert manager.reserve() == 8
+
+
+def test_resync_rellena_los_huecos(manager, node):
+    lost = [_sign(manager), _sign(manager)]
+    unsent = _sign(manager)
+    for signed in lost:
+        manager.mark_sent(signed)
+    # El nodo no conoce las dos enviadas; la firmada sin enviar conserva su nonce 7
+    manager.resync()
+    assert manager.reserve() == 5
+    assert manager.reserve() == 6
+    assert manager.reserve() == 8
+    assert unsent.tx['nonce'] == 7
+
+
+def test_resync_no_reparte_nonces_reservados(manager):
+    reserved = manager.reserve()
+    _sign(manager)
+    manager.resync()
+    assert manager.reserve() not in (reserved, 6)
+
+
+def test_envio_fallido_descartado_deja_hueco_reutilizable(manager, node):
+    first = _sign(manager)
+    failed = _sign(manager)
+    unsent = _sign(manager)
+    node.send_raw_transaction(first.rawTransaction)
+    manager.mark_sent(first)
+    manager.discard(failed)
+    manager.resync()
+    assert unsent.tx['nonce'] == 7
+    assert manager.reserve() == 6
+
+
+@pytest.fixture
+def send(manager, node, monkeypatch):
+    """``blockchain.send_transaction`` sobre el nodo falso y ``manager``."""
+    pytest.importorskip('kivy')
+    from app import blockchain
+    monkeypatch.setattr(blockchain, '_w3', node)
+    monkeypatch.setattr(blockchain, 'nonce_manager', manager)
+    return blockchain.send_transaction
+
+
+def _down(*args, **kwargs):
+    raise ConnectionError("Ningún endpoint RPC responde")
+
+
+def test_fallo_de_red_al_enviar_libera_el_nonce(manager, node, send):
+    node.send_error = ConnectionError("Ningún endpoint RPC responde")
+    with pytest.raises(ConnectionError):
+        send(_sign(manager))
+    assert manager.in_flight() == 0
+
+    # La siguiente transacción lleva el nonce que espera el nodo: se puede minar
+    node.send_error = None
+    following = _sign(manager)
+    send(following)
+    assert following.tx['nonce'] == node.mined == 5
+    assert node.sent == [following.rawTransaction]
+
+
+def test_fallo_de_red_tambien_al_resincronizar(manager, node, send, monkeypatch):
+    _sign(manager)  # nonce 5, firmada y aún sin enviar
+    lost = _sign(manager)
+    node.send_error = ConnectionError("Ningún endpoint RPC responde")
+    batch_call = nonce_mod.batch_call
+    monkeypatch.setattr(nonce_mod, 'batch_call', _down)
+    with pytest.raises(ConnectionError):
+        send(lost)
+    assert not manager.synced
+
+    # Con el nodo de vuelta, la siguiente reserva resincroniza y reutiliza el 6
+    monkeypatch.setattr(nonce_mod, 'batch_call', batch_call)
+    node.send_error = None
+    assert _sign(manager).tx['nonce'] == 6
+
+
+def test_check_gap(manager, node):
+    a, b, c = _sign(manager), _sign(manager), _sign(manager)
+    for signed in (a, b, c):
+        manager.mark_sent(signed)
+    node.mined = node.pending = 6
+    assert not manager.check_gap()  # 5 minada; el nodo espera la 6, en vuelo
+    assert manager.in_flight() == 2
+    # La 6 se pierde: el nodo la espera y ninguna transacción en vuelo la cubre
+    manager.discard(b)
+    assert manager.check_gap()
+    assert manager.reserve() == 6
+
+
+def test_replace_stuck(manager, node, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(nonce_mod.time, 'monotonic', lambda: now[0])
+    replaced = []
+    manager.on_replaced = lambda old, signed: replaced.append((old, signed))
+    stuck, fresh = _sign(manager), _sign(manager)
+    manager.mark_sent(stuck)
+    now[0] += 30
+    manager.mark_sent(fresh)
+    now[0] += 40
+
+    hashes = manager.replace_stuck()
+    assert len(hashes) == 1 and len(node.sent) == 1
+    old, signed = replaced[0]
+    assert old == stuck.hash.hex() and signed.hash.hex() == hashes[0]
+    assert signed.tx == {'nonce': 5, 'gasPrice': 113}
+    assert manager.stuck() == []
+    # El reemplazo vuelve a contar desde su envío
+    now[0] += 60
+    assert manager.stuck() == [5, 6]
+
+
+def test_replace_stuck_rechazado(manager, node, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(nonce_mod.time, 'monotonic', lambda: now[0])
+    manager.on_replaced = lambda old, signed: pytest.fail("no debe avisar")
+    manager.mark_sent(_sign(manager))
+    now[0] += 60
+    node.send_error = ValueError('nonce too low')
+    node.mined = node.pending = 6
+    assert manager.replace_stuck() == []
+    assert manager.in_flight() == 0
+
+
+def test_hilo_de_reemplazo(manager, node):
+    manager.stuck_timeout = 1e-6
+    done = threading.Event()
+    manager.on_replaced = lambda old, signed: done.set()
+    manager.mark_sent(_sign(manager))
+    manager.start(interval=0.01)
+    try:
+        assert done.wait(5)
+    finally:
+        manager.stop()
+    assert node.sent
@@ -0,0 +1,177 @@
+import os
+import types
+import hashlib
+import pytest
+from conftest import HexHash, SignedTx
+from app.outbox import Outbox, submit_job, CONFIRMED, HASHED, SENT, SIGNED
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / 'outbox.sqlite'))
+    yield box
+    box.close()
+
+
+def _record(i):
+    return {'photo_hash': f'{i:064x}', 'image_path': f'/fotos/{i}.jpg', 'metadata': {}}
+
+
+def test_replace_tx(outbox):
+    job_id = outbox.add(_record(1))
+    outbox.update(job_id, SENT, raw_tx='0xviejo', tx_hash='0xaa', record={**_record(1), 'tx_hash': '0xaa'})
+    outbox.replace_tx(job_id, '0xbb', '0xnuevo')
+    job = outbox.get(job_id)
+    assert (job['state'], job['tx_hash'], job['raw_tx']) == (SENT, '0xbb', '0xnuevo')
+    assert job['record']['tx_hash'] == '0xbb'
+    # Sin raw_tx (p. ej. se minó la anterior) se conserva el guardado
+    outbox.replace_tx(job_id, '0xaa')
+    assert outbox.get(job_id)['raw_tx'] == '0xnuevo'
+    assert outbox.get(job_id)['tx_hash'] == '0xaa'
+
+
+def test_replace_tx_trabajo_inexistente(outbox):
+    outbox.replace_tx(99, '0xbb', '0xnuevo')
+    assert outbox.counts() == {}
+
+
+def test_add_many_ignora_repetidos(outbox):
+    ids = outbox.add_many([_record(1), _record(2), _record(1)])
+    assert ids[0] == ids[2] != ids[1]
+    assert outbox.counts() == {HASHED: 2}
+
+
+def test_claim_no_entrega_dos_veces_el_mismo_trabajo(outbox):
+    ids = outbox.add_many([_record(i) for i in range(5)])
+    first = outbox.claim('a', limit=3)
+    second = outbox.claim('b', limit=3)
+    assert [j['id'] for j in first] == ids[:3]
+    assert [j['id'] for j in second] == ids[3:]
+    assert outbox.claim('c') == []
+    assert all(j['attempts'] == 1 and j['claimed_by'] == 'a' for j in first)
+    # Liberado vuelve a la cola, con un intento más al reclamarlo otra vez
+    outbox.release(ids[0])
+    assert [(j['id'], j['attempts']) for j in outbox.claim('c')] == [(ids[0], 2)]
+
+
+def test_recover_y_trabajos_pendientes(outbox, tmp_path):
+    ids = outbox.add_many([_record(1), _record(2)])
+    outbox.claim('muerto', limit=2)
+    outbox.update(ids[1], CONFIRMED, release=True)
+    assert outbox.recover(stale_after=3600) == 0
+    assert outbox.recover() == 1
+    assert outbox.claim('nuevo')[0]['id'] == ids[0]
+    assert outbox.pending_paths() == {os.path.realpath('/fotos/1.jpg')}
+
+
+# --- submit_job ----------------------------------------------------------------
+
+@pytest.fixture
+def chain(monkeypatch, node):
+    """Firma y envío falsos: cada transacción construida lleva el siguiente nonce."""
+    pytest.importorskip('kivy')
+    pytest.importorskip('web3')
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from app import blockchain, keystore, wallet
+
+    state = types.SimpleNamespace(nonce=0, built=[], sent=[], send_errors=[], raw_error=None)
+    public_key = ec.generate_private_key(ec.SECP256K1()).public_key()
+
+    def build(hash_bytes, signature, public_key):
+        signed_tx = SignedTx({'nonce': state.nonce, 'hash': hash_bytes.hex()})
+        state.nonce += 1
+        state.built.append(signed_tx)
+        return signed_tx
+
+    def send(signed_tx):
+        if state.send_errors:
+            raise state.send_errors.pop(0)
+        state.sent.append(signed_tx.rawTransaction)
+        return signed_tx.hash.hex()
+
+    def send_raw(raw):
+        if state.raw_error is not None:
+            raise state.raw_error
+        state.sent.append(raw)
+        return HexHash(hashlib.sha256(raw).digest()).hex()
+
+    monkeypatch.setattr(blockchain, 'build_transaction', build)
+    monkeypatch.setattr(blockchain, 'send_transaction', send)
+    monkeypatch.setattr(blockchain, 'send_raw_transaction', send_raw)
+    monkeypatch.setattr(blockchain, 'get_w3', lambda: node)
+    monkeypatch.setattr(keystore.session, 'unlock', lambda: None)
+    monkeypatch.setattr(keystore, 'load_public_key', lambda: public_key)
+    monkeypatch.setattr(wallet, 'sign_hash', lambda hash_bytes, fmt=None: b'\x01' * 64)
+    return state
+
+
+def _signed_job(outbox, chain):
+    """Trabajo firmado y enviado una vez, como lo deja un cierre tras ``signed``."""
+    job_id = outbox.add(_record(1))
+    submit_job(outbox, outbox.claim('w', job_id=job_id)[0])
+    outbox.update(job_id, SIGNED, release=True)
+    chain.sent.clear()
+    return outbox.claim('w', states=(SIGNED,))[0]
+
+
+def test_submit_firma_guarda_y_envia(outbox, chain):
+    job_id = outbox.add(_record(1))
+    reports = []
+    tx_hash = submit_job(outbox, outbox.claim('w')[0], report=lambda *a: reports.append(a))
+    job = outbox.get(job_id)
+    assert tx_hash == chain.built[0].hash.hex() == job['tx_hash'] == job['record']['tx_hash']
+    assert job['state'] == SENT
+    assert job['raw_tx'] == chain.built[0].rawTransaction.hex()
+    assert job['record']['signature'] == '01' * 64 and 'BEGIN PUBLIC KEY' in job['record']['public_key']
+    assert reports == [('signing',), ('submitted', tx_hash)]
+
+
+def test_envio_rechazado_se_vuelve_a_firmar(outbox, chain):
+    job_id = outbox.add(_record(1))
+    chain.send_errors.append(ValueError('insufficient funds'))
+    with pytest.raises(ValueError):
+        submit_job(outbox, outbox.claim('w')[0])
+    # send_transaction descartó el nonce: no queda una transacción que reenviar
+    job = outbox.get(job_id)
+    assert (job['state'], job['raw_tx'], job['tx_hash']) == (SIGNED, None, None)
+
+    outbox.release(job_id)
+    tx_hash = submit_job(outbox, outbox.claim('w', states=(SIGNED,))[0])
+    assert [tx.tx['nonce'] for tx in chain.built] == [0, 1]
+    assert tx_hash == chain.built[1].hash.hex() == outbox.get(job_id)['tx_hash']
+    assert chain.sent == [chain.built[1].rawTransaction]
+
+
+def test_reenvio_ya_conocido_es_exito(outbox, chain):
+    job = _signed_job(outbox, chain)
+    chain.raw_error = ValueError({'code': -32000, 'message': 'already known'})
+    assert submit_job(outbox, job) == job['tx_hash']
+    assert len(chain.built) == 1
+    assert outbox.get(job['id'])['state'] == SENT
+
+
+def test_nonce_usado_por_otra_transaccion_se_vuelve_a_firmar(outbox, chain):
+    job = _signed_job(outbox, chain)
+    chain.raw_error = ValueError({'code': -32000, 'message': 'nonce too low'})
+    tx_hash = submit_job(outbox, job)
+    assert tx_hash != job['tx_hash']
+    assert tx_hash == chain.built[1].hash.hex()
+    stored = outbox.get(job['id'])
+    assert (stored['state'], stored['tx_hash']) == (SENT, tx_hash)
+    assert stored['raw_tx'] == chain.built[1].rawTransaction.hex()
+
+
+def test_nonce_usado_por_la_propia_transaccion_minada(outbox, chain, node):
+    job = _signed_job(outbox, chain)
+    node.mine(job['tx_hash'])
+    chain.raw_error = ValueError({'code': -32000, 'message': 'nonce too low'})
+    assert submit_job(outbox, job) == job['tx_hash']
+    assert len(chain.built) == 1
+
+
+def test_otro_error_de_reenvio_se_propaga(outbox, chain):
+    job = _signed_job(outbox, chain)
+    chain.raw_error = ValueError({'code': -32000, 'message': 'insufficient funds for gas'})
+    with pytest.raises(ValueError):
+        submit_job(outbox, job)
+    assert outbox.get(job['id'])['raw_tx'] == job['raw_tx']
@@ -0,0 +1,99 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from app import phash
+from app.phash import BKTree, DuplicateIndex, dhash, dhash_batch, group_near_duplicates, hamming
+
+
+def _image(path, seed: int, noise: int = 0):
+    """Degradado con una mancha que depende de ``seed``; ``noise`` la perturba un poco."""
+    rng = np.random.default_rng(seed)
+    base = np.tile(np.linspace(0, 255, 64, dtype=np.float64), (64, 1))
+    base += rng.integers(-120, 120, (8, 8)).repeat(8, 0).repeat(8, 1)
+    if noise:
+        base += np.random.default_rng(1000 + noise).integers(-noise, noise + 1, base.shape)
+    Image.fromarray(np.clip(base, 0, 255).astype(np.uint8), 'L').save(path, 'JPEG', quality=95)
+    return str(path)
+
+
+def test_dhash_batch_coincide_con_dhash(tmp_path):
+    paths = [_image(tmp_path / f'{i}.jpg', i) for i in range(4)]
+    batch = dhash_batch(paths)
+    assert batch.dtype == np.uint64
+    assert [int(x) for x in batch] == [dhash(p) for p in paths]
+    assert len(dhash_batch([])) == 0
+
+
+def test_dhash_desde_fichero_abierto(tmp_path):
+    path = _image(tmp_path / 'a.jpg', 1)
+    with open(path, 'rb') as f:
+        assert dhash(io.BytesIO(f.read())) == dhash(path)
+
+
+def test_casi_duplicados_cerca_y_distintas_lejos(tmp_path):
+    a = dhash(_image(tmp_path / 'a.jpg', 1))
+    a2 = dhash(_image(tmp_path / 'a2.jpg', 1, noise=3))
+    b = dhash(_image(tmp_path / 'b.jpg', 2))
+    assert hamming(a, a2) <= phash.config.PHASH_THRESHOLD
+    assert hamming(a, b) > phash.config.PHASH_THRESHOLD
+
+
+def test_dhash_de_imagen_ilegible_falla(tmp_path):
+    bad = tmp_path / 'rota.jpg'
+    bad.write_bytes(b'\xff\xd8 no es un jpeg')
+    with pytest.raises(Exception):
+        dhash(str(bad))
+
+
+def test_bktree_busca_por_radio():
+    tree = BKTree()
+    for i, fp in enumerate([0b0000, 0b0001, 0b0011, 0b1111, (1 << 63) | 0b111_0000]):
+        tree.add(fp, i)
+    assert len(tree) == 5
+    assert tree.search(0, 0) == [(0, 0)]
+    assert [v for _, v in tree.search(0, 2)] == [0, 1, 2]
+    assert tree.search((1 << 63) | 0b111_0000, 1) == [(0, 4)]
+    assert BKTree().search(0, 64) == []
+
+
+def test_bktree_igual_que_fuerza_bruta():
+    rng = np.random.default_rng(7)
+    fps = [int(x) for x in rng.integers(0, 2**63, 200, dtype=np.int64)]
+    tree = BKTree()
+    for i, fp in enumerate(fps):
+        tree.add(fp, i)
+    for query in fps[:20]:
+        expected = sorted(i for i, fp in enumerate(fps) if hamming(query, fp) <= 20)
+        assert sorted(v for _, v in tree.search(query, 20)) == expected
+
+
+def test_indice_persiste_huellas_de_64_bits(tmp_path):
+    db = str(tmp_path / 'phash.sqlite')
+    index = DuplicateIndex(db, threshold=2)
+    high = (1 << 64) - 1
+    index.add(high, 'aa')
+    index.add(0x0F, 'bb', commit=False)
+    index.add(0x0F, 'cc')  # misma foto con otra huella repetida: no se duplica
+    assert index.find(high ^ 0b11) == 'aa'
+    assert index.find(0x0F ^ 1) == 'bb'
+    assert index.find(0xF0F0) is None
+
+    reopened = DuplicateIndex(db, threshold=2)
+    assert reopened.find(high) == 'aa'
+    assert reopened.find(0x0F) in ('bb', 'cc')
+
+
+def test_indice_sin_commit_no_se_guarda(tmp_path):
+    db = str(tmp_path / 'phash.sqlite')
+    index = DuplicateIndex(db, threshold=0)
+    index.add(5, 'aa', commit=False)
+    assert index.find(5) == 'aa'
+    assert DuplicateIndex(db, threshold=0).find(5) is None
+    index.commit()
+    assert DuplicateIndex(db, threshold=0).find(5) == 'aa'
+
+
+def test_agrupa_rafagas():
+    groups = group_near_duplicates([0b0000, 0b1111_0000, 0b0001, 0b1111_0001, 0b0011], threshold=1)
+    assert groups == [[0, 2], [1, 3], [4]]
@@ -0,0 +1,117 @@
+import threading
+import pytest
+from app import receipts as receipts_mod
+from app.receipts import ConfirmationTracker, receipt_succeeded
+
+OLD = '0x' + 'aa' * 32
+NEW = '0x' + 'bb' * 32
+
+
+@pytest.fixture
+def tracker(node):
+    # Sin sondeo automático: cada prueba llama a poll_once
+    t = ConfirmationTracker(node, confirmations=2, poll_interval=3600, batch_size=2)
+    yield t
+    t.stop()
+
+
+def test_confirma_con_la_profundidad_pedida(tracker, node):
+    future = tracker.track(OLD[2:])
+    node.mine(OLD)
+    tracker.poll_once()
+    assert not future.done()
+    node.block += 1
+    tracker.poll_once()
+    assert receipt_succeeded(future.result(0))
+    assert tracker.pending() == 0
+
+
+def test_reemplazo_resuelve_con_la_nueva(tracker, node):
+    calls = []
+    future = tracker.track(OLD, on_replaced=lambda *args: calls.append(args))
+    assert tracker.replace(OLD, NEW[2:], '0xraw')
+    assert calls == [(OLD, NEW, '0xraw')]
+    assert tracker.pending() == 1
+    node.mine(NEW, blocks=2)
+    tracker.poll_once()
+    assert future.result(0)['transactionHash'] == NEW
+    assert tracker.pending() == 0 and tracker._pending == {}
+
+
+def test_reemplazo_resuelve_con_la_anterior(tracker, node):
+    future = tracker.track(OLD)
+    tracker.replace(OLD, NEW)
+    node.mine(OLD, blocks=2)
+    tracker.poll_once()
+    assert future.result(0)['transactionHash'] == OLD
+    assert tracker._pending == {}
+
+
+def test_reemplazo_de_hash_no_vigilado(tracker):
+    assert not tracker.replace(OLD, NEW)
+
+
+def test_reemplazo_reinicia_el_plazo(tracker, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(receipts_mod.time, 'monotonic', lambda: now[0])
+    future = tracker.track(OLD, timeout=10)
+    now[0] += 8
+    tracker.replace(OLD, NEW)
+    now[0] += 8
+    tracker.poll_once()
+    assert not future.done()
+    now[0] += 2
+    tracker.poll_once()
+    with pytest.raises(TimeoutError):
+        future.result(0)
+    assert tracker._pending == {}
+
+
+def test_receipt_succeeded_hex_o_entero():
+    assert receipt_succeeded({'status': '0x1'})
+    assert receipt_succeeded({'status': 1})
+    assert not receipt_succeeded({'status': '0x0'})
+    assert not receipt_succeeded({})
+
+
+def test_el_hilo_termina_y_track_lo_rearranca(node):
+    tracker = ConfirmationTracker(node, confirmations=1, poll_interval=0.005)
+    try:
+        for tx_hash in (OLD, NEW):
+            future = tracker.track(tx_hash)
+            node.mine(tx_hash)
+            assert future.result(5)['transactionHash'] == tx_hash
+            tracker._stop.wait(0.05)
+            assert tracker._thread is None
+    finally:
+        tracker.stop()
+
+
+def test_track_mientras_el_hilo_sale(node):
+    """Un track() que llega justo cuando el hilo decide terminar no se pierde."""
+    tracker = ConfirmationTracker(node, confirmations=1, poll_interval=0.005)
+    late = {}
+
+    class _Pending(dict):
+        def __len__(self):
+            size = super().__len__()
+            if not size and not late and threading.current_thread() is tracker._thread:
+                # El hilo de sondeo tiene el cerrojo y va a salir: este track()
+                # espera al cerrojo y entra justo después
+                late['thread'] = threading.Thread(target=lambda: late.setdefault('future', tracker.track(NEW)))
+                late['thread'].start()
+            return size
+
+    tracker._pending = _Pending()
+    try:
+        first = tracker.track(OLD)
+        node.mine(OLD)
+        first.result(5)
+        node.mine(NEW)
+        for _ in range(500):
+            if 'future' in late:
+                break
+            tracker._stop.wait(0.01)
+        assert late['future'].result(5)['transactionHash'] == NEW
+    finally:
+        tracker.stop()
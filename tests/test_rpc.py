@@ -0,0 +1,26 @@
+import pytest
+from app import tracing
+from app.rpc import batch_call
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Cada ``tracing.count('rpc_calls')`` como el método contado."""
+    methods = []
+
+    def count(name, value=1, **labels):
+        if name == 'rpc_calls':
+            methods.append(labels['method'])
+
+    monkeypatch.setattr(tracing, 'count', count)
+    return methods
+
+
+def test_batch_call_sin_http_cuenta_cada_llamada_una_vez(node, counted):
+    # Como en un w3 instrumentado: cada petición al nodo pasa por el middleware
+    node.make_request = node.provider.make_request = tracing.rpc_middleware(node.make_request, node)
+    assert batch_call(node, [('eth_blockNumber', []), ('eth_gasPrice', [])]) == [hex(100), hex(10**9)]
+    assert counted == ['eth_blockNumber', 'eth_gasPrice']
+    # Fuera de batch_call el middleware sí cuenta
+    node.make_request('eth_blockNumber', [])
+    assert counted == ['eth_blockNumber', 'eth_gasPrice', 'eth_blockNumber']
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.rpc import EndpointPool
+
+
+class _Stub:
+    """Nodo JSON-RPC falso: responde eth_blockNumber con ``block`` o falla con ``status``."""
+
+    def __init__(self, block=100, status=200):
+        self.block = block
+        self.status = status
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                stub.hits += 1
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if stub.status != 200:
+                    self.send_response(stub.status)
+                    self.end_headers()
+                    return
+                items = body if isinstance(body, list) else [body]
+                out = [{'jsonrpc': '2.0', 'id': i['id'], 'result': hex(stub.block)} for i in items]
+                data = json.dumps(out if isinstance(body, list) else out[0]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stubs():
+    created = []
+
+    def make(**kwargs):
+        stub = _Stub(**kwargs)
+        created.append(stub)
+        return stub
+    yield make
+    for stub in created:
+        stub.close()
+
+
+def _block_number(pool):
+    body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_blockNumber', 'params': []}).encode()
+    return int(json.loads(pool.post(body))['result'], 16)
+
+
+def test_conmuta_al_siguiente_nodo_si_falla(stubs):
+    caido, sano = stubs(status=503), stubs(block=7)
+    pool = EndpointPool([caido.url, sano.url], timeout=2, cooldown=60)
+    assert _block_number(pool) == 7
+    # El nodo caído queda apartado: la siguiente petición va directa al sano
+    assert _block_number(pool) == 7
+    assert caido.hits == 1
+    assert pool.best_url == sano.url
+
+
+def test_aparta_nodos_retrasados(stubs):
+    adelantado, retrasado = stubs(block=1000), stubs(block=900)
+    pool = EndpointPool([retrasado.url, adelantado.url], timeout=2, cooldown=60, max_lag=5)
+    pool.probe()
+    assert pool.ordered()[0].url == adelantado.url
+    assert pool.ordered()[-1].url == retrasado.url
+
+
+def test_sin_nodos_disponibles(stubs):
+    pool = EndpointPool([stubs(status=500).url, stubs(status=429).url], timeout=2)
+    with pytest.raises(ConnectionError):
+        _block_number(pool)
@@ -0,0 +1,68 @@
+import time
+import pytest
+
+pytest.importorskip('plyer')
+from utils import sensors  # noqa: E402
+from utils.sensors import FakeSensorSource, RingBuffer, SensorSampler, summarize  # noqa: E402
+
+
+def test_ring_buffer_sobrescribe_las_mas_antiguas():
+    buf = RingBuffer(3)
+    for t in range(5):
+        buf.append(t, t, t * 10, t * 100)
+    assert len(buf) == 3
+    assert [tuple(s) for s in buf.since(0)] == [(4, 4, 40, 400), (3, 3, 30, 300), (2, 2, 20, 200)]
+
+
+def test_ring_buffer_since_corta_por_tiempo():
+    buf = RingBuffer(8)
+    for t in range(6):
+        buf.append(t, 0, 0, 0)
+    assert [s[0] for s in buf.since(3.5)] == [5, 4]
+    assert buf.since(10) == []
+    assert RingBuffer(4).since(0) == []
+
+
+def test_summarize_por_eje():
+    assert summarize([]) == {'n': 0}
+    summary = summarize([(0, 1, 2, 3), (1, 3, 2, 5)])
+    assert summary['n'] == 2
+    assert summary['x'] == {'mean': 2, 'var': 1, 'min': 1, 'max': 3}
+    assert summary['y'] == {'mean': 2, 'var': 0, 'min': 2, 'max': 2}
+    assert summary['z']['mean'] == 4
+
+
+def test_sample_once_ignora_el_sensor_sin_dato():
+    sampler = SensorSampler(FakeSensorSource(lambda t: ((1.0, 2.0, 3.0), None)), rate_hz=100, capacity=4)
+    sampler.sample_once()
+    summary = sampler.summary(window_ms=1000)
+    assert summary['accelerometer']['n'] == 1
+    assert summary['accelerometer']['z']['mean'] == 3
+    assert summary['gyroscope'] == {'n': 0}
+
+
+def test_summary_solo_cuenta_la_ventana(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sensors.time, 'monotonic', lambda: now[0])
+    sampler = SensorSampler(FakeSensorSource(), rate_hz=100, capacity=16)
+    for _ in range(5):
+        sampler.sample_once()
+        now[0] += 0.1
+    # En t=100.5 una ventana de 250 ms cubre las muestras de 100.3 y 100.4
+    assert sampler.summary(window_ms=250)['accelerometer']['n'] == 2
+    assert sampler.summary(window_ms=1000)['accelerometer']['n'] == 5
+
+
+def test_hilo_muestrea_y_se_detiene():
+    sampler = SensorSampler(FakeSensorSource(), rate_hz=200, capacity=64)
+    sampler.start()
+    assert sampler.running
+    deadline = time.monotonic() + 5
+    while len(sampler.accel) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sampler.stop()
+    assert not sampler.running
+    assert len(sampler.accel) >= 3
+    summary = sampler.summary(window_ms=60_000)
+    assert summary['accelerometer']['z']['mean'] == pytest.approx(9.81)
+    assert summary['gyroscope']['x']['var'] == 0
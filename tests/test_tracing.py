@@ -0,0 +1,101 @@
+import json
+import types
+import threading
+import pytest
+from app import tracing
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    """Trazas activas en un directorio temporal, con contadores vacíos."""
+    monkeypatch.setattr(tracing, 'atexit', types.SimpleNamespace(register=lambda fn: None))
+    monkeypatch.setattr(tracing, '_counters', {})
+    monkeypatch.setattr(tracing, '_stages', {})
+    paths = types.SimpleNamespace(trace=tmp_path / 'trace.jsonl', metrics=tmp_path / 'm' / 'metrics.prom')
+    tracing.enable(str(paths.trace), str(paths.metrics))
+    yield paths
+    tracing.disable()
+
+
+def _events(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_desactivado_no_hace_nada(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, '_counters', {})
+    assert not tracing.enabled()
+    with tracing.span('hash') as s:
+        s.set(bytes=10)
+    tracing.count('rpc_calls', method='eth_call')
+    tracing.record('confirm', 0, 1)
+    assert tracing.span('otra') is tracing.span('hash')
+    assert tracing._counters == {}
+    tracing.write_metrics(str(tmp_path / 'metrics.prom'))
+    assert not (tmp_path / 'metrics.prom').exists()
+
+
+def test_span_escribe_la_etapa_con_la_captura(traced):
+    with tracing.capture('abc'):
+        with tracing.span('compute_hash', version=2) as s:
+            s.set(bytes=1024)
+        tracing.record('confirmation', 1700000000.0, 0.25)
+    with tracing.span('sin_captura'):
+        pass
+    events = _events(traced.trace)
+    assert [(e['capture_id'], e['span']) for e in events] == [
+        ('abc', 'compute_hash'), ('abc', 'confirmation'), (None, 'sin_captura')]
+    assert events[0]['attrs'] == {'version': 2, 'bytes': 1024}
+    assert events[1]['duration_ms'] == 250 and events[1]['start'] == 1700000000.0
+    assert 'attrs' not in events[2] and 'error' not in events[2]
+
+
+def test_span_registra_el_error_y_lo_propaga(traced):
+    with pytest.raises(ValueError):
+        with tracing.span('send_transaction'):
+            raise ValueError('nonce too low')
+    assert _events(traced.trace)[0]['error'] == 'ValueError: nonce too low'
+
+
+def test_captura_por_hilo(traced):
+    seen = {}
+
+    def other():
+        seen['other'] = tracing.current_capture()
+
+    with tracing.capture('principal'):
+        t = threading.Thread(target=other)
+        t.start()
+        t.join()
+        assert tracing.current_capture() == 'principal'
+    assert seen['other'] is None
+    assert tracing.current_capture() is None
+
+
+def test_contadores_y_exportacion_prometheus(traced):
+    tracing.count('rpc_calls', method='eth_call')
+    tracing.count('rpc_calls', method='eth_call')
+    tracing.count('rpc_calls', method='eth_blockNumber')
+    tracing.count('gas_used', 21000)
+    tracing.count('imports', method='a"b')
+    with tracing.span('hash'):
+        pass
+    text = tracing.prometheus_text()
+    assert '# TYPE notarizacion_rpc_calls_total counter' in text
+    assert 'notarizacion_rpc_calls_total{method="eth_call"} 2' in text
+    assert 'notarizacion_rpc_calls_total{method="eth_blockNumber"} 1' in text
+    assert 'notarizacion_gas_used_total 21000' in text
+    assert 'notarizacion_imports_total{method="a\\"b"} 1' in text
+    assert 'notarizacion_stage_seconds_count{stage="hash"} 1' in text
+
+    tracing.write_metrics()
+    assert traced.metrics.read_text(encoding='utf-8') == text
+    assert not (traced.metrics.parent / 'metrics.prom.tmp').exists()
+
+
+def test_rpc_middleware_cuenta_por_metodo(traced):
+    calls = []
+    middleware = tracing.rpc_middleware(lambda method, params: calls.append(method) or {'result': 1}, None)
+    assert middleware('eth_chainId', []) == {'result': 1}
+    assert calls == ['eth_chainId']
+    assert tracing._counters == {('rpc_calls', (('method', 'eth_chainId'),)): 1}
@@ -0,0 +1,111 @@
+import json
+import pytest
+from app.hasher import HASH_V2, HASH_V3, compute_hash, hash_with_manifest
+from app import verifier
+from app.merkle import build_levels, merkle_proof
+from app.verifier import _rehash, load_records, verify_many
+
+ADDRESS = '0x' + '22' * 20
+METADATA = {'fecha': '2024-01-01'}
+
+
+@pytest.fixture
+def foto(tmp_path):
+    path = tmp_path / 'foto.jpg'
+    path.write_bytes(b'imagen' * 100)
+    return str(path)
+
+
+def _record(path, **extra):
+    return {'image_path': path, 'metadata': METADATA, 'hash_version': HASH_V2,
+            'photo_hash': compute_hash(path, METADATA, HASH_V2).hex(), **extra}
+
+
+def test_rehash(foto):
+    digest, error = _rehash((foto, METADATA, HASH_V2, None))
+    assert digest == compute_hash(foto, METADATA, HASH_V2).hex() and error is None
+
+
+@pytest.mark.parametrize('job', [
+    ('/no/existe.jpg', METADATA, HASH_V2),
+    (None, METADATA, HASH_V2),
+    ('{foto}', METADATA, 99),
+    ('{foto}', {'fecha': object()}, HASH_V2),
+])
+def test_rehash_no_lanza(foto, job):
+    path, metadata, version = job
+    digest, error = _rehash((path.format(foto=foto) if path else path, metadata, version, None))
+    assert digest is None and error
+
+
+def test_rehash_v3_con_el_bloque_del_registro(foto, monkeypatch):
+    monkeypatch.setattr(verifier.config, 'HASH_TREE_CHUNK_SIZE', 128)
+    digest, manifest = hash_with_manifest(foto, METADATA, HASH_V3)
+    # El registro se creó con otro tamaño de bloque que el configurado ahora
+    monkeypatch.setattr(verifier.config, 'HASH_TREE_CHUNK_SIZE', 256)
+    assert compute_hash(foto, METADATA, HASH_V3) != digest
+    assert _rehash((foto, METADATA, HASH_V3, manifest['chunk_size'])) == (digest.hex(), None)
+
+
+def test_load_records(tmp_path, foto):
+    (tmp_path / 'a.json').write_text(json.dumps(_record(foto)))
+    (tmp_path / 'b.json').write_text(json.dumps(_record(foto)))
+    assert len(load_records([tmp_path])) == 2
+    assert len(load_records([tmp_path / 'a.json'])) == 1
+
+
+def test_verify_many_informa_cada_registro(node, tmp_path, foto):
+    pytest.importorskip('kivy')
+    web3 = pytest.importorskip('web3')
+    selector = lambda sig: web3.Web3.keccak(text=sig).hex()[2:10]
+    good = _record(foto)
+    node.calls['0x' + selector('registros(bytes32)') + good['photo_hash']] = hex(1700000000)
+
+    levels = build_levels([bytes.fromhex(good['photo_hash']), b'\x01' * 32])
+    root = levels[-1][0].hex()
+    node.calls['0x' + selector('raices(bytes32)') + root] = hex(1700000500)
+    in_batch = _record(foto, merkle={'root': root, 'proof': [p.hex() for p in merkle_proof(levels, 0)]})
+    bad_proof = _record(foto, merkle={'root': root, 'proof': ['zz']})
+    records = [
+        good,
+        _record(foto, hash_version=99),
+        {**good, 'image_path': str(tmp_path / 'borrada.jpg')},
+        {'metadata': METADATA},
+        bad_proof,
+        _record(foto, photo_hash='00' * 32),
+        in_batch,
+    ]
+    reports = verify_many(records, w3=node, address=ADDRESS, workers=2)
+    assert len(reports) == len(records)
+    assert reports[0]['notarized'] and reports[0]['timestamp'] == 1700000000 and reports[0]['error'] is None
+    for report in reports[1:4]:
+        assert not report['hash_ok'] and not report['notarized'] and report['error']
+    assert reports[4]['hash_ok'] and not reports[4]['notarized'] and 'Merkle' in reports[4]['error']
+    # Hash distinto del fichero: falla sin error de lectura
+    assert not reports[5]['hash_ok'] and reports[5]['error'] is None
+    assert reports[6]['notarized'] and reports[6]['via'] == 'merkle' and reports[6]['timestamp'] == 1700000500
+
+
+@pytest.mark.parametrize('status, error', [('pending', 'pendiente'), ('failed', 'no se confirmó'), (None, None)])
+def test_lote_sin_anclar_explica_por_que(node, foto, status, error):
+    pytest.importorskip('kivy')
+    pytest.importorskip('web3')
+    levels = build_levels([bytes.fromhex(_record(foto)['photo_hash']), b'\x01' * 32])
+    merkle = {'root': levels[-1][0].hex(), 'proof': [p.hex() for p in merkle_proof(levels, 0)]}
+    if status:
+        merkle['anchor_status'] = status
+    report, = verify_many([_record(foto, merkle=merkle)], w3=node, address=ADDRESS, workers=1)
+    assert report['hash_ok'] and not report['notarized']
+    assert (report['error'] is None) if error is None else (error in report['error'])
+
+
+def test_verify_many_v3_con_otro_bloque_configurado(node, foto, monkeypatch):
+    pytest.importorskip('kivy')
+    pytest.importorskip('web3')
+    monkeypatch.setattr(verifier.config, 'HASH_TREE_CHUNK_SIZE', 128)
+    digest, manifest = hash_with_manifest(foto, METADATA, HASH_V3)
+    record = {'image_path': foto, 'metadata': METADATA, 'hash_version': HASH_V3,
+              'photo_hash': digest.hex(), 'chunks': manifest}
+    monkeypatch.setattr(verifier.config, 'HASH_TREE_CHUNK_SIZE', 256)
+    report, = verify_many([record], w3=node, address=ADDRESS, workers=1)
+    assert report['hash_ok'] and report['error'] is None
@@ -0,0 +1,109 @@
+import os
+import pytest
+
+pytest.importorskip('kivy')
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from app import wallet  # noqa: E402
+from app.wallet import (  # noqa: E402
+    FORMATS, SIG_COMPACT, SIG_DER, from_compact, sign_hash, sign_many, to_compact, verify_many,
+    verify_signature,
+)
+
+
+@pytest.fixture(scope='module')
+def key():
+    return ec.generate_private_key(ec.SECP256K1())
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Tramos pequeños, para que un lote de 20 ya se verifique en varios procesos."""
+    monkeypatch.setattr(wallet.config, 'SIGN_CHUNK_SIZE', 4)
+    return 2
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_firma_y_verifica(key, fmt):
+    digest = os.urandom(32)
+    signature = sign_hash(digest, key, fmt)
+    assert verify_signature(digest, signature, key.public_key(), fmt)
+    # Sin formato se deduce de la longitud
+    assert verify_signature(digest, signature, key.public_key())
+    assert not verify_signature(os.urandom(32), signature, key.public_key(), fmt)
+    other = ec.generate_private_key(ec.SECP256K1()).public_key()
+    assert not verify_signature(digest, signature, other, fmt)
+
+
+def test_longitud_de_cada_formato(key):
+    digest = os.urandom(32)
+    assert len(sign_hash(digest, key, SIG_COMPACT)) == 64
+    # DER es de longitud variable: 70-72 bytes salvo con r o s muy pequeños
+    der = sign_hash(digest, key, SIG_DER)
+    assert der[0] == 0x30 and len(der) <= 72 and len(der) != 64
+
+
+def test_formato_por_defecto_de_config(key, monkeypatch):
+    digest = os.urandom(32)
+    monkeypatch.setattr(wallet.config, 'SIGNATURE_FORMAT', SIG_DER)
+    der = sign_hash(digest, key)
+    assert len(der) != 64 and verify_signature(digest, der, key.public_key())
+    monkeypatch.setattr(wallet.config, 'SIGNATURE_FORMAT', SIG_COMPACT)
+    compact = sign_hash(digest, key)
+    assert len(compact) == 64 and verify_signature(digest, compact, key.public_key())
+
+
+def test_formato_equivocado_no_verifica(key):
+    digest = os.urandom(32)
+    assert not verify_signature(digest, sign_hash(digest, key, SIG_DER), key.public_key(), SIG_COMPACT)
+    assert not verify_signature(digest, sign_hash(digest, key, SIG_COMPACT), key.public_key(), SIG_DER)
+
+
+def test_conversion_compacta(key):
+    der = key.sign(os.urandom(32), wallet._algorithm(SIG_DER))
+    compact = to_compact(der, key)
+    assert len(compact) == 64 and from_compact(compact, key) == der
+    with pytest.raises(ValueError):
+        from_compact(compact[:-1], key)
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('workers', [1, 2])
+def test_lote_firma_y_verifica(key, pool, fmt, workers):
+    digests = [os.urandom(32) for _ in range(20)]
+    signatures = sign_many(digests, key, fmt)
+    # En el mismo orden que los hashes, y verificables de uno en uno
+    assert all(verify_signature(d, s, key.public_key(), fmt) for d, s in zip(digests, signatures))
+
+    pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    items = [(d, s, pem if i % 2 else key.public_key(), fmt) for i, (d, s) in enumerate(zip(digests, signatures))]
+    items[3] = (os.urandom(32),) + items[3][1:]
+    expected = [i != 3 for i in range(20)]
+    assert verify_many(items, workers=workers) == expected
+
+
+def test_lote_con_formatos_mezclados_y_pem_invalido(key, pool):
+    digests = [os.urandom(32) for _ in range(10)]
+    items = [(d, sign_hash(d, key, fmt), key.public_key(), fmt)
+             for d in digests for fmt in FORMATS]
+    items.append((digests[0], items[0][1], b'no es un PEM', SIG_DER))
+    assert verify_many(items, workers=2) == [True] * 20 + [False]
+
+
+def test_la_clave_privada_no_sale_del_proceso(key, pool, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("sign_many no debe crear procesos")
+
+    monkeypatch.setattr(wallet, 'ProcessPoolExecutor', no_pool)
+    digests = [os.urandom(32) for _ in range(20)]
+    signatures = sign_many(digests, key, SIG_COMPACT)
+    assert all(verify_signature(d, s, key.public_key(), SIG_COMPACT) for d, s in zip(digests, signatures))
+
+
+def test_lote_firma_con_la_sesion(key, monkeypatch):
+    monkeypatch.setattr(wallet, 'session', type('Sesion', (), {'private_key': key})())
+    digest = os.urandom(32)
+    signature, = sign_many([digest], fmt=SIG_DER)
+    assert verify_signature(digest, signature, key.public_key(), SIG_DER)
@@ -0,0 +1,79 @@
+import os
+import pytest
+from app.watcher import GalleryWatcher, SeenIndex, IN_Q_OVERFLOW, inotify_available
+
+
+@pytest.fixture
+def gallery(tmp_path):
+    root = tmp_path / 'galeria'
+    (root / 'DCIM').mkdir(parents=True)
+    (root / 'DCIM' / 'vieja.jpg').write_bytes(b'jpeg')
+    return root
+
+
+def _watcher(gallery, tmp_path, use_inotify):
+    index = SeenIndex(str(tmp_path / 'vistos.sqlite'))
+    return GalleryWatcher(gallery, index=index, interval=0.01, use_inotify=use_inotify)
+
+
+def _touch(path, data=b'jpeg'):
+    path.write_bytes(data)
+    # Asegura que la carpeta cambia de fecha aunque el reloj tenga poca resolución
+    st = os.stat(path.parent)
+    os.utime(path.parent, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    return str(path)
+
+
+def test_sondeo_entrega_la_foto_nueva_una_vez(gallery, tmp_path):
+    watcher = _watcher(gallery, tmp_path, use_inotify=False)
+    watcher.drain()
+    assert watcher.wait(0.05) is None
+    new = _touch(gallery / 'DCIM' / 'nueva.jpg')
+    _touch(gallery / 'DCIM' / 'nota.txt')
+    assert watcher.wait(2) == new
+    assert watcher.wait(0.05) is None
+
+
+def test_sondeo_espera_a_que_la_foto_tenga_datos(gallery, tmp_path):
+    watcher = _watcher(gallery, tmp_path, use_inotify=False)
+    watcher.drain()
+    path = gallery / 'DCIM' / 'a_medias.jpg'
+    _touch(path, b'')
+    assert watcher.wait(0.05) is None
+    path.write_bytes(b'jpeg completo')
+    assert watcher.wait(2) == str(path)
+
+
+def test_lo_visto_no_se_repite_al_reiniciar(gallery, tmp_path):
+    watcher = _watcher(gallery, tmp_path, use_inotify=False)
+    watcher.drain()
+    new = _touch(gallery / 'DCIM' / 'nueva.jpg')
+    assert watcher.wait(2) == new
+    watcher.close()
+    again = _watcher(gallery, tmp_path, use_inotify=False)
+    assert again.wait(0.05) is None
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify solo existe en Linux")
+def test_inotify_entrega_fotos_en_subcarpetas_nuevas(gallery, tmp_path):
+    watcher = _watcher(gallery, tmp_path, use_inotify=True)
+    watcher.drain()
+    assert watcher.mode == 'inotify'
+    (gallery / 'Camera').mkdir()
+    new = _touch(gallery / 'Camera' / 'nueva.jpg')
+    assert watcher.wait(2) == new
+    watcher.close()
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify solo existe en Linux")
+def test_desbordamiento_de_la_cola_relee_las_carpetas(gallery, tmp_path):
+    watcher = _watcher(gallery, tmp_path, use_inotify=True)
+    watcher.drain()
+    new = _touch(gallery / 'DCIM' / 'perdida.jpg')
+    # La cola de inotify se desbordó antes de leer el evento de la foto
+    watcher._handle([(None, '', IN_Q_OVERFLOW)])
+    assert list(watcher._ready) == [new]
+    assert watcher.wait(0.05) == new
+    # El evento que sí llegó no la entrega otra vez
+    assert watcher.wait(0.1) is None
+    watcher.close()
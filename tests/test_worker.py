@@ -0,0 +1,71 @@
+import time
+import threading
+import pytest
+
+pytest.importorskip('kivy')
+from kivy.clock import Clock  # noqa: E402
+from app.worker import BackgroundWorker, Cancelled, HASHING  # noqa: E402
+
+
+@pytest.fixture
+def worker():
+    w = BackgroundWorker(max_workers=2)
+    yield w
+    w.shutdown()
+
+
+def _drain(events, expected: int, timeout: float = 5):
+    """Ejecuta el reloj de Kivy (hilo principal) hasta recibir ``expected`` avisos."""
+    deadline = time.monotonic() + timeout
+    while len(events) < expected and time.monotonic() < deadline:
+        Clock.tick()
+        time.sleep(0.005)
+    return events
+
+
+def test_progreso_y_resultado_en_el_hilo_principal(worker):
+    main = threading.current_thread()
+    events = []
+
+    def task(job, x):
+        job.report(HASHING, x)
+        assert threading.current_thread() is not main
+        return x * 2
+
+    worker.submit(task, 21,
+                  on_progress=lambda state, info: events.append((state, info, threading.current_thread())),
+                  on_done=lambda result: events.append(('done', result, threading.current_thread())))
+    _drain(events, 2)
+    assert [e[:2] for e in events] == [(HASHING, 21), ('done', 42)]
+    assert all(e[2] is main for e in events)
+
+
+def test_error_se_entrega_a_on_error(worker):
+    events = []
+
+    def task(job):
+        raise ValueError('sin red')
+
+    worker.submit(task, on_error=events.append, on_done=lambda r: pytest.fail("no debe terminar"))
+    _drain(events, 1)
+    assert isinstance(events[0], ValueError)
+
+
+def test_cancelar_detiene_el_trabajo_y_no_entrega_nada(worker):
+    started, release = threading.Event(), threading.Event()
+    events = []
+
+    def task(job):
+        started.set()
+        release.wait(5)
+        job.check_cancelled()
+        events.append('siguió')
+
+    job = worker.submit(task, on_done=events.append, on_error=events.append)
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    _drain(events, 1, timeout=0.2)
+    assert events == [] and job.cancelled
+    with pytest.raises(Cancelled):
+        job.report(HASHING)
@@ -1,5 +1,9 @@
 # utils/sensors.py
+import time
+import threading
+from array import array
 from plyer import accelerometer, gyroscope
+import config
 
 
 def get_accelerometer() -> dict:
@@ -16,4 +20,193 @@ def get_gyroscope() -> dict:
         vals = gyroscope.rotation
         return {'x': vals[0], 'y': vals[1], 'z': vals[2]}
     except:
-        return {'x': 0, 'y': 0, 'z': 0}
\ No newline at end of file
+        return {'x': 0, 'y': 0, 'z': 0}
+
+
+AXES = ('x', 'y', 'z')
+
+
+class RingBuffer:
+    """
+    Búfer circular de muestras (t, x, y, z) sobre un ``array('d')`` de tamaño
+    fijo: no reserva memoria al escribir.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array('d', bytes(8 * 4 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t: float, x: float, y: float, z: float):
+        i = self._next * 4
+        data = self._data
+        data[i] = t
+        data[i + 1] = x
+        data[i + 2] = y
+        data[i + 3] = z
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def since(self, t_min: float) -> list:
+        """Muestras con ``t >= t_min``, de la más reciente a la más antigua."""
+        out = []
+        i = self._next
+        for _ in range(self._count):
+            i = (i - 1) % self.capacity
+            sample = self._data[i * 4:i * 4 + 4]
+            if sample[0] < t_min:
+                break
+            out.append(sample)
+        return out
+
+
+def summarize(samples: list) -> dict:
+    """Media, varianza, mínimo y máximo por eje de una lista de muestras."""
+    if not samples:
+        return {'n': 0}
+    n = len(samples)
+    summary = {'n': n}
+    for k, axis in enumerate(AXES, start=1):
+        values = [s[k] for s in samples]
+        mean = sum(values) / n
+        summary[axis] = {
+            'mean': round(mean, 4),
+            'var': round(sum((v - mean) ** 2 for v in values) / n, 6),
+            'min': round(min(values), 4),
+            'max': round(max(values), 4),
+        }
+    return summary
+
+
+class PlyerSensorSource:
+    """Fuente real: acelerómetro y giroscopio de Plyer."""
+
+    def enable(self):
+        for sensor in (accelerometer, gyroscope):
+            try:
+                sensor.enable()
+            except Exception:
+                pass  # sensor no disponible en esta plataforma
+
+    def disable(self):
+        for sensor in (accelerometer, gyroscope):
+            try:
+                sensor.disable()
+            except Exception:
+                pass
+
+    def read(self):
+        """Devuelve (aceleración, rotación); ``None`` en la que no haya dato."""
+        try:
+            accel = accelerometer.acceleration
+        except Exception:
+            accel = None
+        try:
+            gyro = gyroscope.rotation
+        except Exception:
+            gyro = None
+        accel = accel if accel and None not in accel[:3] else None
+        gyro = gyro if gyro and None not in gyro[:3] else None
+        return accel, gyro
+
+
+class FakeSensorSource:
+    """
+    Fuente simulada para pruebas y escritorio.  ``fn(t)`` devuelve
+    ``(aceleración, rotación)``; por defecto, el dispositivo en reposo.
+    """
+
+    def __init__(self, fn=None):
+        self.fn = fn or (lambda t: ((0.0, 0.0, 9.81), (0.0, 0.0, 0.0)))
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+    def read(self):
+        return self.fn(time.monotonic())
+
+
+class SensorSampler:
+    """
+    Muestrea la fuente a ``rate_hz`` en un hilo y guarda las lecturas en dos
+    búferes circulares.  ``summary()`` solo lee el búfer, sin esperar al sensor.
+    """
+
+    def __init__(self, source=None, rate_hz: float = None, capacity: int = None):
+        self.source = source or PlyerSensorSource()
+        self.rate_hz = rate_hz or config.SENSOR_RATE_HZ
+        capacity = capacity or config.SENSOR_BUFFER_SIZE
+        self.accel = RingBuffer(capacity)
+        self.gyro = RingBuffer(capacity)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.source.enable()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.disable()
+
+    def sample_once(self):
+        """Lee una muestra de la fuente y la añade a los búferes."""
+        accel, gyro = self.source.read()
+        t = time.monotonic()
+        with self._lock:
+            if accel is not None:
+                self.accel.append(t, *accel[:3])
+            if gyro is not None:
+                self.gyro.append(t, *gyro[:3])
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except Exception:
+                pass
+            self._stop.wait(period)
+
+    def summary(self, window_ms: float = None) -> dict:
+        """Resumen por eje de las muestras de los últimos ``window_ms`` ms."""
+        window_ms = window_ms or config.SENSOR_WINDOW_MS
+        t_min = time.monotonic() - window_ms / 1000
+        with self._lock:
+            accel = self.accel.since(t_min)
+            gyro = self.gyro.since(t_min)
+        return {
+            'accelerometer': summarize(accel),
+            'gyroscope': summarize(gyro),
+        }
+
+
+# Muestreador compartido (se arranca desde main.initialize_app)
+_sampler = None
+
+
+def get_sampler() -> SensorSampler:
+    global _sampler
+    if _sampler is None:
+        source = FakeSensorSource() if config.SENSOR_SOURCE == 'fake' else PlyerSensorSource()
+        _sampler = SensorSampler(source)
+    return _sampler
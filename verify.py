@@ -0,0 +1,51 @@
+# verify.py
+"""
+Verificación en bloque de fotos notarizadas.
+
+Lee registros JSON (ficheros o directorios con ``*.json``), recalcula los
+hashes en paralelo, consulta el contrato en lotes JSON-RPC y escribe un
+informe JSON por línea.
+
+Uso:
+    python verify.py tmp_photos/records --output informe.jsonl
+"""
+import os
+import sys
+import json
+import argparse
+# app.wallet importa kivy, que por defecto interpreta sys.argv
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+from app.verifier import load_records, verify_many
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica fotos notarizadas en bloque")
+    parser.add_argument('records', nargs='+', help="Registros JSON o directorios de registros")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--index', action='store_true',
+                        help="Sincroniza y usa el índice local de eventos antes de consultar el nodo")
+    parser.add_argument('--output', default='-', help="Fichero de salida (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    index = None
+    if args.index:
+        from app.indexer import open_index
+        index = open_index()
+        index.sync()
+
+    reports = verify_many(load_records(args.records), workers=args.workers, index=index)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for report in reports:
+            out.write(json.dumps(report) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    ok = sum(1 for r in reports if r['hash_ok'] and r['notarized'])
+    print(f"{ok}/{len(reports)} ficheros verificados y notarizados", file=sys.stderr)
+    return 0 if ok == len(reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())